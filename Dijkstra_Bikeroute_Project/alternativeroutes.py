@@ -0,0 +1,225 @@
+import heapq
+import itertools
+
+from closuremask import ClosureMask
+from spatialindex import CoordinateIndex
+
+DEFAULT_MAX_OVERLAP = 0.9
+DUPLICATE_TOLERANCE = 0.001  # km; vertices closer than this count as the same place
+CANDIDATE_FACTOR = 10  # Yen's candidates examined per route wanted, at most
+
+
+def k_shortest_paths(graph, start_coordinate, park, k=3, mask=None, catalogue=None, max_overlap=DEFAULT_MAX_OVERLAP):
+    """
+    Finds up to k distinct loopless routes from a start coordinate to a park, shortest first.
+
+    Uses Yen's algorithm. One reverse Dijkstra search from the park's entry vertices gives
+    the exact remaining distance of every vertex to the park; it is computed once and
+    reused as the A* heuristic of every spur search, which therefore only explores the
+    detours around the edges Yen's algorithm removes. The searches run on the graph's
+    CompactGraph, with vertex ids, and the graph itself is never modified: removed edges
+    are closed through a ClosureMask and root vertices by id.
+
+    Distinct vertex sequences can still be the same street: the dataset has vertices
+    centimeters apart, and a detour through one of them is Yen's next shortest path. A
+    candidate sharing more than max_overlap of its length with a route already returned
+    is therefore skipped, vertices within DUPLICATE_TOLERANCE counting as one. Skipped
+    routes are only branched from once the other candidates run out, as their branches
+    are mostly more twins, and at most CANDIDATE_FACTOR * k candidates are examined.
+
+    :param graph: A Graph instance representing the bikeways network.
+    :param start_coordinate: The coordinate tuple to start from.
+    :param park: A Park instance.
+    :param k: The number of routes wanted.
+    :param mask: An optional ClosureMask of edges, rows and vertices to route around.
+    :param catalogue: An optional ParkCatalogue whose cached entry vertices are used for the park.
+    :param max_overlap: The largest share of its length a route may have in common with a
+                        shorter route returned; 1.0 keeps every distinct vertex sequence.
+    :return: A list of (path, distance, overlap) tuples. The path lists the graph vertices
+             from the vertex closest to the start to the park entry vertex, the distance
+             includes the connectors at both ends, and the overlap is the share of the
+             route's length it has in common with the shortest route.
+    """
+    start_vertex, start_connector = graph.find_closest_vertex(tuple(start_coordinate))
+    entries = graph.entry_vertices(park.coordinates) if catalogue is None else catalogue.entry_vertices(graph, park)
+    if start_vertex is None or not entries:
+        return []
+
+    compact = graph.compact()
+    start = compact.ids[start_vertex]
+    entry_ids = {}
+    for vertex, connector in entries.items():
+        entry_id = compact.ids[vertex]
+        entry_ids[entry_id] = min(connector, entry_ids.get(entry_id, float('inf')))
+
+    # exact distance to the park from every vertex, reused by every spur search
+    remaining, _ = compact.shortest_distances(entry_ids, mask=mask)
+    if start not in remaining:
+        return []
+
+    first = _spur_search(compact, start, entry_ids, remaining, mask)
+    first_prefix = _prefix_distances(compact, first[0], mask)
+    first_coordinates = [compact.coordinates[vertex] for vertex in first[0]]
+    # the routes returned, and every route taken off the candidates, skipped ones included
+    routes = [(first[0], first_coordinates, first_prefix, CoordinateIndex(first_coordinates))]
+    explored = [first[0]]
+    seen = {tuple(first[0])}
+    candidates = []
+    counter = itertools.count()
+    # skipped routes, branched from only once the candidates run out
+    skipped = []
+    branch = (first[0], first_prefix)
+
+    while len(routes) < k and len(explored) < CANDIDATE_FACTOR * k:
+        if branch is None and not candidates and skipped:
+            branch = skipped.pop(0)
+        if branch is not None:
+            path, prefix = branch
+            for i, spur_vertex in enumerate(path):
+                root = path[:i + 1]
+                spur_mask = ClosureMask()
+                spur_entries = entry_ids
+                for earlier in explored:
+                    if earlier[:i + 1] == root:
+                        if len(earlier) > i + 1:
+                            _close_edges_between(compact, spur_mask, earlier[i], earlier[i + 1])
+                        else:
+                            # an earlier route already ends here, so this route must go on
+                            spur_entries = {vertex: distance for vertex, distance in entry_ids.items()
+                                            if vertex != spur_vertex}
+                if mask is not None:
+                    spur_mask = ClosureMask.combine(mask, spur_mask)
+
+                spur = _spur_search(compact, spur_vertex, spur_entries, remaining, spur_mask, set(root[:-1]))
+                if spur is None:
+                    continue
+                spur_path, spur_distance = spur
+                candidate = root[:-1] + spur_path
+                if tuple(candidate) not in seen:
+                    seen.add(tuple(candidate))
+                    heapq.heappush(candidates, (prefix[i] + spur_distance, next(counter), candidate))
+
+        if not candidates:
+            break
+        _, _, best = heapq.heappop(candidates)
+        explored.append(best)
+        best_prefix = _prefix_distances(compact, best, mask)
+        best_coordinates = [compact.coordinates[vertex] for vertex in best]
+        branch = (best, best_prefix)
+        if all(_overlap(best_coordinates, best_prefix, coordinates, index) <= max_overlap
+               for _, coordinates, _, index in routes):
+            routes.append((best, best_coordinates, best_prefix, CoordinateIndex(best_coordinates)))
+        else:
+            skipped.append(branch)
+            branch = None
+
+    _, shortest, _, shortest_index = routes[0]
+    results = []
+    for path, coordinates, prefix, _ in routes:
+        distance = start_connector + prefix[-1] + entry_ids[path[-1]]
+        results.append((coordinates, distance, _overlap(coordinates, prefix, shortest, shortest_index)))
+    return results
+
+
+def _spur_search(compact, source, entries, remaining, mask, closed=None):
+    """
+    Runs an A* search from a vertex to the nearest entry vertex, including its connector.
+
+    :param compact: The CompactGraph to search.
+    :param source: The vertex id to start from.
+    :param entries: A dict of allowed entry vertex ids to their connector distances.
+    :param remaining: A dict of vertex ids to a lower bound of their distance to the park.
+    :param mask: A ClosureMask of edges and vertices to route around, or None.
+    :param closed: An optional set of vertex ids no edge may lead into.
+    :return: A tuple of the path of vertex ids from source to an entry vertex and its length,
+             connector included, or None if no entry vertex can be reached.
+    """
+    if source not in remaining or not entries:
+        return None
+    offsets, targets, weights = compact.offsets, compact.targets, compact.weights
+    closures = compact.closures(mask, closed)
+    if closures is not None:
+        closed_edges, closed_rows, closed_vertices = closures
+        edge_ids, rows = compact.edge_ids, compact.rows
+    counter = itertools.count()
+    known = {source: 0}
+    previous_vertices = {source: None}
+    settled = set()
+    heap = [(remaining[source], 0, next(counter), source)]
+    best_distance, best_entry = float('inf'), None
+
+    while heap:
+        estimate, distance, _, current_vertex = heapq.heappop(heap)
+        if estimate >= best_distance:
+            break
+        if current_vertex in settled:
+            continue
+        settled.add(current_vertex)
+        if current_vertex in entries and distance + entries[current_vertex] < best_distance:
+            best_distance, best_entry = distance + entries[current_vertex], current_vertex
+
+        for position in range(offsets[current_vertex], offsets[current_vertex + 1]):
+            neighbor = targets[position]
+            if closures is not None and (edge_ids[position] in closed_edges or rows[position] in closed_rows
+                                         or neighbor in closed_vertices):
+                continue
+            new_distance = distance + weights[position]
+            if (neighbor not in settled and neighbor in remaining
+                    and new_distance < known.get(neighbor, float('inf'))):
+                known[neighbor] = new_distance
+                previous_vertices[neighbor] = current_vertex
+                heapq.heappush(heap, (new_distance + remaining[neighbor], new_distance, next(counter), neighbor))
+
+    if best_entry is None:
+        return None
+    path = []
+    current_vertex = best_entry
+    while current_vertex is not None:
+        path.append(current_vertex)
+        current_vertex = previous_vertices[current_vertex]
+    return path[::-1], best_distance
+
+
+def _close_edges_between(compact, mask, vertex, neighbor):
+    """
+    Closes every edge, parallel ones included, between two adjacent vertex ids.
+    """
+    for position in range(compact.offsets[vertex], compact.offsets[vertex + 1]):
+        if compact.targets[position] == neighbor:
+            mask.close_edge(compact.edge_ids[position])
+
+
+def _prefix_distances(compact, path, mask):
+    """
+    Returns the distance from the first vertex of a path of vertex ids to each of its vertices.
+    """
+    closures = compact.closures(mask)
+
+    def is_open(position):
+        return closures is None or not (compact.edge_ids[position] in closures[0] or compact.rows[position] in closures[1]
+                                        or compact.targets[position] in closures[2])
+
+    prefix = [0]
+    for vertex, neighbor in zip(path, path[1:]):
+        shortest = min(compact.weights[position] for position in range(compact.offsets[vertex], compact.offsets[vertex + 1])
+                       if compact.targets[position] == neighbor and is_open(position))
+        prefix.append(prefix[-1] + shortest)
+    return prefix
+
+
+def _overlap(path, prefix, other, other_index):
+    """
+    Returns the share of a path's length it has in common with another path. An edge is
+    shared when its two ends lie within DUPLICATE_TOLERANCE of the same or consecutive
+    vertices of the other path, so a detour through a twin vertex still counts as shared.
+    """
+    if prefix[-1] <= 0:
+        return 1.0
+    positions = {}
+    for position, vertex in enumerate(other):
+        positions.setdefault(vertex, []).append(position)
+    matches = [{position for match, _ in other_index.within(vertex, DUPLICATE_TOLERANCE) for position in positions[match]}
+               for vertex in path]
+    shared = sum(prefix[i + 1] - prefix[i] for i in range(len(path) - 1)
+                 if any(abs(a - b) <= 1 for a in matches[i] for b in matches[i + 1]))
+    return shared / prefix[-1]
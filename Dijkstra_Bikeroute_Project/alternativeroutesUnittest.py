@@ -0,0 +1,82 @@
+import unittest
+from classbuilder import Graph
+from closuremask import ClosureMask
+from parkbuilder import Park
+from alternativeroutes import k_shortest_paths
+
+
+class TestAlternativeRoutes(unittest.TestCase):
+    """
+    A unittest class for testing the k-shortest-paths search.
+    """
+
+    def setUp(self):
+        # three corridors of different lengths from (0, 0) to (0, 0.04)
+        #   (0, 0) - (0, 0.02) - (0, 0.04)              direct
+        #   (0, 0) - (0.01, 0.02) - (0, 0.04)           short detour
+        #   (0, 0) - (0.03, 0.02) - (0, 0.04)           long detour
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[0, 0], [0, 0.02], [0, 0.04]]],
+            ["2", [[0, 0], [0.01, 0.02], [0, 0.04]]],
+            ["3", [[0, 0], [0.03, 0.02], [0, 0.04]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.park = Park([(0, 0.041)], None, "Park")
+
+    def test_k_shortest_paths(self):
+        """
+        Tests that the routes come out shortest first, are distinct, and report their overlap.
+        """
+        vertex_count = len(self.graph.vertices)
+        routes = k_shortest_paths(self.graph, (0, -0.001), self.park, k=3)
+
+        self.assertEqual([path for path, _, _ in routes], [
+            [(0, 0), (0, 0.02), (0, 0.04)],
+            [(0, 0), (0.01, 0.02), (0, 0.04)],
+            [(0, 0), (0.03, 0.02), (0, 0.04)],
+        ])
+        distances = [distance for _, distance, _ in routes]
+        self.assertEqual(distances, sorted(distances))
+        # the connectors at both ends are part of the distance
+        self.assertAlmostEqual(distances[0], 2 * self.graph.haversine_distance((0, 0), (0, 0.02))
+                               + 2 * self.graph.haversine_distance((0, 0), (0, 0.001)))
+        self.assertEqual([overlap for _, _, overlap in routes], [1.0, 0.0, 0.0])
+        # the graph is left as it was
+        self.assertEqual(len(self.graph.vertices), vertex_count)
+
+        # Fewer routes exist than asked for
+        self.assertEqual(len(k_shortest_paths(self.graph, (0, -0.001), self.park, k=10)), 3)
+
+    def test_k_shortest_paths_with_mask(self):
+        """
+        Tests that the routes avoid closures.
+        """
+        mask = ClosureMask()
+        mask.close_vertex((0, 0.02))
+        routes = k_shortest_paths(self.graph, (0, -0.001), self.park, k=3, mask=mask)
+        self.assertEqual([path[1] for path, _, _ in routes], [(0.01, 0.02), (0.03, 0.02)])
+
+        # Start cut off from the park
+        mask.close_vertex((0.01, 0.02))
+        mask.close_vertex((0.03, 0.02))
+        self.assertEqual(k_shortest_paths(self.graph, (0, -0.001), self.park, mask=mask), [])
+
+
+    def test_k_shortest_paths_skips_twin_routes(self):
+        """
+        Tests that a route along a parallel edge a few millimeters from a shorter route is
+        not returned as an alternative, unless overlapping routes are asked for.
+        """
+        self.graph.build_graph([["Object ID", "Geom"], ["4", [[0, 0], [0.00000006, 0.02], [0, 0.04]]]], 1)
+        routes = k_shortest_paths(self.graph, (0, -0.001), self.park, k=3)
+        self.assertEqual([path[1] for path, _, _ in routes], [(0, 0.02), (0.01, 0.02), (0.03, 0.02)])
+
+        routes = k_shortest_paths(self.graph, (0, -0.001), self.park, k=3, max_overlap=1.0)
+        # the graph keys the twin by its coordinate rounded to 7 decimals
+        self.assertEqual([path[1] for path, _, _ in routes], [(0, 0.02), (0.0000001, 0.02), (0.01, 0.02)])
+        self.assertAlmostEqual(routes[1][2], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,54 @@
 import math
-import matplotlib.pyplot as plt
-import geopandas as gpd
-from shapely.geometry import LineString, Point
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+import sys
 
 R = 6371  # Earth radius in km
+COORDINATE_DECIMALS = 7  # roughly 1 cm; vertices that round to the same coordinate are merged
+
+
+def quantize(coordinate):
+    """
+    Rounds a coordinate to the vertex grid, so coordinates that differ only by float noise
+    or by less than a centimeter become the same vertex.
+
+    :param coordinate: A coordinate tuple or list.
+    :return: The rounded coordinate tuple.
+    """
+    return (round(coordinate[0], COORDINATE_DECIMALS), round(coordinate[1], COORDINATE_DECIMALS))
+
+
+def haversine_distance(coord1, coord2):
+    """
+    Calculates the haversine distance between two coordinates.
+
+    Module level so it can be used without a Graph, e.g. in worker processes.
+
+    :param coord1: A tuple containing the latitude and longitude of the first coordinate.
+    :param coord2: A tuple containing the latitude and longitude of the second coordinate.
+    :return: The haversine distance between the two coordinates in kilometers.
+    """
+    lat1, lon1 = coord1
+    lat2, lon2 = coord2
+
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon / 2) * math.sin(dlon / 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    distance = R * c
+    return distance
 
 class Vectex:
     """
     A node class representing a vertex in a linked list.
+
+    The info field holds a row index into the graph's AttributeTable rather than
+    the attribute values themselves. Both half-edges of an edge share one edge_id.
     """
-    def __init__(self, datapoint, info):
+    def __init__(self, datapoint, info, edge_id=None):
         self.datapoint = datapoint
         self.info = info
+        self.edge_id = edge_id
         self.next = None
         # self.prev = None
 
@@ -26,14 +62,15 @@ class AdjacentLinkedList:
     def __init__(self):
         self.head = None
 
-    def append(self, datapoint, info):
+    def append(self, datapoint, info, edge_id=None):
         """
         Appends a new node with the given datapoint and info to the end of the list.
         
         :param datapoint: The datapoint to be stored in the new node.
         :param info: Additional information to be stored in the new node.
+        :param edge_id: The id of the edge the node is a half of.
         """
-        new_node = Vectex(datapoint, info)
+        new_node = Vectex(datapoint, info, edge_id)
         if not self.head:
             self.head = new_node
             return
@@ -42,12 +79,130 @@ class AdjacentLinkedList:
             current = current.next
         current.next = new_node
 
+    def remove(self, predicate):
+        """
+        Removes every node for which predicate(node) is true.
+
+        :param predicate: A function taking a Vectex and returning True if it should be removed.
+        :return: The number of removed nodes.
+        """
+        removed = 0
+        while self.head and predicate(self.head):
+            self.head = self.head.next
+            removed += 1
+        current = self.head
+        while current and current.next:
+            if predicate(current.next):
+                current.next = current.next.next
+                removed += 1
+            else:
+                current = current.next
+        return removed
+
+class AttributeTable:
+    """
+    A class storing the attributes of the edges in a Graph, one record per source row.
+
+    Edges only hold the integer row index returned by add_row. The strings in each
+    record are interned, so repeated values such as route names or bikeway types
+    share a single object across the whole table.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = list(columns) if columns else []
+        self.rows = []
+        self._row_index = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add_row(self, record):
+        """
+        Adds a record to the table and returns its row index. Identical records share one row.
+
+        :param record: A list/tuple of column values, or a single value such as a park name.
+        :return: The integer row index of the record.
+        """
+        if isinstance(record, (list, tuple)):
+            record = tuple(sys.intern(value) if isinstance(value, str) else value for value in record)
+        elif isinstance(record, str):
+            record = sys.intern(record)
+
+        try:
+            row_id = self._row_index.get(record)
+            hashable = True
+        except TypeError:
+            # unhashable values (e.g. nested lists) are stored without sharing
+            row_id = None
+            hashable = False
+
+        if row_id is None:
+            row_id = len(self.rows)
+            self.rows.append(record)
+            if hashable:
+                self._row_index[record] = row_id
+        return row_id
+
+    def get(self, row_id):
+        """
+        Returns the record stored at the given row index.
+
+        :param row_id: The row index returned by add_row.
+        :return: The record, a tuple of column values or a single value.
+        """
+        return self.rows[row_id]
+
+    def get_value(self, row_id, column, default=None):
+        """
+        Returns a single column value of a record.
+
+        :param row_id: The row index returned by add_row.
+        :param column: The column name, as found in the dataset header.
+        :param default: The value returned when the record has no such column.
+        :return: The column value, or default.
+        """
+        record = self.rows[row_id]
+        if column not in self.columns or not isinstance(record, tuple):
+            return default
+        column_index = self.columns.index(column)
+        if column_index >= len(record):
+            return default
+        return record[column_index]
+
+    def discard(self, row_id):
+        """
+        Drops the record at the given row index. The index itself is never reused.
+
+        :param row_id: The row index returned by add_row.
+        """
+        record = self.rows[row_id]
+        try:
+            if self._row_index.get(record) == row_id:
+                del self._row_index[record]
+        except TypeError:
+            pass
+        self.rows[row_id] = None
+
 class Graph:
     """
     A class representing a graph for modeling the bikeways, parks, and schools in a city.
+
+    Vertices are keyed by their quantized coordinates, see quantize. The adjacency lists
+    take updates; searches run on a CompactGraph copy of them, see compact.
     """
     def __init__(self):
         self.vertices = {}
+        self.attributes = AttributeTable()
+        # source row key (e.g. Object ID) -> attribute row index, used by apply_delta
+        self.row_keys = {}
+        # bumped on every incremental update so derived indexes can tell they are stale
+        self.version = 0
+        # edge ids are handed out in insertion order and never reused
+        self.edge_count = 0
+        # nearest-vertex index, built on the first query and patched as vertices come and go
+        self._vertex_index = None
+        # the arrays searches run on, built on the first search after a change
+        self._compact = None
     
     def add_vertex(self, coordinate):
         """
@@ -55,8 +210,17 @@ class Graph:
 
         :param coordinate: A tuple containing the latitude and longitude of the vertex.
         """
+        self._add_key(quantize(coordinate))
+
+    def _add_key(self, coordinate):
+        """
+        Adds a vertex whose coordinate is already quantized.
+        """
         if coordinate not in self.vertices:
             self.vertices[coordinate] = AdjacentLinkedList()
+            self._compact = None
+            if self._vertex_index is not None:
+                self._vertex_index.add(coordinate)
         
         # current_node = self.vertices[coordinate].head
         # while current_node is not None:
@@ -74,12 +238,30 @@ class Graph:
         :param info2: Additional information about the second vertex.
         :param distance: The distance between the two vertices.
         """
+        coord1, coord2 = quantize(coord1), quantize(coord2)
         if coord1 in self.vertices and coord2 in self.vertices:
-            self.vertices[coord1].append((coord2, distance), info2)
-            self.vertices[coord2].append((coord1, distance), info1)
+            if coord1 == coord2:
+                # the two ends are the same vertex
+                return
+            row1 = self.attributes.add_row(info1)
+            row2 = row1 if info2 is info1 else self.attributes.add_row(info2)
+            self._link(coord1, coord2, row1, row2, distance)
         else:
             raise ValueError("Both coordinates must be in the graph before creating an edge.")
 
+    def _link(self, coord1, coord2, row1, row2, distance):
+        """
+        Appends the two half-edges of an edge whose attributes are already in the table.
+
+        :param row1: The attribute row index stored on the half-edge pointing to coord1.
+        :param row2: The attribute row index stored on the half-edge pointing to coord2.
+        """
+        edge_id = self.edge_count
+        self.edge_count += 1
+        self._compact = None
+        self.vertices[coord1].append((coord2, distance), row2, edge_id)
+        self.vertices[coord2].append((coord1, distance), row1, edge_id)
+
     def haversine_distance(self, coord1, coord2):
         """
         Calculates the haversine distance between two coordinates.
@@ -88,36 +270,129 @@ class Graph:
         :param coord2: A tuple containing the latitude and longitude of the second coordinate.
         :return: The haversine distance between the two coordinates in kilometers.
         """
-        lat1, lon1 = coord1
-        lat2, lon2 = coord2
-
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-             math.sin(dlon / 2) * math.sin(dlon / 2))
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
-        return distance
+        return haversine_distance(coord1, coord2)
 
-    def build_graph(self, parsed_datapoint, geom_index):
+    def build_graph(self, parsed_datapoint, geom_index, key_column="Object ID"):
         """
         Builds the graph using parsed datapoint and a specified geometry index.
 
         :param parsed_datapoint: A list of lists containing the parsed datapoint.
         :param geom_index: An integer representing the index of the geometry column in the datapoint.
+        :param key_column: The header of the column identifying each row, used by apply_delta.
+                           Rows are not keyed if the header has no such column.
         """
+        header = parsed_datapoint[0]
+        if not self.attributes.columns:
+            self.attributes.columns = header[:geom_index] + header[geom_index + 1:]
+        key_index = header.index(key_column) if key_column in header else None
+
         for row in parsed_datapoint[1:]:
-            coordinates = row[geom_index]
-            info1 = row[:geom_index] + row[geom_index + 1:]
-            info2 = row[:geom_index] + row[geom_index + 1:]
-            for i in range(len(coordinates) - 1):
-                coord1 = tuple(coordinates[i])
-                coord2 = tuple(coordinates[i + 1])
-                self.add_vertex(coord1)
-                self.add_vertex(coord2)
-                distance = self.haversine_distance(coord1, coord2)
-                self.add_edge(coord1, coord2, info1, info2, distance)    
+            self._add_row(row, geom_index, key_index)
+
+    def _add_row(self, row, geom_index, key_index=None):
+        """
+        Adds the polyline of one dataset row to the graph.
+
+        :param row: A parsed row whose geometry column holds a list of coordinates.
+        :param geom_index: The index of the geometry column.
+        :param key_index: The index of the key column, or None if rows are not keyed.
+        """
+        coordinates = [tuple(coordinate) for coordinate in row[geom_index]]
+        lengths = [haversine_distance(coordinates[i], coordinates[i + 1]) for i in range(len(coordinates) - 1)]
+        key = row[key_index] if key_index is not None else None
+        self._add_polyline(row[:geom_index] + row[geom_index + 1:], coordinates, lengths, key)
+
+    def _add_polyline(self, record, coordinates, lengths, key=None):
+        """
+        Adds a polyline whose segment lengths are already computed.
+
+        :param record: The attribute record of the row, without its geometry.
+        :param coordinates: The polyline as a list of coordinate tuples.
+        :param lengths: The length of each segment, one fewer than the coordinates.
+        :param key: The row key, or None if rows are not keyed.
+        """
+        self._add_points(record, [quantize(coordinate) for coordinate in coordinates], lengths, key)
+
+    def _add_points(self, record, points, lengths, key=None):
+        """
+        Adds a polyline whose coordinates are already quantized and whose segment lengths are computed.
+
+        :param record: The attribute record of the row, without its geometry.
+        :param points: The polyline as a list of quantized coordinate tuples.
+        :param lengths: The length of each segment, one fewer than the points.
+        :param key: The row key, or None if rows are not keyed.
+        """
+        # one attribute record per row, shared by every segment of its polyline
+        row_id = self.attributes.add_row(record)
+        if key is not None:
+            self.row_keys[key] = row_id
+        for i, distance in enumerate(lengths):
+            coord1 = points[i]
+            coord2 = points[i + 1]
+            self._add_key(coord1)
+            self._add_key(coord2)
+            # consecutive points closer than the grid merge into one vertex
+            if coord1 != coord2:
+                self._link(coord1, coord2, row_id, row_id, distance)
+
+    def _remove_row(self, row, geom_index, key_index):
+        """
+        Removes the polyline of one previously added dataset row from the graph.
+
+        Only the half-edges carrying the row's attribute index are removed, so segments
+        shared with other rows stay in place. Vertices left without any edge are dropped.
+
+        :param row: The row as it was when it was added.
+        :param geom_index: The index of the geometry column.
+        :param key_index: The index of the key column.
+        """
+        row_id = self.row_keys.pop(row[key_index], None)
+        if row_id is None:
+            return
+        self._compact = None
+        coordinates = [quantize(coordinate) for coordinate in row[geom_index]]
+        for i in range(len(coordinates) - 1):
+            coord1, coord2 = coordinates[i], coordinates[i + 1]
+            for here, there in ((coord1, coord2), (coord2, coord1)):
+                if here in self.vertices:
+                    self.vertices[here].remove(
+                        lambda node: node.info == row_id and node.datapoint[0] == there)
+        for coordinate in coordinates:
+            if coordinate in self.vertices and self.vertices[coordinate].head is None:
+                del self.vertices[coordinate]
+                if self._vertex_index is not None:
+                    self._vertex_index.remove(coordinate)
+        self.attributes.discard(row_id)
+
+    def apply_delta(self, delta, geom_index):
+        """
+        Applies the inserted, removed and modified rows of a dataset delta to the graph.
+
+        Only the polylines of the changed rows are touched; modified rows are removed and
+        added back. The graph version is bumped once per applied delta.
+
+        :param delta: A dict as returned by dataProcessor.diff_datasets.
+        :param geom_index: The index of the geometry column, in both exports.
+        :return: A dict with the sets of 'added_vertices' and 'removed_vertices', for
+                 patching indexes derived from the graph.
+        """
+        key_index = delta["key_index"]
+        old_rows = delta["removed"] + [old_row for old_row, _ in delta["modified"]]
+        new_rows = delta["inserted"] + [new_row for _, new_row in delta["modified"]]
+
+        touched = set()
+        for row in old_rows + new_rows:
+            touched.update(quantize(coordinate) for coordinate in row[geom_index])
+        before = {coordinate for coordinate in touched if coordinate in self.vertices}
+
+        for row in old_rows:
+            self._remove_row(row, geom_index, key_index)
+        for row in new_rows:
+            self._add_row(row, geom_index, key_index)
+        self.version += 1
+
+        after = {coordinate for coordinate in touched if coordinate in self.vertices}
+        return {"added_vertices": after - before, "removed_vertices": before - after}
     
     def find_closest_vertex(self, coordinate):
         """
@@ -126,16 +401,24 @@ class Graph:
         :param coordinate: A tuple containing the latitude and longitude of the coordinate.
         :return: A tuple containing the closest vertex and its distance from the given coordinate.
         """
-        min_distance = float('inf')
-        closest_vertex = None
+        if self._vertex_index is None:
+            from spatialindex import CoordinateIndex
+            self._vertex_index = CoordinateIndex(self.vertices)
+        return self._vertex_index.nearest(coordinate)
 
-        for vertex in self.vertices:
-            distance = self.haversine_distance(coordinate, vertex)
-            if distance < min_distance:
-                min_distance = distance
-                closest_vertex = vertex
+    def entry_vertices(self, coordinates):
+        """
+        Snaps coordinates, such as a park boundary, to their closest graph vertices.
 
-        return closest_vertex, min_distance
+        :param coordinates: A list of coordinates.
+        :return: A dict mapping each closest vertex to the shortest connector distance to it.
+        """
+        entries = {}
+        for coordinate in coordinates:
+            closest_vertex, min_distance = self.find_closest_vertex(coordinate)
+            if closest_vertex is not None and min_distance < entries.get(closest_vertex, float('inf')):
+                entries[closest_vertex] = min_distance
+        return entries
 
     def add_park_coordinates(self, park):
         """
@@ -147,13 +430,17 @@ class Graph:
             closest_vertex, min_distance = self.find_closest_vertex(coordinate)
             self.add_vertex(tuple(coordinate))
             self.add_edge(tuple(coordinate), closest_vertex, park.name, park.name, min_distance)
+        # the graph changed, so indexes built on the previous version are stale
+        self.version += 1
 
-    def get_neighbors(self, vertex):
+    def get_neighbors(self, vertex, mask=None):
         """
         Returns the neighbors of the given vertex.
 
         :param vertex: A tuple containing the latitude and longitude of the vertex.
+        :param mask: An optional ClosureMask; edges it closes are left out.
         :return: A list of tuples containing neighbor vertices, their info, and edge distances.
+                 The info is the edge's record looked up from the attribute table.
         """
         if vertex not in self.vertices:
             raise ValueError("The specified vertex does not exist in the graph.")
@@ -161,66 +448,113 @@ class Graph:
         adjacency_list = self.vertices[vertex]
         current = adjacency_list.head
         while current:
-            neighbor, edge_distance = current.datapoint
-            info = current.info
-            neighbors.append((neighbor, info, edge_distance))
+            if mask is None or mask.allows(current):
+                neighbor, edge_distance = current.datapoint
+                info = self.attributes.get(current.info)
+                neighbors.append((neighbor, info, edge_distance))
             current = current.next
         return neighbors
 
-    def find_shortest_path(self, graph_instance, school_instance, selected_park):
+    def compact(self):
+        """
+        Returns the CompactGraph copy of the graph that searches run on. It is built on the
+        first call and kept until the graph changes.
+
+        :return: A CompactGraph instance.
+        """
+        compact = self._compact
+        if compact is None:
+            from compactgraph import CompactGraph
+            compact = self._compact = CompactGraph.from_graph(self)
+        return compact
+
+    def shortest_distances(self, sources, max_distance=None, mask=None, targets=None, corridor=None):
+        """
+        Runs Dijkstra's algorithm with a binary heap from one or more source vertices, on
+        the CompactGraph copy of the graph.
+
+        :param sources: A dict mapping source vertices to their initial distances.
+        :param max_distance: Stops once the frontier passes this distance, if given.
+        :param mask: An optional ClosureMask of edges, rows and vertices to route around.
+        :param targets: Stops once all of these vertices are settled, if given.
+        :param corridor: An optional tuple of the area of each CompactGraph vertex id and the
+                         set of areas the search may settle, see RegionIndex.shortest_distances.
+        :return: A tuple of a dict of settled vertices to their distances, in settlement
+                 order, and a dict of the settled vertices to their previous vertex (None
+                 for sources).
+        """
+        compact = self.compact()
+        ids, coordinates = compact.ids, compact.coordinates
+        id_sources = {}
+        for vertex, distance in sources.items():
+            vertex_id = ids.get(vertex)
+            if vertex_id is not None and distance < id_sources.get(vertex_id, float('inf')):
+                id_sources[vertex_id] = distance
+        id_targets = None
+        if targets is not None:
+            id_targets = [ids[vertex] for vertex in targets if vertex in ids]
+            if len(id_targets) < len(targets):
+                # a target that is not a vertex is never settled, so nothing stops the search early
+                id_targets = None
+
+        settled, previous = compact.shortest_distances(id_sources, max_distance, id_targets, mask,
+                                                       corridor=corridor)
+        distances = {coordinates[vertex]: distance for vertex, distance in settled.items()}
+        previous_vertices = {coordinates[vertex]: coordinates[previous[vertex]] if previous[vertex] >= 0 else None
+                             for vertex in settled}
+        return distances, previous_vertices
+
+    def find_shortest_path(self, graph_instance, school_instance, selected_park, mask=None, catalogue=None):
         """
         Finds the shortest path between a school and a park using Dijkstra's algorithm.
 
+        The school and the park are snapped to their closest vertices without adding anything
+        to the graph, so indexes derived from it, such as the entry vertices a ParkCatalogue
+        caches per graph version, stay valid.
+
         :param graph_instance: A Graph instance representing the bikeways network.
         :param school_instance: A School instance containing school information and coordinates.
         :param selected_park: A Park instance containing park information and coordinates.
-        :return: A list of vertices representing the shortest path between the school and the park.
-        """    
-        # Add park coordinates to the graph
-        graph_instance.add_park_coordinates(selected_park)
-
-        # Add school coordinates to the graph
-        graph_instance.add_park_coordinates(school_instance)
-
-        # Initialize datapoint structures for Dijkstra's algorithm
-        unvisited_vertices = set(graph_instance.vertices)
-        distances = {vertex: float('inf') for vertex in graph_instance.vertices}
-        distances[tuple(school_instance.coordinates[0])] = 0
-        previous_vertices = {vertex: None for vertex in graph_instance.vertices}
-
-        while unvisited_vertices:
-            current_vertex = min(
-                unvisited_vertices, key=lambda vertex: distances[vertex])
-            unvisited_vertices.remove(current_vertex)
-
-            for neighbor, info, edge_distance in graph_instance.get_neighbors(current_vertex):
-                distance = distances[current_vertex] + edge_distance
-
-                if distance < distances[neighbor]:
-                    distances[neighbor] = distance
-                    previous_vertices[neighbor] = current_vertex
-
-        # Reconstruct the shortest path to the park
-        shortest_path = []
-        min_distance = float('inf')
-        park_vertex = None
+        :param mask: An optional ClosureMask of edges, rows and vertices to route around.
+        :param catalogue: An optional ParkCatalogue whose cached entry vertices are used for the park.
+        :return: A list of vertices representing the shortest path between the school and the park,
+                 from the school coordinate to the park coordinate closest to the last vertex.
+        """
+        start = quantize(school_instance.coordinates[0])
+        start_vertex, start_connector = graph_instance.find_closest_vertex(start)
+        if catalogue is None:
+            entries = graph_instance.entry_vertices(selected_park.coordinates)
+        else:
+            entries = catalogue.entry_vertices(graph_instance, selected_park)
+        if start_vertex is None or not entries:
+            raise ValueError("No path found")
 
-        # Check for the shortest distance to any park coordinate
-        for park_coord in selected_park.coordinates:
-            park_tuple = tuple(park_coord)
-            if distances[park_tuple] < min_distance:
-                min_distance = distances[park_tuple]
-                park_vertex = park_tuple
+        # Run Dijkstra's algorithm until every entry vertex of the park is settled
+        distances, previous_vertices = graph_instance.shortest_distances(
+            {start_vertex: start_connector}, mask=mask, targets=entries)
 
+        # Pick the entry vertex with the shortest distance, its connector included
+        park_vertex = min((vertex for vertex in entries if vertex in distances),
+                          key=lambda vertex: distances[vertex] + entries[vertex], default=None)
         if park_vertex is None:
             raise ValueError("No path found") # No path found
 
+        # Reconstruct the shortest path to the park
+        shortest_path = []
         current_vertex = park_vertex
         while current_vertex is not None:
             shortest_path.append(current_vertex)
             current_vertex = previous_vertices[current_vertex]
-
-        return shortest_path[::-1]
+        shortest_path.reverse()
+
+        # Add the connectors at both ends
+        if shortest_path[0] != start:
+            shortest_path.insert(0, start)
+        park_coordinate = quantize(min(selected_park.coordinates,
+                                       key=lambda coordinate: haversine_distance(tuple(coordinate), park_vertex)))
+        if park_coordinate != shortest_path[-1]:
+            shortest_path.append(park_coordinate)
+        return shortest_path
     
 
     def plot_graph(self, shortest_path=None):
@@ -237,6 +571,11 @@ class Graph:
         Raises:
             ValueError: If the graph is empty.
         """
+        # the plotting and GIS stacks are slow to import and only needed here
+        import matplotlib.pyplot as plt
+        import geopandas as gpd
+        from shapely.geometry import LineString, Point
+
         if not self.vertices:
             raise ValueError("The graph is empty. Add vertices before plotting.")
 
@@ -1,4 +1,7 @@
 from classbuilder import *
+import os
+import subprocess
+import sys
 import unittest
 from parkbuilder import *
 from startpointbuilder import *
@@ -147,6 +150,100 @@ class TestGraph(unittest.TestCase):
         self.assertIn((coord2, info2, distance1), neighbors)
         self.assertIn((coord3, info3, distance2), neighbors)
 
+    def test_build_graph_attribute_table(self):
+        """
+        Tests that build_graph stores one interned attribute record per row and edges only keep row indices.
+        """
+        parsed_data = [
+            ["Object ID", "Bike Route Name", "Geom"],
+            ["1", "Highbury", [[0, 0], [0, 1], [0, 2]]],
+            ["2", "".join(["High", "bury"]), [[0, 2], [1, 2]]],
+        ]
+        self.graph.build_graph(parsed_data, 2)
+
+        # happy case: one record per source row, geometry column dropped
+        self.assertEqual(len(self.graph.attributes), 2)
+        self.assertEqual(self.graph.attributes.columns, ["Object ID", "Bike Route Name"])
+        self.assertEqual(self.graph.attributes.get_value(0, "Bike Route Name"), "Highbury")
+
+        # regular: half-edges hold the row index, neighbors resolve it from the table
+        self.assertIsInstance(self.graph.vertices[(0, 1)].head.info, int)
+        neighbors = self.graph.get_neighbors((0, 2))
+        self.assertEqual(len(neighbors), 2)
+        self.assertIn(((1, 2), ("2", "Highbury"), self.graph.haversine_distance((0, 2), (1, 2))), neighbors)
+
+        # repeated strings share a single object across rows
+        first, second = self.graph.attributes.get(0), self.graph.attributes.get(1)
+        self.assertIs(first[1], second[1])
+
+        # unknown column
+        self.assertIsNone(self.graph.attributes.get_value(0, "Status"))
+
+    def test_build_graph_merges_near_identical_vertices(self):
+        """
+        Tests that coordinates differing by float noise or under a centimeter are one vertex.
+        """
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[-123.1, 49.2], [-123.09, 49.21]]],
+            # starts where row 1 ends, up to float noise, and repeats a point 1 mm on
+            ["2", [[-123.09000000000001, 49.21], [-123.09, 49.22], [-123.09000001, 49.22]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.assertEqual(set(self.graph.vertices), {(-123.1, 49.2), (-123.09, 49.21), (-123.09, 49.22)})
+        self.assertEqual(len(self.graph.get_neighbors((-123.09, 49.21))), 2)
+        # no edge from a vertex to itself
+        self.assertEqual([neighbor for neighbor, _, _ in self.graph.get_neighbors((-123.09, 49.22))], [(-123.09, 49.21)])
+        self.assertEqual(quantize((-123.09000000000001, 49.21)), (-123.09, 49.21))
+
+        # removing the row by its noisy coordinates leaves the other row intact
+        self.graph.apply_delta({"key_index": 0, "inserted": [], "removed": [parsed_data[2]], "modified": []}, 1)
+        self.assertEqual(set(self.graph.vertices), {(-123.1, 49.2), (-123.09, 49.21)})
+
+    def test_apply_delta(self):
+        """
+        Tests that apply_delta patches the graph to the same state as a rebuild from the new data.
+        """
+        old_data = [
+            ["Object ID", "Status", "Geom"],
+            ["1", "Active", [[0, 0], [0, 1]]],
+            ["2", "Active", [[0, 1], [0, 2]]],
+            ["3", "Active", [[0, 2], [0, 3]]],
+        ]
+        new_data = [
+            ["Object ID", "Status", "Geom"],
+            ["1", "Active", [[0, 0], [0, 1]]],
+            ["3", "Closed", [[0, 2], [0, 3]]],
+            ["4", "Active", [[0, 1], [1, 1]]],
+        ]
+        self.graph.build_graph(old_data, 2)
+        delta = {"key_index": 0, "inserted": [new_data[3]], "removed": [old_data[2]],
+                 "modified": [(old_data[3], new_data[2])]}
+        changes = self.graph.apply_delta(delta, 2)
+
+        rebuilt = Graph()
+        rebuilt.build_graph(new_data, 2)
+        self.assertEqual(set(self.graph.vertices), set(rebuilt.vertices))
+        for vertex in rebuilt.vertices:
+            self.assertCountEqual(self.graph.get_neighbors(vertex), rebuilt.get_neighbors(vertex))
+
+        # happy case: version bumped and vertex changes reported for index patching
+        self.assertEqual(self.graph.version, 1)
+        self.assertEqual(changes["added_vertices"], {(1, 1)})
+        self.assertEqual(changes["removed_vertices"], set())
+        self.assertEqual(set(self.graph.row_keys), {"1", "3", "4"})
+
+    def test_core_import_is_lightweight(self):
+        """
+        Tests that the routing core imports without loading the plotting and GIS stacks.
+        """
+        heavy = ["matplotlib", "geopandas", "shapely", "folium", "requests"]
+        code = ("import sys, classbuilder, dataProcessor, closuremask, reachability, alternativeroutes, nearestpark; "
+                f"print([module for module in {heavy!r} if module in sys.modules])")
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
     def test_find_shortest_path(self):
         """
         Tests the get_neighbors method.
@@ -193,5 +290,27 @@ class TestGraph(unittest.TestCase):
         expected_path = [coord4, coord5, coord1]
         self.assertEqual(path, expected_path)
 
+    def test_find_shortest_path_leaves_graph_unchanged(self):
+        """
+        Tests that a query snaps the school and park without adding to the graph, so the
+        entry vertices a catalogue caches stay valid.
+        """
+        parsed_data = [["Object ID", "Geom"], ["1", [[0, 0], [0, 0.01], [0, 0.02]]]]
+        self.graph.build_graph(parsed_data, 1)
+        park = Park([(0.001, 0.02), (0.001, 0.021)], None, "North")
+        catalogue = ParkCatalogue([park])
+        entries = catalogue.entry_vertices(self.graph, park)
+        vertices, edges, version = len(self.graph.vertices), self.graph.edge_count, self.graph.version
+
+        path = self.graph.find_shortest_path(self.graph, StartPoint("School", [(0.001, 0)]), park, catalogue=catalogue)
+        self.assertEqual(path, [(0.001, 0), (0, 0), (0, 0.01), (0, 0.02), (0.001, 0.02)])
+        self.assertEqual((len(self.graph.vertices), self.graph.edge_count, self.graph.version), (vertices, edges, version))
+        self.assertIs(catalogue.entry_vertices(self.graph, park), entries)
+
+        # adding park coordinates does change the graph, and invalidates the cached entries
+        self.graph.add_park_coordinates(park)
+        self.assertEqual(self.graph.version, version + 1)
+        self.assertIsNot(catalogue.entry_vertices(self.graph, park), entries)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,189 @@
+from classbuilder import quantize
+
+
+class Bitset:
+    """
+    A growable set of non-negative integers stored one bit each in a bytearray.
+    """
+
+    def __init__(self):
+        self.bits = bytearray()
+
+    def add(self, number):
+        """
+        Sets the bit of the given number.
+
+        :param number: A non-negative integer.
+        """
+        byte_index = number >> 3
+        if byte_index >= len(self.bits):
+            self.bits.extend(bytes(byte_index + 1 - len(self.bits)))
+        self.bits[byte_index] |= 1 << (number & 7)
+
+    def discard(self, number):
+        """
+        Clears the bit of the given number, if it is set.
+
+        :param number: A non-negative integer.
+        """
+        byte_index = number >> 3
+        if byte_index < len(self.bits):
+            self.bits[byte_index] &= ~(1 << (number & 7)) & 0xFF
+
+    def clear(self):
+        """
+        Clears every bit.
+        """
+        self.bits = bytearray()
+
+    def union(self, other):
+        """
+        Sets every bit that is set in another bitset.
+
+        :param other: A Bitset instance.
+        """
+        if len(other.bits) > len(self.bits):
+            self.bits.extend(bytes(len(other.bits) - len(self.bits)))
+        for byte_index, byte in enumerate(other.bits):
+            if byte:
+                self.bits[byte_index] |= byte
+
+    def __contains__(self, number):
+        byte_index = number >> 3
+        return byte_index < len(self.bits) and bool(self.bits[byte_index] >> (number & 7) & 1)
+
+    def __len__(self):
+        return sum(bin(byte).count("1") for byte in self.bits)
+
+
+class ClosureMask:
+    """
+    A class representing closed parts of a Graph that searches route around at query time.
+
+    A mask never modifies the graph, so any number of masks can be kept side by side,
+    e.g. one per client, and passed to the search that should honor it. Edges are
+    closed by edge id, whole bikeway rows by attribute row index, and vertices by
+    coordinate. Closing and reopening cost O(closures), never a graph rebuild.
+    """
+
+    def __init__(self):
+        self.edges = Bitset()
+        self.rows = Bitset()
+        self.vertices = set()
+
+    def close_edge(self, edge_id):
+        """
+        Closes a single edge.
+
+        :param edge_id: The edge_id shared by the edge's two half-edges.
+        """
+        self.edges.add(edge_id)
+
+    def open_edge(self, edge_id):
+        """
+        Reopens a single edge.
+
+        :param edge_id: The edge_id shared by the edge's two half-edges.
+        """
+        self.edges.discard(edge_id)
+
+    def close_row(self, row_id):
+        """
+        Closes every edge built from one dataset row.
+
+        :param row_id: The attribute row index of the row.
+        """
+        self.rows.add(row_id)
+
+    def open_row(self, row_id):
+        """
+        Reopens every edge built from one dataset row.
+
+        :param row_id: The attribute row index of the row.
+        """
+        self.rows.discard(row_id)
+
+    def close_vertex(self, coordinate):
+        """
+        Closes a vertex, so no edge leading into it is used.
+
+        :param coordinate: The coordinate tuple of the vertex, rounded as the Graph rounds it.
+        """
+        self.vertices.add(quantize(coordinate))
+
+    def open_vertex(self, coordinate):
+        """
+        Reopens a vertex.
+
+        :param coordinate: The coordinate tuple of the vertex.
+        """
+        self.vertices.discard(quantize(coordinate))
+
+    def close_keys(self, graph, keys):
+        """
+        Closes the dataset rows with the given keys, e.g. Object IDs from a closure list.
+
+        :param graph: The Graph the rows were loaded into.
+        :param keys: An iterable of row keys; keys not in the graph are ignored.
+        :return: The number of rows closed.
+        """
+        closed = 0
+        for key in keys:
+            row_id = graph.row_keys.get(key)
+            if row_id is not None:
+                self.rows.add(row_id)
+                closed += 1
+        return closed
+
+    def close_rows_where(self, graph, column, predicate):
+        """
+        Closes the dataset rows whose value in a column matches a predicate.
+
+        For example, close_rows_where(graph, "Status", lambda status: status != "Active").
+
+        :param graph: The Graph the rows were loaded into.
+        :param column: The column name, as found in the dataset header.
+        :param predicate: A function taking the column value and returning True to close the row.
+        :return: The number of rows closed.
+        """
+        if column not in graph.attributes.columns:
+            raise ValueError(f"The graph attributes have no column {column!r}.")
+        closed = 0
+        for row_id, record in enumerate(graph.attributes.rows):
+            if isinstance(record, tuple) and predicate(graph.attributes.get_value(row_id, column)):
+                self.rows.add(row_id)
+                closed += 1
+        return closed
+
+    def clear(self):
+        """
+        Reopens everything closed by this mask.
+        """
+        self.edges.clear()
+        self.rows.clear()
+        self.vertices.clear()
+
+    def allows(self, node):
+        """
+        Tells whether a half-edge may be used by a search.
+
+        :param node: A Vectex from a vertex's adjacency list.
+        :return: False if the edge, its row or the vertex it leads to is closed.
+        """
+        return not (node.edge_id in self.edges or node.info in self.rows
+                    or node.datapoint[0] in self.vertices)
+
+    @classmethod
+    def combine(cls, *masks):
+        """
+        Creates a new mask closing everything closed by any of the given masks.
+
+        :param masks: ClosureMask instances.
+        :return: A new ClosureMask.
+        """
+        combined = cls()
+        for mask in masks:
+            combined.edges.union(mask.edges)
+            combined.rows.union(mask.rows)
+            combined.vertices.update(mask.vertices)
+        return combined
@@ -0,0 +1,124 @@
+import unittest
+from classbuilder import Graph
+from closuremask import Bitset, ClosureMask
+from parkbuilder import Park
+from startpointbuilder import StartPoint
+
+
+class TestBitset(unittest.TestCase):
+    """
+    A unittest class for testing the Bitset class.
+    """
+
+    def test_add_discard(self):
+        """
+        Tests setting, clearing and combining bits.
+        """
+        bitset = Bitset()
+        self.assertNotIn(3, bitset)
+
+        # happy case
+        bitset.add(3)
+        bitset.add(100)
+        self.assertIn(3, bitset)
+        self.assertIn(100, bitset)
+        self.assertNotIn(4, bitset)
+        self.assertEqual(len(bitset), 2)
+
+        bitset.discard(3)
+        self.assertNotIn(3, bitset)
+        # discarding a bit past the end is a no-op
+        bitset.discard(5000)
+
+        other = Bitset()
+        other.add(7)
+        bitset.union(other)
+        self.assertIn(7, bitset)
+        self.assertIn(100, bitset)
+
+        bitset.clear()
+        self.assertEqual(len(bitset), 0)
+
+
+class TestClosureMask(unittest.TestCase):
+    """
+    A unittest class for testing searches that honor a ClosureMask.
+    """
+
+    def setUp(self):
+        # 1 - 2 - 3 - 4
+        # |           |
+        # 5 ———————————
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Status", "Geom"],
+            ["10", "Active", [[0, 0], [0, 1], [0, 2], [0, 3]]],
+            ["11", "Active", [[0, 0], [1, 1]]],
+            ["12", "Legacy", [[1, 1], [0, 3]]],
+        ]
+        self.graph.build_graph(parsed_data, 2)
+
+    def test_close_edge(self):
+        """
+        Tests that a closed edge is left out of the neighbors, without touching the graph.
+        """
+        node = self.graph.vertices[(0, 0)].head
+        mask = ClosureMask()
+        mask.close_edge(node.edge_id)
+        self.assertEqual(len(self.graph.get_neighbors((0, 0))), 2)
+        self.assertEqual(len(self.graph.get_neighbors((0, 0), mask)), 1)
+        # the other half of the edge is closed as well
+        self.assertEqual(len(self.graph.get_neighbors(node.datapoint[0], mask)), 1)
+
+        mask.open_edge(node.edge_id)
+        self.assertEqual(len(self.graph.get_neighbors((0, 0), mask)), 2)
+
+    def test_close_rows_where(self):
+        """
+        Tests closing rows by their Status column and by their key.
+        """
+        mask = ClosureMask()
+        closed = mask.close_rows_where(self.graph, "Status", lambda status: status != "Active")
+        self.assertEqual(closed, 1)
+        self.assertEqual([neighbor for neighbor, _, _ in self.graph.get_neighbors((1, 1), mask)], [(0, 0)])
+
+        mask.clear()
+        self.assertEqual(mask.close_keys(self.graph, ["11", "missing"]), 1)
+        self.assertEqual([neighbor for neighbor, _, _ in self.graph.get_neighbors((1, 1), mask)], [(0, 3)])
+
+        # Error handle case
+        with self.assertRaises(ValueError):
+            mask.close_rows_where(self.graph, "Unknown", bool)
+
+    def test_masks_coexist(self):
+        """
+        Tests that several masks can be used side by side and combined.
+        """
+        row_mask = ClosureMask()
+        row_mask.close_keys(self.graph, ["10"])
+        vertex_mask = ClosureMask()
+        vertex_mask.close_vertex((1, 1))
+
+        self.assertEqual(len(self.graph.get_neighbors((0, 0), row_mask)), 1)
+        self.assertEqual(len(self.graph.get_neighbors((0, 0), vertex_mask)), 1)
+        combined = ClosureMask.combine(row_mask, vertex_mask)
+        self.assertEqual(self.graph.get_neighbors((0, 0), combined), [])
+        # combining does not change the original masks
+        self.assertEqual(len(self.graph.get_neighbors((0, 0), row_mask)), 1)
+
+    def test_find_shortest_path_with_mask(self):
+        """
+        Tests that find_shortest_path routes around the closures of a mask.
+        """
+        startpoint = StartPoint("Start", [(0, 0)])
+        park = Park([(0, 3)], None, "Park")
+        self.assertEqual(self.graph.find_shortest_path(self.graph, startpoint, park), [(0, 0), (0, 1), (0, 2), (0, 3)])
+
+        mask = ClosureMask()
+        mask.close_vertex((0, 2))
+        path = self.graph.find_shortest_path(self.graph, startpoint, park, mask)
+        self.assertEqual(path, [(0, 0), (1, 1), (0, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
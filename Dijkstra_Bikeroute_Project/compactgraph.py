@@ -0,0 +1,308 @@
+import bisect
+import heapq
+import time
+import tracemalloc
+from array import array
+
+import classbuilder
+import dataProcessor
+from parallelbuilder import BIKEWAYS_FILE
+
+DECIMALS = classbuilder.COORDINATE_DECIMALS
+SCALE = 10 ** DECIMALS  # integer units per degree, roughly 1 cm
+
+
+def _spread(value):
+    """
+    Spreads the 32 bits of a value over the even bits of a 64-bit integer.
+    """
+    value &= 0xFFFFFFFF
+    value = (value | value << 16) & 0x0000FFFF0000FFFF
+    value = (value | value << 8) & 0x00FF00FF00FF00FF
+    value = (value | value << 4) & 0x0F0F0F0F0F0F0F0F
+    value = (value | value << 2) & 0x3333333333333333
+    value = (value | value << 1) & 0x5555555555555555
+    return value
+
+
+def _compact(value):
+    """
+    Gathers the even bits of a 64-bit integer back into 32 bits.
+    """
+    value &= 0x5555555555555555
+    value = (value | value >> 1) & 0x3333333333333333
+    value = (value | value >> 2) & 0x0F0F0F0F0F0F0F0F
+    value = (value | value >> 4) & 0x00FF00FF00FF00FF
+    value = (value | value >> 8) & 0x0000FFFF0000FFFF
+    value = (value | value >> 16) & 0x00000000FFFFFFFF
+    return value
+
+
+def vertex_key(coordinate):
+    """
+    Packs a (longitude, latitude) coordinate into one 64-bit key.
+
+    Both components are quantized to SCALE units per degree, shifted to be non-negative and
+    interleaved bit by bit into a Morton code, so sorting keys sorts vertices along a
+    Z-order curve and coordinates that round to the same units share a key.
+
+    :param coordinate: A (longitude, latitude) tuple.
+    :return: The key as an int below 2 ** 64.
+    """
+    x = round((coordinate[0] + 180.0) * SCALE)
+    y = round((coordinate[1] + 90.0) * SCALE)
+    return _spread(x) | _spread(y) << 1
+
+
+def key_coordinate(key):
+    """
+    Unpacks a key made by vertex_key.
+
+    :param key: The key.
+    :return: The quantized (longitude, latitude) coordinate.
+    """
+    return (round(_compact(key) / SCALE - 180.0, DECIMALS), round(_compact(key >> 1) / SCALE - 90.0, DECIMALS))
+
+
+class CompactGraph:
+    """
+    A class holding a read-only copy of a Graph in compressed sparse row arrays.
+
+    Vertices are numbered in Morton order of their keys, so spatially close vertices sit
+    next to each other in the arrays. The neighbors of vertex i are targets[offsets[i]:offsets[i + 1]],
+    with the edge lengths in the same slice of weights, the attribute row ids in rows and
+    the edge ids in edge_ids. Every search of a Graph runs on the copy it keeps, see
+    Graph.compact; coordinates and ids translate between the two.
+    """
+
+    def __init__(self, keys, offsets, targets, weights, rows, edge_ids, coordinates, attributes=None, version=None):
+        self.keys = keys
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.rows = rows
+        self.edge_ids = edge_ids
+        # the Graph's vertex of each id, and the id of each Graph vertex
+        self.coordinates = coordinates
+        self.ids = {coordinate: position for position, coordinate in enumerate(coordinates)}
+        self.attributes = attributes
+        self.version = version
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Compacts a Graph. The Graph keys its vertices by the same rounded coordinates as
+        the keys, so each vertex gets its own id; vertices that would still share a key
+        are merged and edges between them dropped.
+
+        :param graph: A Graph instance representing the bikeways network.
+        :return: The CompactGraph, sharing the graph's attribute table.
+        """
+        vertex_keys = {vertex: vertex_key(vertex) for vertex in graph.vertices}
+        keys = array('Q', sorted(set(vertex_keys.values())))
+        ids = {key: position for position, key in enumerate(keys)}
+        coordinates = [None] * len(keys)
+
+        adjacency = [[] for _ in keys]
+        for vertex, adjacency_list in graph.vertices.items():
+            source = ids[vertex_keys[vertex]]
+            if coordinates[source] is None:
+                coordinates[source] = vertex
+            current = adjacency_list.head
+            while current:
+                neighbor, distance = current.datapoint
+                target = ids[vertex_keys[neighbor]]
+                if target != source:
+                    adjacency[source].append((target, distance, current.info, current.edge_id))
+                current = current.next
+
+        offsets = array('l', [0])
+        targets, weights, rows, edge_ids = array('l'), array('d'), array('l'), array('l')
+        for edges in adjacency:
+            edges.sort()
+            for target, distance, row, edge_id in edges:
+                targets.append(target)
+                weights.append(distance)
+                rows.append(row)
+                edge_ids.append(edge_id)
+            offsets.append(len(targets))
+        return cls(keys, offsets, targets, weights, rows, edge_ids, coordinates, graph.attributes, graph.version)
+
+    def vertex_id(self, coordinate):
+        """
+        Looks up the vertex at a coordinate by binary search over the sorted keys.
+
+        :param coordinate: A (longitude, latitude) tuple.
+        :return: The vertex id, or None if no vertex has that key.
+        """
+        key = vertex_key(coordinate)
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def coordinate(self, vertex_id):
+        """
+        Returns the quantized coordinate of a vertex.
+
+        :param vertex_id: The vertex id.
+        :return: A (longitude, latitude) tuple.
+        """
+        return key_coordinate(self.keys[vertex_id])
+
+    def closures(self, mask=None, closed=None):
+        """
+        Translates a ClosureMask to the ids the searches test edges against.
+
+        :param mask: A ClosureMask, or None.
+        :param closed: An optional set of vertex ids closed on top of the mask.
+        :return: A tuple of the closed edge ids, the closed attribute rows and the set of
+                 closed vertex ids, or None if nothing is closed.
+        """
+        if mask is None and not closed:
+            return None
+        vertices = set(closed) if closed else set()
+        if mask is None:
+            return (), (), vertices
+        for coordinate in mask.vertices:
+            vertex = self.ids.get(coordinate)
+            if vertex is not None:
+                vertices.add(vertex)
+        return mask.edges, mask.rows, vertices
+
+    def shortest_distances(self, sources, max_distance=None, targets=None, mask=None, closed=None, corridor=None):
+        """
+        Runs Dijkstra's algorithm over the arrays, with vertex ids in the heap.
+
+        :param sources: A dict mapping source vertex ids to their initial distances.
+        :param max_distance: Stops once the frontier passes this distance, if given.
+        :param targets: Stops once all of these vertex ids are settled, if given.
+        :param mask: An optional ClosureMask of edges, rows and vertices to route around.
+        :param closed: An optional set of vertex ids no edge may lead into.
+        :param corridor: An optional tuple of a sequence of the area of each vertex id and the
+                         set of areas the search may settle, as built by RegionIndex. A vertex
+                         of another area is dropped the first time it is popped.
+        :return: A tuple of a dict of settled vertex ids to their distances, in settlement
+                 order, and a list of the previous vertex id of each vertex (-1 for sources
+                 and unreached vertices).
+        """
+        count = len(self.keys)
+        tentative = [float('inf')] * count
+        previous = [-1] * count
+        settled = [False] * count
+        distances = {}
+        offsets, neighbors, weights = self.offsets, self.targets, self.weights
+        closures = self.closures(mask, closed)
+        if closures is not None:
+            closed_edges, closed_rows, closed_vertices = closures
+            edge_ids, rows = self.edge_ids, self.rows
+        for vertex, distance in sources.items():
+            if distance < tentative[vertex]:
+                tentative[vertex] = distance
+        heap = [(distance, vertex) for vertex, distance in sources.items() if tentative[vertex] == distance]
+        heapq.heapify(heap)
+        remaining = set(targets) if targets is not None else None
+        if corridor is not None:
+            regions, allowed = corridor
+
+        while heap:
+            distance, vertex = heapq.heappop(heap)
+            if settled[vertex]:
+                continue
+            if max_distance is not None and distance > max_distance:
+                break
+            settled[vertex] = True
+            if corridor is not None and regions[vertex] not in allowed:
+                # marked settled, so later relaxations do not push it again
+                continue
+            distances[vertex] = distance
+            if remaining is not None:
+                remaining.discard(vertex)
+                if not remaining:
+                    break
+            for position in range(offsets[vertex], offsets[vertex + 1]):
+                neighbor = neighbors[position]
+                if closures is not None and (edge_ids[position] in closed_edges or rows[position] in closed_rows
+                                             or neighbor in closed_vertices):
+                    continue
+                new_distance = distance + weights[position]
+                if new_distance < tentative[neighbor] and not settled[neighbor]:
+                    tentative[neighbor] = new_distance
+                    previous[neighbor] = vertex
+                    heapq.heappush(heap, (new_distance, neighbor))
+        return distances, previous
+
+    def shortest_path(self, start_coordinate, end_coordinate):
+        """
+        Finds the shortest path between two vertices.
+
+        :param start_coordinate: The coordinate of the start vertex.
+        :param end_coordinate: The coordinate of the end vertex.
+        :return: A tuple of the path as a list of quantized coordinates and its length, or
+                 ([], inf) if either coordinate is not a vertex or no path exists.
+        """
+        start, end = self.vertex_id(start_coordinate), self.vertex_id(end_coordinate)
+        if start is None or end is None:
+            return [], float('inf')
+        distances, previous = self.shortest_distances({start: 0}, targets=[end])
+        if end not in distances:
+            return [], float('inf')
+        path = [end]
+        while path[-1] != start:
+            path.append(previous[path[-1]])
+        return [self.coordinate(vertex) for vertex in reversed(path)], distances[end]
+
+
+def compare_graphs(path=BIKEWAYS_FILE, searches=20):
+    """
+    Measures the memory held by a Graph and by the CompactGraph its searches run on, and
+    times full single-source searches from the same vertices through Graph.shortest_distances,
+    which translates coordinates to ids and back, and directly on the ids.
+
+    :param path: The path of the bikeways CSV file, by default the bundled copy.
+    :param searches: The number of searches timed on each graph.
+    :return: A dict with the 'graph_bytes' and 'compact_bytes' held, the mean 'graph_search'
+             and 'compact_search' times in seconds, and the 'graph_vertices' and
+             'compact_vertices' counts.
+    """
+    parsed_data = dataProcessor.parse_csv_data(dataProcessor.read_csv_file(path))
+    geom_index = dataProcessor.extract_index_str(parsed_data[0], "Geom")
+    for row in parsed_data[1:]:
+        row[geom_index] = dataProcessor.extract_coordinates(row[geom_index])
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = classbuilder.Graph()
+    graph.build_graph(parsed_data, geom_index)
+    graph_bytes = tracemalloc.get_traced_memory()[0] - before
+
+    before = tracemalloc.get_traced_memory()[0]
+    compact = graph.compact()
+    compact_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # the attribute table is shared, so it only counts towards the graph
+
+    starts = list(graph.vertices)[::max(1, len(graph.vertices) // searches)][:searches]
+    begin = time.perf_counter()
+    for start in starts:
+        graph.shortest_distances({start: 0})
+    graph_search = (time.perf_counter() - begin) / len(starts)
+
+    begin = time.perf_counter()
+    for start in starts:
+        compact.shortest_distances({compact.vertex_id(start): 0})
+    compact_search = (time.perf_counter() - begin) / len(starts)
+
+    return {"graph_bytes": graph_bytes, "compact_bytes": compact_bytes,
+            "graph_search": graph_search, "compact_search": compact_search,
+            "graph_vertices": len(graph.vertices), "compact_vertices": len(compact)}
+
+
+if __name__ == '__main__':
+    result = compare_graphs()
+    print(f"vertices: {result['graph_vertices']} -> {result['compact_vertices']}")
+    print(f"memory:   {result['graph_bytes'] / 2 ** 20:.1f} MiB -> {result['compact_bytes'] / 2 ** 20:.1f} MiB")
+    print(f"search:   {result['graph_search'] * 1000:.1f} ms by coordinates, {result['compact_search'] * 1000:.1f} ms by ids")
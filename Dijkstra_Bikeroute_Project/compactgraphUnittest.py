@@ -0,0 +1,111 @@
+import unittest
+from classbuilder import Graph
+from compactgraph import *
+
+
+class TestCompactGraph(unittest.TestCase):
+    """
+    A unittest class for testing the CompactGraph class and its vertex keys.
+    """
+
+    def setUp(self):
+        # two rows whose shared endpoint differs in the 12th decimal
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[-123.1, 49.2], [-123.1, 49.21], [-123.09, 49.21]]],
+            ["2", [[-123.090000000001, 49.21], [-123.09, 49.22]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.compact = CompactGraph.from_graph(self.graph)
+
+    def test_vertex_key(self):
+        """
+        Tests the round trip of keys and that their order follows the Z-order curve.
+        """
+        coordinate = (-123.1155401, 49.2807472)
+        self.assertEqual(key_coordinate(vertex_key(coordinate)), coordinate)
+        self.assertLess(vertex_key(coordinate), 2 ** 64)
+        # equal up to the centimeter
+        self.assertEqual(vertex_key((-123.1, 49.2)), vertex_key((-123.10000000001, 49.2)))
+
+        # the four cells of a square come in Z order
+        x, y = -123.1, 49.2
+        unit = 1 / SCALE
+        corners = [(x, y), (x + unit, y), (x, y + unit), (x + unit, y + unit)]
+        self.assertEqual(sorted(corners, key=vertex_key), corners)
+
+    def test_from_graph(self):
+        """
+        Tests that the arrays hold every vertex and edge, near-identical vertices being
+        merged already by the Graph.
+        """
+        self.assertEqual(len(self.graph.vertices), 4)
+        self.assertEqual(len(self.compact), 4)
+        self.assertEqual(list(self.compact.keys), sorted(self.compact.keys))
+        # each of the 3 edges twice
+        self.assertEqual(len(self.compact.targets), 6)
+        self.assertEqual(self.compact.offsets[-1], 6)
+
+        merged = self.compact.vertex_id((-123.09, 49.21))
+        self.assertEqual(self.compact.offsets[merged + 1] - self.compact.offsets[merged], 2)
+        self.assertIsNone(self.compact.vertex_id((0, 0)))
+
+    def test_shortest_path(self):
+        """
+        Tests that searches give the Graph's distances, across the merged vertex.
+        """
+        path, distance = self.compact.shortest_path((-123.1, 49.2), (-123.09, 49.22))
+        self.assertEqual(path, [(-123.1, 49.2), (-123.1, 49.21), (-123.09, 49.21), (-123.09, 49.22)])
+        haversine = self.graph.haversine_distance
+        self.assertAlmostEqual(distance, haversine((-123.1, 49.2), (-123.1, 49.21))
+                               + haversine((-123.1, 49.21), (-123.09, 49.21))
+                               + haversine((-123.09, 49.21), (-123.09, 49.22)))
+
+        start = self.compact.vertex_id((-123.1, 49.2))
+        distances, _ = self.compact.shortest_distances({start: 0}, max_distance=1.2)
+        self.assertEqual(len(distances), 2)
+
+        # Not a vertex
+        self.assertEqual(self.compact.shortest_path((0, 0), (-123.09, 49.22)), ([], float('inf')))
+
+    def test_shortest_distances_mask(self):
+        """
+        Tests that searches route around the closed edges, rows and vertices of a mask.
+        """
+        from closuremask import ClosureMask
+        start = self.compact.vertex_id((-123.1, 49.2))
+        end = self.compact.vertex_id((-123.09, 49.22))
+        mask = ClosureMask()
+        mask.close_vertex((-123.09, 49.21))
+        distances, _ = self.compact.shortest_distances({start: 0}, mask=mask)
+        self.assertEqual(len(distances), 2)
+        self.assertNotIn(end, distances)
+
+        mask = ClosureMask()
+        mask.close_keys(self.graph, ["2"])
+        self.assertNotIn(end, self.compact.shortest_distances({start: 0}, mask=mask)[0])
+        # vertex ids closed on top of the mask
+        distances, _ = self.compact.shortest_distances({start: 0}, closed={self.compact.vertex_id((-123.1, 49.21))})
+        self.assertEqual(list(distances), [start])
+
+    def test_graph_searches_use_compact(self):
+        """
+        Tests that the Graph searches on a compact copy, kept until the graph changes.
+        """
+        compact = self.graph.compact()
+        self.assertIs(self.graph.compact(), compact)
+        distances, previous_vertices = self.graph.shortest_distances({(-123.1, 49.2): 0})
+        self.assertEqual(list(distances), [compact.coordinates[vertex] for vertex in
+                                           compact.shortest_distances({compact.ids[(-123.1, 49.2)]: 0})[0]])
+        self.assertEqual(previous_vertices[(-123.09, 49.22)], (-123.09, 49.21))
+        self.assertIsNone(previous_vertices[(-123.1, 49.2)])
+
+        self.graph.add_vertex((-123.08, 49.22))
+        self.graph.add_edge((-123.09, 49.22), (-123.08, 49.22), "3", "3", 0.7)
+        self.assertIsNot(self.graph.compact(), compact)
+        self.assertIn((-123.08, 49.22), self.graph.shortest_distances({(-123.1, 49.2): 0})[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,20 @@
-import requests
-import geopandas as gpd
+# requests and geopandas are imported by the functions that need them, so the parsing
+# helpers can be used without loading either
+import codecs
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 PARKDATA = 'https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/parks-polygon-representation/exports/csv?lang=en&timezone=America%2FLos_Angeles&use_labels=true&delimiter=%3B'
 BIKEDATA = 'https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/bikeways/exports/csv?lang=en&timezone=America%2FLos_Angeles&use_labels=true&delimiter=%3B'
 VANCOUVERMAP = 'https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/local-area-boundary/exports/geojson?lang=en&timezone=America%2FLos_Angeles'
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+DOWNLOAD_TIMEOUT = (10, 30)  # seconds to connect, and between two chunks of the body
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF = 1.0  # seconds before the first retry, doubled for each further one
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 
 def download_csv_file(url):
@@ -14,6 +25,8 @@ def download_csv_file(url):
     :return: The raw CSV data as a string, or None if an error occurs.
     :raises: ValueError if the response content type is not CSV.
     """
+    import requests
+
     try:
         response = requests.get(url)
         response.raise_for_status()
@@ -39,6 +52,17 @@ def download_csv_file(url):
         return None
     
 
+def read_csv_file(path):
+    """
+    Reads CSV data from a local file, such as the copies bundled in the dataset folder.
+
+    :param path: The path of the CSV file.
+    :return: The raw CSV data as a string.
+    """
+    with open(path, encoding='utf-8-sig') as csv_file:
+        return csv_file.read()
+
+
 def parse_csv_data(raw_data):
     """
     Parses raw CSV data into a nested list.
@@ -47,7 +71,8 @@ def parse_csv_data(raw_data):
     :return: A list of lists containing the CSV data, or None if an error occurs.
     """
     try:
-        lines = raw_data.splitlines()
+        # the open data exports start with a byte order mark, which would stick to the first header
+        lines = raw_data.lstrip('\ufeff').splitlines()
         data = [line.split(';') for line in lines]
         if len(data) == 0:
             raise ValueError("The CSV data is empty")
@@ -90,6 +115,31 @@ def extract_index_str(row, substring):
     return index
 
 
+def diff_datasets(old_data, new_data, key_column="Object ID"):
+    """
+    Compares two parsed exports of the same dataset row by row, matching rows on a key column.
+    
+    :param old_data: The currently loaded parsed data, header row first.
+    :param new_data: The newly downloaded parsed data, header row first.
+    :param key_column: The header of the column identifying each row.
+    :return: A dict with the 'key_index', the 'inserted' and 'removed' rows, and the
+             'modified' rows as (old_row, new_row) pairs.
+    """
+    if old_data[0] != new_data[0]:
+        raise ValueError("Both datasets must have the same columns")
+    key_index = extract_index_str(new_data[0], key_column)
+
+    old_rows = {row[key_index]: row for row in old_data[1:]}
+    new_rows = {row[key_index]: row for row in new_data[1:]}
+
+    inserted = [row for key, row in new_rows.items() if key not in old_rows]
+    removed = [row for key, row in old_rows.items() if key not in new_rows]
+    modified = [(old_rows[key], row) for key, row in new_rows.items()
+                if key in old_rows and old_rows[key] != row]
+
+    return {"key_index": key_index, "inserted": inserted, "removed": removed, "modified": modified}
+
+
 # Replace the URL with actual dataset URL
 
 # VANVOUCER MAP DATA init
@@ -103,20 +153,184 @@ def read_geojson_from_url(url):
     Returns:
         gpd.GeoDataFrame: A GeoDataFrame containing the data from the GeoJSON.
     """
+    import requests
+    import geopandas as gpd
+
     response = requests.get(url)
     geojson_data = response.json()
     gdf = gpd.GeoDataFrame.from_features(geojson_data)
     return gdf
     
+class CsvStreamParser:
+    """
+    Parses CSV text arriving in chunks into the same rows as parse_csv_data, line by line as
+    soon as each line is complete.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.pending = ""
+
+    def feed(self, text):
+        """
+        Parses the complete lines of a chunk and keeps the incomplete last line for later.
+
+        :param text: The next chunk of decoded text.
+        """
+        lines = (self.pending + text).splitlines(keepends=True)
+        # a line is complete once it ends with a line break; a trailing "\r" may still be half of a "\r\n"
+        if lines and (lines[-1] == lines[-1].rstrip("\r\n") or lines[-1].endswith("\r")):
+            self.pending = lines.pop()
+        else:
+            self.pending = ""
+        for line in lines:
+            self.rows.append(line.rstrip("\r\n").split(';'))
+
+    def close(self):
+        """
+        Parses the last line.
+
+        :return: The list of rows.
+        :raises: ValueError if no data was fed.
+        """
+        if self.pending:
+            self.feed("\n")
+        if not self.rows:
+            raise ValueError("The CSV data is empty")
+        return self.rows
+
+
+class GeoJsonStreamParser:
+    """
+    Parses the features of a GeoJSON FeatureCollection arriving in chunks, each feature as
+    soon as it is complete, so the collection is never held as one document.
+    """
+
+    def __init__(self):
+        self.features = []
+        self.pending = ""
+        self.in_features = False
+        self.done = False
+        self.decoder = json.JSONDecoder()
+
+    def feed(self, text):
+        """
+        Parses the complete features of a chunk and keeps the rest for later.
+
+        :param text: The next chunk of decoded text.
+        """
+        self.pending += text
+        if self.done:
+            return
+        position = 0
+        if not self.in_features:
+            start = self.pending.find('"features"')
+            bracket = self.pending.find('[', start) if start != -1 else -1
+            if bracket == -1:
+                return
+            self.in_features = True
+            position = bracket + 1
+        while True:
+            while position < len(self.pending) and self.pending[position] in " \t\r\n,":
+                position += 1
+            if position == len(self.pending):
+                break
+            if self.pending[position] == ']':
+                self.done = True
+                break
+            try:
+                feature, position = self.decoder.raw_decode(self.pending, position)
+            except json.JSONDecodeError:
+                # the feature is not complete yet
+                break
+            self.features.append(feature)
+        self.pending = self.pending[position:]
+
+    def close(self):
+        """
+        :return: The list of features, as dicts.
+        :raises: ValueError if the text was not a complete FeatureCollection.
+        """
+        if not self.done:
+            raise ValueError("The GeoJSON data has no complete feature collection")
+        return self.features
+
+
+def stream_url(url, parser, content_type=None, timeout=DOWNLOAD_TIMEOUT, retries=DOWNLOAD_RETRIES,
+               backoff=DOWNLOAD_BACKOFF, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Downloads a URL into a stream parser chunk by chunk, with gzip compression and retries.
+
+    Connection errors, timeouts, bodies cut off midway and 429 or 5xx responses are retried
+    with exponential backoff; each attempt starts over with a fresh parser. Other HTTP errors
+    and a wrong content type fail at once.
+
+    :param url: The URL to download.
+    :param parser: A function returning a new parser with feed and close methods, such as CsvStreamParser.
+    :param content_type: A substring the Content-Type header must contain, if given.
+    :param timeout: The (connect, read) timeouts in seconds; the read timeout applies between chunks.
+    :param retries: The number of retries after the first attempt.
+    :param backoff: The seconds to wait before the first retry, doubled for each further one.
+    :param chunk_size: The number of bytes read at a time.
+    :return: What the parser's close method returns.
+    :raises: requests.exceptions.RequestException once the retries are used up, ValueError
+             if the content type is wrong or the parser rejects the data.
+    """
+    import requests
+
+    retryable = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                 requests.exceptions.ChunkedEncodingError)
+    with requests.Session() as session:
+        for attempt in range(retries + 1):
+            try:
+                with session.get(url, stream=True, timeout=timeout, headers={"Accept-Encoding": "gzip"}) as response:
+                    if response.status_code in RETRY_STATUS_CODES:
+                        raise requests.exceptions.ConnectionError(f"{response.status_code} from {url}")
+                    response.raise_for_status()
+                    if content_type is not None and content_type not in response.headers.get('Content-Type', ''):
+                        raise ValueError(f"The URL does not contain {content_type} data")
+
+                    stream = parser()
+                    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+                    for chunk in response.iter_content(chunk_size):
+                        stream.feed(decoder.decode(chunk))
+                    stream.feed(decoder.decode(b"", final=True))
+                    return stream.close()
+            except retryable:
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+
+def fetch_datasets(bike_url=BIKEDATA, park_url=PARKDATA, boundary_url=VANCOUVERMAP, **options):
+    """
+    Downloads the bikeways, parks and boundary datasets concurrently, parsing each body as it
+    arrives.
+
+    :param bike_url: The URL of the bikeways CSV export.
+    :param park_url: The URL of the parks CSV export.
+    :param boundary_url: The URL of the local-area boundary GeoJSON export.
+    :param options: Passed on to stream_url, such as timeout and retries.
+    :return: A tuple of the parsed bikeways rows, the parsed parks rows and the boundary features.
+    :raises: The first error of the three downloads.
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        bikes = executor.submit(stream_url, bike_url, CsvStreamParser, "csv", **options)
+        parks = executor.submit(stream_url, park_url, CsvStreamParser, "csv", **options)
+        boundaries = executor.submit(stream_url, boundary_url, GeoJsonStreamParser, None, **options)
+        return bikes.result(), parks.result(), boundaries.result()
+
+
 def data_init():
     """
     init all the dataset above and clean the data
     """
+    import geopandas as gpd
+
+    # the three downloads run at the same time
+    parsed_data, park_data, boundary_features = fetch_datasets()
 
     # Bikeway data init
-    dataset_url = BIKEDATA
-    raw_data = download_csv_file(dataset_url)
-    parsed_data =  parse_csv_data(raw_data)
     index =  extract_index_str(parsed_data[0], "Geom")
 
     for row in parsed_data[1:]:  # Start from 1 to skip the header row
@@ -124,8 +338,6 @@ def data_init():
 
 
     # Park data init
-    parkset_url = PARKDATA
-    park_data =  parse_csv_data(download_csv_file(parkset_url))
     park_index =  extract_index_str(park_data[0],"Geom")
     parkname_index =  extract_index_str(park_data[0],"PARK_NAME")
 
@@ -133,5 +345,25 @@ def data_init():
         row[park_index] =  extract_coordinates(row[park_index])
     
     # map boundary init
-    boundary_data_gpd = read_geojson_from_url(VANCOUVERMAP)
+    boundary_data_gpd = gpd.GeoDataFrame.from_features(boundary_features)
     return parsed_data, park_data, boundary_data_gpd, index, park_index, parkname_index
+
+
+def data_init_local(dataset_dir=DATASET_DIR):
+    """
+    init the bundled copies of the bikeways and parks datasets, for working offline
+
+    :param dataset_dir: The directory holding bikeways.csv and parks-polygon-representation.csv.
+    :return: The same tuple as data_init; the boundary data is None, as it is not bundled.
+    """
+    parsed_data = parse_csv_data(read_csv_file(os.path.join(dataset_dir, "bikeways.csv")))
+    index = extract_index_str(parsed_data[0], "Geom")
+    for row in parsed_data[1:]:
+        row[index] = extract_coordinates(row[index])
+
+    park_data = parse_csv_data(read_csv_file(os.path.join(dataset_dir, "parks-polygon-representation.csv")))
+    park_index = extract_index_str(park_data[0], "Geom")
+    parkname_index = extract_index_str(park_data[0], "PARK_NAME")
+    for row in park_data[1:]:
+        row[park_index] = extract_coordinates(row[park_index])
+    return parsed_data, park_data, None, index, park_index, parkname_index
@@ -1,8 +1,66 @@
+import gzip
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
 from dataProcessor import *
 
 VANCOUVERMAP = 'https://opendata.vancouver.ca/api/explore/v2.1/catalog/datasets/local-area-boundary/exports/geojson?lang=en&timezone=America%2FLos_Angeles'
 WRONGDATAURL = "http://none_exist.com/data.csv"
+CSVDATA = "\ufeffa;b\r\n" + "".join(f"{i};{i * i}\r\n" for i in range(2000))
+GEOJSONDATA = '{"type": "FeatureCollection", "features": [' + ", ".join(
+    '{"type": "Feature", "properties": {"name": "a%d"}, "geometry": {"type": "Point", "coordinates": [%d, 1]}}' % (i, i)
+    for i in range(200)) + ']}'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the test datasets, failing in the ways the open data portal can."""
+    requests_seen = {}
+    # the (start, end) times of the requests to each path
+    request_times = {}
+
+    def do_GET(self):
+        begin = time.perf_counter()
+        try:
+            self.respond()
+        finally:
+            StandInHandler.request_times.setdefault(self.path, []).append((begin, time.perf_counter()))
+
+    def respond(self):
+        seen = StandInHandler.requests_seen[self.path] = StandInHandler.requests_seen.get(self.path, 0) + 1
+        body = CSVDATA.encode("utf-8")
+        content_type = "text/csv; charset=utf-8"
+        if self.path == "/flaky.csv" and seen == 1:
+            self.send_error(503)
+            return
+        if self.path == "/missing.csv":
+            self.send_error(404)
+            return
+        if self.path.split("?")[0] == "/slow.csv":
+            time.sleep(0.3)
+        if self.path == "/boundaries.geojson":
+            body = GEOJSONDATA.encode("utf-8")
+            content_type = "application/geo+json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if self.path == "/gzip.csv" and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        if self.path == "/truncated.csv" and seen == 1:
+            # announce the full body but stop halfway
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
 
 
 class TestDataProcessor(unittest.TestCase):
@@ -69,6 +127,142 @@ class TestDataProcessor(unittest.TestCase):
         index = extract_index_str(row, substring)
         self.assertEqual(index, expected_index)
 
+    def test_parse_csv_data_byte_order_mark(self):
+        """Test case for parsing CSV data starting with a byte order mark.
+        
+        This test case checks if the byte order mark of the open data exports is not kept in the first header.
+        """
+        raw_data = "\ufeffObject ID;b\n1;2"
+        parsed_data = parse_csv_data(raw_data)
+        self.assertEqual(parsed_data[0], ["Object ID", "b"])
+
+    def test_diff_datasets(self):
+        """Test case for diffing two exports of a dataset by their key column.
+        
+        This test case checks if inserted, removed and modified rows are told apart and unchanged rows are left out.
+        """
+        old_data = [["Object ID", "Name"], ["1", "a"], ["2", "b"], ["3", "c"]]
+        new_data = [["Object ID", "Name"], ["1", "a"], ["3", "C"], ["4", "d"]]
+        delta = diff_datasets(old_data, new_data)
+        self.assertEqual(delta["key_index"], 0)
+        self.assertEqual(delta["inserted"], [["4", "d"]])
+        self.assertEqual(delta["removed"], [["2", "b"]])
+        self.assertEqual(delta["modified"], [(["3", "c"], ["3", "C"])])
+
+        # Error handle case
+        with self.assertRaises(ValueError):
+            diff_datasets(old_data, [["Object ID", "Other"]])
+
+    def test_data_init_local(self):
+        """Test case for loading the bundled datasets.
+        
+        This test case checks if both bundled datasets are parsed with their geometries extracted, without the network.
+        """
+        parsed_data, park_data, boundary_data_gpd, index, park_index, parkname_index = data_init_local()
+        self.assertEqual(parsed_data[0][index], "Geom")
+        self.assertIsInstance(parsed_data[1][index][0][0], float)
+        self.assertEqual(park_data[0][parkname_index], "PARK_NAME")
+        self.assertIsInstance(park_data[1][park_index], list)
+        self.assertIsNone(boundary_data_gpd)
+
+
+class TestStreamingDownload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInHandler.requests_seen.clear()
+        StandInHandler.request_times.clear()
+
+    def test_csv_stream_parser(self):
+        """Test case for parsing CSV text fed in arbitrary chunks.
+        
+        This test case checks if the rows match parse_csv_data however the text is cut, including between "\\r" and "\\n".
+        """
+        raw_data = "a;b\r\n1;2\r\n3;4"
+        for size in range(1, len(raw_data) + 1):
+            parser = CsvStreamParser()
+            for start in range(0, len(raw_data), size):
+                parser.feed(raw_data[start:start + size])
+            self.assertEqual(parser.close(), parse_csv_data(raw_data))
+
+        # Error handle case
+        with self.assertRaises(ValueError):
+            CsvStreamParser().close()
+
+    def test_geojson_stream_parser(self):
+        """Test case for parsing a GeoJSON feature collection fed in chunks.
+        
+        This test case checks if every feature is parsed and an incomplete collection is rejected.
+        """
+        parser = GeoJsonStreamParser()
+        for start in range(0, len(GEOJSONDATA), 7):
+            parser.feed(GEOJSONDATA[start:start + 7])
+        features = parser.close()
+        self.assertEqual(len(features), 200)
+        self.assertEqual(features[5]["properties"]["name"], "a5")
+
+        # Error handle case
+        parser = GeoJsonStreamParser()
+        parser.feed(GEOJSONDATA[:len(GEOJSONDATA) // 2])
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_stream_url_gzip(self):
+        """Test case for downloading a gzip-compressed CSV body.
+        
+        This test case checks if the body is decompressed and the byte order mark removed.
+        """
+        rows = stream_url(self.url + "/gzip.csv", CsvStreamParser, "csv")
+        self.assertEqual(rows, parse_csv_data(CSVDATA))
+        self.assertEqual(rows[0], ["a", "b"])
+
+    def test_stream_url_retries(self):
+        """Test case for retrying failed downloads.
+        
+        This test case checks if a 503 response and a body cut off midway are retried, while a 404 is not.
+        """
+        rows = stream_url(self.url + "/flaky.csv", CsvStreamParser, "csv", backoff=0.01)
+        self.assertEqual(len(rows), 2001)
+        self.assertEqual(StandInHandler.requests_seen["/flaky.csv"], 2)
+
+        rows = stream_url(self.url + "/truncated.csv", CsvStreamParser, "csv", backoff=0.01)
+        self.assertEqual(rows, parse_csv_data(CSVDATA))
+        self.assertEqual(StandInHandler.requests_seen["/truncated.csv"], 2)
+
+        # Error handle case
+        with self.assertRaises(requests.exceptions.HTTPError):
+            stream_url(self.url + "/missing.csv", CsvStreamParser, "csv", backoff=0.01)
+        self.assertEqual(StandInHandler.requests_seen["/missing.csv"], 1)
+        with self.assertRaises(requests.exceptions.Timeout):
+            stream_url(self.url + "/slow.csv", CsvStreamParser, "csv", timeout=(1, 0.05), retries=1, backoff=0.01)
+        self.assertEqual(StandInHandler.requests_seen["/slow.csv"], 2)
+        with self.assertRaises(ValueError):
+            stream_url(self.url + "/boundaries.geojson", CsvStreamParser, "csv")
+
+    def test_fetch_datasets(self):
+        """Test case for downloading the three datasets concurrently.
+        
+        This test case checks if each dataset is parsed and the server was answering both slow downloads at once.
+        """
+        bike_data, park_data, features = fetch_datasets(self.url + "/slow.csv", self.url + "/slow.csv?parks",
+                                                        self.url + "/boundaries.geojson")
+        self.assertEqual(bike_data, parse_csv_data(CSVDATA))
+        self.assertEqual(park_data, parse_csv_data(CSVDATA))
+        self.assertEqual(len(features), 200)
+        [(bike_begin, bike_end)] = StandInHandler.request_times["/slow.csv"]
+        [(park_begin, park_end)] = StandInHandler.request_times["/slow.csv?parks"]
+        self.assertLess(max(bike_begin, park_begin), min(bike_end, park_end))
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -40,13 +40,14 @@ def main():
     Parks = []
     for park_row in park_data[1:]:
         try:
-            park_instance = parkbuilder.Park(park_row[park_index], park_row[parkname_index + 2], park_row[parkname_index])
+            park_instance = parkbuilder.park_from_row(park_data[0], park_row, park_index)
             Parks.append(park_instance)
         except Exception as e:
             print(f"Error creating Park instance: {e}")
+    Parks = parkbuilder.ParkCatalogue(Parks)
 
     # Load startpoint data and create school objects
-        school = startpointbuilder.StartPoint(SCHOOL_NAME, NEU_COORIDINATES)
+    school = startpointbuilder.StartPoint(SCHOOL_NAME, NEU_COORIDINATES)
 
     # Set up the GUI and run the app
     try:
@@ -0,0 +1,291 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+import alternativeroutes
+import classbuilder
+import dataProcessor
+import parkbuilder
+from nearestpark import NearestParkTable
+
+
+def percentile(values, fraction):
+    """
+    Returns a percentile of some values by the nearest-rank method.
+
+    :param values: A list of numbers.
+    :param fraction: The percentile as a fraction, e.g. 0.99.
+    :return: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def build_snapshot(loader=dataProcessor.data_init_local, nearest_table=True):
+    """
+    Loads the datasets and builds the graph together with the indexes queries rely on: the
+    park catalogue with every park's entry vertices, the graph's nearest-vertex index, the
+    CompactGraph its searches run on and, optionally, the nearest-park table.
+
+    :param loader: A function returning the tuple of dataProcessor.data_init, by default the
+                   bundled datasets; pass dataProcessor.data_init to download fresh ones.
+    :param nearest_table: Whether to build the NearestParkTable.
+    :return: A tuple of the Graph, the ParkCatalogue and a dict of the other indexes by name.
+    """
+    parsed_data, park_data, _, index, park_index, _ = loader()
+    graph = classbuilder.Graph()
+    graph.build_graph(parsed_data, index)
+    catalogue = parkbuilder.ParkCatalogue(parkbuilder.park_from_row(park_data[0], row, park_index)
+                                          for row in park_data[1:])
+    # snapping the parks builds the nearest-vertex index on the way
+    catalogue.precompute_entries(graph)
+    graph.compact()
+    indexes = {}
+    if nearest_table:
+        indexes["nearest_park"] = NearestParkTable(graph, catalogue.parks)
+    return graph, catalogue, indexes
+
+
+class GraphVersion:
+    """
+    A class holding one generation of the graph and its indexes. A version is never modified
+    after it is published; a reload builds a new one.
+    """
+
+    def __init__(self, number, graph, catalogue, indexes=None):
+        """
+        Initialize the version.
+
+        Args:
+            number (int): The version number, counting from 1.
+            graph (Graph): The graph representation of the bikeways network.
+            catalogue (ParkCatalogue): The parks, with their entry vertices on this graph.
+            indexes (dict, optional): Other indexes built on this graph, by name.
+        """
+        self.number = number
+        self.graph = graph
+        self.catalogue = catalogue
+        self.indexes = indexes or {}
+        self.readers = 0
+        self.retired = False
+        self.released = False
+
+
+class GraphHolder:
+    """
+    A class letting a long-running process keep answering queries while the graph is rebuilt.
+
+    Readers acquire the current version and release it when their query is done. A reload
+    builds the next version in a background thread, without any lock held, and then swaps
+    the current reference under the lock, which only takes as long as an assignment. Queries
+    already running finish on the version they acquired; a retired version drops its graph
+    and indexes as soon as its last reader releases it, so its memory can be reclaimed.
+
+    Queries must not modify the graph they read, e.g. with Graph.add_park_coordinates; the
+    routing entry points only read it, searching the CompactGraph build_snapshot prepares.
+    """
+
+    def __init__(self, builder=build_snapshot, on_release=None):
+        """
+        Initialize the holder by building the first version in the calling thread.
+
+        Args:
+            builder (callable, optional): A function returning a (graph, catalogue, indexes)
+                tuple, such as build_snapshot.
+            on_release (callable, optional): Called with each retired version number once
+                its memory is released.
+        """
+        self.builder = builder
+        self.on_release = on_release
+        self.lock = threading.Lock()
+        self.current = GraphVersion(1, *builder())
+        self.reload_thread = None
+        self.last_error = None
+        # one (build seconds, swap seconds) tuple per completed reload
+        self.reloads = []
+
+    @property
+    def version(self):
+        return self.current.number
+
+    def acquire(self):
+        """
+        Takes a reference to the current version.
+
+        Returns:
+            GraphVersion: The version, which stays usable until it is released.
+        """
+        with self.lock:
+            version = self.current
+            version.readers += 1
+            return version
+
+    def release(self, version):
+        """
+        Gives back a reference taken by acquire, releasing the version's memory if it is
+        retired and this was its last reader.
+
+        Args:
+            version (GraphVersion): The acquired version.
+        """
+        with self.lock:
+            version.readers -= 1
+            free = version.retired and version.readers == 0 and not version.released
+            if free:
+                self._free(version)
+        if free and self.on_release is not None:
+            self.on_release(version.number)
+
+    @contextmanager
+    def reading(self):
+        """
+        Acquires the current version for the duration of a with block.
+
+        Yields:
+            GraphVersion: The acquired version.
+        """
+        version = self.acquire()
+        try:
+            yield version
+        finally:
+            self.release(version)
+
+    def swap(self, graph, catalogue, indexes=None):
+        """
+        Publishes a built graph and its indexes as the current version.
+
+        Args:
+            graph (Graph): The new graph.
+            catalogue (ParkCatalogue): The parks, with their entry vertices on the new graph.
+            indexes (dict, optional): Other indexes built on the new graph, by name.
+
+        Returns:
+            float: The seconds the swap held the lock.
+        """
+        begin = time.perf_counter()
+        with self.lock:
+            old = self.current
+            self.current = GraphVersion(old.number + 1, graph, catalogue, indexes)
+            old.retired = True
+            free = old.readers == 0
+            if free:
+                self._free(old)
+        elapsed = time.perf_counter() - begin
+        if free and self.on_release is not None:
+            self.on_release(old.number)
+        return elapsed
+
+    def reload(self, builder=None, wait=False):
+        """
+        Builds a new version in a background thread and swaps it in when it is ready. A
+        reload requested while one is running joins that one instead of starting another.
+        If the build fails, the current version stays and the error is kept in last_error.
+
+        Args:
+            builder (callable, optional): The function building the new version, by default
+                the holder's builder.
+            wait (bool, optional): Whether to block until the reload is done.
+
+        Returns:
+            threading.Thread: The thread doing the reload.
+        """
+        with self.lock:
+            if self.reload_thread is None or not self.reload_thread.is_alive():
+                self.reload_thread = threading.Thread(target=self._reload, args=(builder or self.builder,),
+                                                      name="graph-reload", daemon=True)
+                self.reload_thread.start()
+            thread = self.reload_thread
+        if wait:
+            thread.join()
+        return thread
+
+    def _reload(self, builder):
+        begin = time.perf_counter()
+        try:
+            graph, catalogue, indexes = builder()
+        except Exception as e:
+            self.last_error = e
+            return
+        build_time = time.perf_counter() - begin
+        self.last_error = None
+        self.reloads.append((build_time, self.swap(graph, catalogue, indexes)))
+
+    @staticmethod
+    def _free(version):
+        version.graph = None
+        version.catalogue = None
+        version.indexes = {}
+        version.released = True
+
+
+def measure_reload(holder, queries, idle=0.5):
+    """
+    Answers routing queries continuously in a reader thread while the holder reloads, and
+    compares the query latency before and during the reload.
+
+    :param holder: A GraphHolder.
+    :param queries: A list of (start coordinate, park name) tuples, answered in turn with
+                    alternativeroutes.k_shortest_paths on whichever version is current.
+    :param idle: The seconds of queries timed before the reload starts, and after it ends.
+    :return: A dict with the 'build_time' and 'swap_time' of the reload in seconds, the
+             p50 and p99 query latencies 'before' and 'during' the reload as dicts, the
+             number of queries answered by each version in 'versions', and 'failed', the
+             number of queries that raised.
+    """
+    samples = []
+    versions = {}
+    failures = []
+    stop = threading.Event()
+
+    def read():
+        position = 0
+        while not stop.is_set():
+            start_coordinate, park_name = queries[position % len(queries)]
+            position += 1
+            begin = time.perf_counter()
+            try:
+                with holder.reading() as version:
+                    park = version.catalogue.get(park_name)
+                    alternativeroutes.k_shortest_paths(version.graph, start_coordinate, park, k=1,
+                                                       catalogue=version.catalogue)
+            except Exception as e:
+                failures.append(e)
+                continue
+            end = time.perf_counter()
+            samples.append((begin, end - begin))
+            versions[version.number] = versions.get(version.number, 0) + 1
+
+    reader = threading.Thread(target=read, name="graph-reader", daemon=True)
+    reader.start()
+    time.sleep(idle)
+    reload_begin = time.perf_counter()
+    holder.reload(wait=True)
+    reload_end = time.perf_counter()
+    time.sleep(idle)
+    stop.set()
+    reader.join()
+
+    def summary(latencies):
+        return {"count": len(latencies), "p50": percentile(latencies, 0.5), "p99": percentile(latencies, 0.99)}
+
+    build_time, swap_time = holder.reloads[-1] if holder.reloads else (None, None)
+    return {"build_time": build_time, "swap_time": swap_time,
+            "before": summary([latency for begin, latency in samples if begin < reload_begin]),
+            "during": summary([latency for begin, latency in samples if reload_begin <= begin < reload_end]),
+            "versions": versions, "failed": len(failures)}
+
+
+if __name__ == '__main__':
+    holder = GraphHolder()
+    with holder.reading() as current:
+        names = [park.name for park in current.catalogue.parks[::25]]
+    starts = [(-123.115540, 49.280747), (-123.07, 49.26), (-123.15, 49.25), (-123.10, 49.22)]
+    result = measure_reload(holder, [(start, name) for name in names for start in starts])
+    print(f"reload: built in {result['build_time']:.2f} s, swapped in {result['swap_time'] * 1e6:.1f} us")
+    for phase in ("before", "during"):
+        stats = result[phase]
+        print(f"{phase:>6}: {stats['count']} queries, p50 {stats['p50'] * 1000:.1f} ms, p99 {stats['p99'] * 1000:.1f} ms")
+    print(f"queries per version: {result['versions']}, failed: {result['failed']}")
@@ -0,0 +1,121 @@
+import gc
+import threading
+import unittest
+import weakref
+from classbuilder import Graph
+from parkbuilder import Park, ParkCatalogue
+from graphholder import GraphHolder, build_snapshot, measure_reload, percentile
+
+
+def build_line():
+    """Builds a small line of vertices with a park at its end."""
+    graph = Graph()
+    graph.build_graph([["Object ID", "Geom"], ["1", [[0, 0], [0, 0.01], [0, 0.02]]]], 1)
+    catalogue = ParkCatalogue([Park([(0.001, 0.02)], None, "End")])
+    catalogue.precompute_entries(graph)
+    return graph, catalogue, {}
+
+
+class TestGraphHolder(unittest.TestCase):
+    """
+    A unittest class for testing the GraphHolder class.
+    """
+
+    def setUp(self):
+        self.released = []
+        self.holder = GraphHolder(build_line, on_release=self.released.append)
+
+    def test_reader_keeps_old_version(self):
+        """
+        Tests that a query in flight during a swap finishes on its version, which is released
+        with its memory once the reader exits.
+        """
+        version = self.holder.acquire()
+        old_graph = weakref.ref(version.graph)
+        self.holder.reload(wait=True)
+        self.assertEqual(self.holder.version, 2)
+        self.assertIsNotNone(version.graph)
+        self.assertEqual(self.released, [])
+
+        self.holder.release(version)
+        self.assertEqual(self.released, [1])
+        self.assertIsNone(version.graph)
+        gc.collect()
+        self.assertIsNone(old_graph())
+
+    def test_reload_without_readers(self):
+        """
+        Tests that a version nobody reads is released at the swap, and that new readers get
+        the new version.
+        """
+        self.holder.reload(wait=True)
+        self.assertEqual(self.released, [1])
+        with self.holder.reading() as version:
+            self.assertEqual(version.number, 2)
+            self.assertEqual(version.catalogue.get("End").name, "End")
+        self.assertEqual(version.readers, 0)
+        self.assertFalse(version.released)
+        build_time, swap_time = self.holder.reloads[0]
+        self.assertLess(swap_time, build_time)
+
+    def test_reload_failure(self):
+        """
+        Tests that a failed build keeps the current version and records the error.
+        """
+        def fail():
+            raise ValueError("broken export")
+
+        self.holder.reload(builder=fail, wait=True)
+        self.assertEqual(self.holder.version, 1)
+        self.assertIsInstance(self.holder.last_error, ValueError)
+        self.assertEqual(self.released, [])
+
+    def test_single_reload_at_a_time(self):
+        """
+        Tests that a reload requested while one is running joins it.
+        """
+        gate = threading.Event()
+
+        def slow():
+            gate.wait()
+            return build_line()
+
+        first = self.holder.reload(builder=slow)
+        second = self.holder.reload()
+        self.assertIs(first, second)
+        gate.set()
+        first.join()
+        self.assertEqual(self.holder.version, 2)
+
+    def test_measure_reload(self):
+        """
+        Tests that queries keep being answered, and none fails, across a reload.
+        """
+        result = measure_reload(self.holder, [((0, 0), "End")], idle=0.05)
+        self.assertEqual(result["failed"], 0)
+        self.assertGreater(result["before"]["count"], 0)
+        self.assertIn(2, result["versions"])
+
+    def test_build_snapshot(self):
+        """
+        Tests that the snapshot of the bundled datasets has its parks snapped to the graph.
+        """
+        graph, catalogue, indexes = build_snapshot(nearest_table=False)
+        self.assertGreater(len(graph.vertices), 0)
+        self.assertIs(catalogue.entries_graph, graph)
+        self.assertEqual(len(catalogue.entries), len(catalogue))
+        self.assertEqual(indexes, {})
+
+    def test_percentile(self):
+        """
+        Tests the nearest-rank percentile.
+        """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([3], 0.99), 3)
+        self.assertIsNone(percentile([], 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,18 @@ import geopandas
 import folium # with geopandas
 import webbrowser
 import os
+import copy
+import queue
+import threading
+import parkbuilder
 
 VANCOUVER_CENTER = (49.2827, -123.1207)
+POLL_INTERVAL_MS = 100
+PROGRESS_EVERY_VERTICES = 1000
+
+
+class RequestCancelled(Exception):
+    """Raised inside the worker when a newer request supersedes the one being computed."""
 
 class App:
     """A class to represent the GUI application to find and visualize the shortest path."""
@@ -18,8 +28,8 @@ class App:
             The main application window.
         graph : Graph
             The graph representation of the road network.
-        parks : List[Park]
-            The list of parks in the area.
+        parks : ParkCatalogue or List[Park]
+            The parks in the area; a list is indexed into a ParkCatalogue.
         startpoint : Tuple[float, float]
             The coordinates of the startpoint.
         boundary_data_gpd : geopandas.GeoDataFrame
@@ -27,7 +37,8 @@ class App:
         """
         self.root = root
         self.graph = graph
-        self.parks = parks
+        self.catalogue = parks if isinstance(parks, parkbuilder.ParkCatalogue) else parkbuilder.ParkCatalogue(parks)
+        self.parks = self.catalogue.parks
         self.startpoint = startpoint
         self.boundary_data_gpd = boundary_data_gpd.dropna(subset=['geometry'])
 
@@ -68,44 +79,137 @@ class App:
         self.draw_button = tk.Button(self.main_frame, text="Show path", command=self.draw_path_to_park)
         self.draw_button.pack()
 
+        # Label reporting the progress of the route computation
+        self.status_var = tk.StringVar(self.main_frame)
+        self.status_label = tk.Label(self.main_frame, textvariable=self.status_var)
+        self.status_label.pack()
+
         # Canvas to display the graph
         self.canvas = tk.Canvas(self.main_frame, width=600, height=300)
         self.canvas.pack()
 
+        # Route computations run on a background worker; widgets are only touched from the Tk
+        # thread, which polls the worker's messages. Every click gets a new request id and
+        # supersedes the requests before it.
+        self.latest_request = 0
+        self.requests = queue.Queue()
+        self.messages = queue.Queue()
+        self.graph_lock = threading.Lock()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_messages)
 
     def draw_path_to_park(self):
-        """Gets the selected park from the dropdown, calculates the shortest path to it,
-        generates a folium map with the path and opens it in the default browser."""
-        ... 
+        """Gets the selected park from the dropdown and hands the route computation to the
+        background worker. Returns immediately; the map is opened once the worker is done.
+        A click while a route is still being computed cancels the older request."""
+        # Get the selected park
+        selected_park_name = self.park_var.get()
+        selected_park = self.catalogue.get(selected_park_name)
+
+        if selected_park:
+            self.latest_request += 1
+            # the worker gets its own copy, so confirming new coordinates meanwhile does not affect it
+            startpoint = copy.copy(self.startpoint)
+            startpoint.coordinates = list(self.startpoint.coordinates)
+            self.requests.put((self.latest_request, selected_park, startpoint))
+            self.status_var.set(f"Finding a path to {selected_park.name}...")
+        else:
+            print("No park selected.")
+
+    def work(self):
+        """Runs on the worker thread: computes the requests, newest first, one at a time."""
+        while True:
+            request = self.requests.get()
+            # requests superseded while waiting in the queue are dropped without being computed
+            while not self.requests.empty():
+                request = self.requests.get()
+            request_id = request[0]
+            try:
+                self.compute_path_to_park(*request)
+            except RequestCancelled:
+                self.messages.put((request_id, "cancelled", None))
+            except Exception as e:
+                self.messages.put((request_id, "error", e))
+
+    def check_cancelled(self, request_id):
+        """Raises RequestCancelled if a newer request was made since request_id."""
+        if request_id != self.latest_request:
+            raise RequestCancelled()
+
+    def compute_path_to_park(self, request_id, selected_park, startpoint):
+        """Calculates the shortest path to the selected park and saves the folium map with it.
+        Runs on the worker thread and reports back through the message queue only."""
+        self.messages.put((request_id, "progress", "Calculating the shortest path..."))
+        with self.graph_lock:
+            # Calculate the shortest path to the selected park with one Dijkstra search that
+            # stops at the park's cached entry vertices, so the graph is not modified. The
+            # path holds the connectors from the startpoint and to the park boundary as well.
+            try:
+                path = self.graph.find_shortest_path(self.graph, startpoint, selected_park,
+                                                     catalogue=self.catalogue)
+            except ValueError:
+                path = None
+        self.check_cancelled(request_id)
+
+        if not path:
+            self.messages.put((request_id, "no path", None))
+            return
+
+        def report(fraction):
+            self.messages.put((request_id, "progress", f"Drawing the map... {fraction:.0%}"))
+
+        with self.graph_lock:
+            # Draw the path on the map
+            folium_map = self.create_folium_map(self.boundary_coords, path, progress=report,
+                                                cancelled=lambda: request_id != self.latest_request)
+        self.check_cancelled(request_id)
+
+        # Save the map as an HTML file
+        self.messages.put((request_id, "progress", "Saving the map..."))
+        map_file = os.path.join(os.getcwd(), "map.html")
+        folium_map.save(map_file)
+        self.check_cancelled(request_id)
+        self.messages.put((request_id, "done", (map_file, path)))
+
+    def poll_messages(self):
+        """Runs on the Tk thread: applies the worker's messages for the latest request and
+        ignores those of superseded requests."""
+        while True:
+            try:
+                request_id, kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if request_id != self.latest_request:
+                continue
+            if kind == "progress":
+                self.status_var.set(payload)
+            elif kind == "done":
+                self.status_var.set("Done.")
+                self.show_path(*payload)
+            elif kind == "no path":
+                self.status_var.set("No path found.")
+                print("No path found to the selected park.")
+            elif kind == "error":
+                self.status_var.set("Error, see the console.")
+                print(f"An error occurred while drawing the path to the park: {payload}")
+        self.root.after(POLL_INTERVAL_MS, self.poll_messages)
+
+    def show_path(self, map_file, path):
+        """Opens the saved map in the default browser and plots the graph with the path."""
         try:
-            # Get the selected park
-            selected_park_name = self.park_var.get()
-            selected_park = next((park for park in self.parks if park.name == selected_park_name), None)
-
-            if selected_park:
-                # Calculate the shortest path to the selected park
-                path = self.graph.find_shortest_path(self.graph, self.startpoint, selected_park)
-
-
-                if path:
-                    # Draw the path on the map
-                    folium_map = self.create_folium_map(self.boundary_coords, path)
-
-                    # Save the map as an HTML file
-                    map_file = os.path.join(os.getcwd(), "map.html")
-                    folium_map.save(map_file)
-
-                    # Open the generated HTML file in the default browser
-                    if webbrowser.open(map_file):
-                    
-                        # Draw the path on the graph
-                        img = self.graph.plot_graph(path)
-                        # Update the canvas with the new image
-                        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_img)
-                else:
-                    print("No path found to the selected park.")
-            else:
-                print("No park selected.")
+            # Open the generated HTML file in the default browser
+            if webbrowser.open(map_file):
+                # the worker is idle for the latest request; if a new click keeps it busy, skip the plot
+                if not self.graph_lock.acquire(blocking=False):
+                    return
+                try:
+                    # Draw the path on the graph
+                    img = self.graph.plot_graph(path)
+                finally:
+                    self.graph_lock.release()
+                # Update the canvas with the new image
+                self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_img)
         except Exception as e:
             print(f"An error occurred while drawing the path to the park: {e}")
 
@@ -114,7 +218,8 @@ class App:
         m = folium.Map(location=map_center, tiles="OpenStreetMap", zoom_start=zoom_start)
         self.display_map_in_tkinter(self.map_frame, m)
 
-    def create_folium_map(self, boundary_coords, shortest_path, map_center=VANCOUVER_CENTER, zoom_start=10):
+    def create_folium_map(self, boundary_coords, shortest_path, map_center=VANCOUVER_CENTER, zoom_start=10,
+                          progress=None, cancelled=None):
         """Creates a folium map and adds the boundary, graph, and shortest path to it.
 
         Parameters:
@@ -127,6 +232,10 @@ class App:
             The center coordinates of the map, by default VANCOUVER_CENTER.
         zoom_start : int, optional
             The zoom level of the map, by default 10.
+        progress : Callable[[float], None], optional
+            Called with the fraction of the graph drawn so far, by default None.
+        cancelled : Callable[[], bool], optional
+            Polled while drawing the graph; if it returns True, RequestCancelled is raised.
 
         Returns:
         --------
@@ -143,16 +252,23 @@ class App:
 
         # Draw the bikeway path
         if self.graph:
-            for vertex, adjacency_list in self.graph.vertices.items():
+            vertex_count = len(self.graph.vertices)
+            for drawn, (vertex, adjacency_list) in enumerate(self.graph.vertices.items()):
+                if drawn % PROGRESS_EVERY_VERTICES == 0:
+                    if cancelled is not None and cancelled():
+                        raise RequestCancelled()
+                    if progress is not None:
+                        progress(drawn / vertex_count)
                 lat1, lon1 = vertex
                 folium.CircleMarker([lon1, lat1], radius=0.3, color='blue', fill=True, fill_color='blue', fill_opacity=1).add_to(m)
             
                 current = adjacency_list.head
                 while current:
-                    coord2, info = current.datapoint
+                    coord2, _ = current.datapoint
                     lat2, lon2 = coord2
                     folium.CircleMarker(coord2, radius=0.3, color='blue', fill=True, fill_color='blue', fill_opacity=1).add_to(m)
                     path_coord = [[lon2, lat2], [lon1, lat1]]
+                    # no popups on the network, they would repeat per edge in the HTML
                     folium.PolyLine(path_coord, color = 'red', weight = 1).add_to(m)
                     current = current.next
 
@@ -163,7 +279,17 @@ class App:
                 lat, lon = i
                 lonlat_form_path = [lon, lat]
                 shortest_path_lonlat_form.append(lonlat_form_path)
-            folium.PolyLine(shortest_path_lonlat_form, color = 'green', weight = 6).add_to(m)
+            # popup text of each route edge comes from its row in the graph attribute table;
+            # the connectors at both ends are not edges and get none
+            for i, (vertex, neighbor) in enumerate(zip(shortest_path, shortest_path[1:])):
+                current = self.graph.vertices[vertex].head if self.graph and vertex in self.graph.vertices else None
+                while current and current.datapoint[0] != neighbor:
+                    current = current.next
+                popup = None
+                if current:
+                    attributes = self.graph.attributes
+                    popup = str(attributes.get_value(current.info, "Bike Route Name", attributes.get(current.info)))
+                folium.PolyLine(shortest_path_lonlat_form[i:i + 2], color = 'green', weight = 6, popup=popup).add_to(m)
         
         return m
     
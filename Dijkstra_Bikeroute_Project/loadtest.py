@@ -0,0 +1,335 @@
+"""
+A load test of the routing entry points: a seeded, Zipf-skewed mix of route, nearest-park,
+reachability and tour queries replayed by concurrent clients.
+
+Starts are drawn inside the local-area boundaries through a RegionIndex when the boundaries
+are given. They are not bundled, so without them starts are drawn within MAX_START_SNAP of
+the network instead, which also covers water and land outside the city that is close to a
+bikeway; format_report states which sampling a run used.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import alternativeroutes
+import reachability
+from graphholder import build_snapshot, percentile
+from orienteering import plan_tour
+from parkdistances import ParkDistanceTable
+from regionindex import RegionIndex
+
+DEFAULT_MIX = {"route": 0.6, "nearest": 0.2, "reachable": 0.1, "tour": 0.1}
+ZIPF_EXPONENT = 1.1
+MAX_START_SNAP = 0.3  # km a start may lie from the network when no boundaries are given
+REACH_BUDGET = 3.0  # km
+TOUR_BUDGET = 10.0  # km
+TOUR_PARKS = 6
+TABLE_FILE = os.path.join(tempfile.gettempdir(), 'park_distances.bin')
+
+# the context of the worker processes, inherited when they are forked
+_CONTEXT = None
+
+
+class LoadContext:
+    """
+    A class holding what the queries of a load test run against: the graph, the park
+    catalogue, the nearest-park table and the park distance table.
+    """
+
+    def __init__(self, graph, catalogue, nearest_table, distance_table, boundaries=None):
+        """
+        Initialize the context.
+
+        Args:
+            graph (Graph): The graph representation of the bikeways network.
+            catalogue (ParkCatalogue): The parks, with their entry vertices snapped.
+            nearest_table (NearestParkTable): The nearest park of every vertex.
+            distance_table (ParkDistanceTable): The park-to-park distances, for tours.
+            boundaries (GeoDataFrame, optional): The local-area boundaries starts are drawn in,
+                indexed in a RegionIndex.
+        """
+        self.graph = graph
+        self.catalogue = catalogue
+        self.nearest_table = nearest_table
+        self.distance_table = distance_table
+        self.boundaries = boundaries
+        self.regions = RegionIndex.from_geodataframe(graph, boundaries) if boundaries is not None else None
+
+    def start_sampling(self):
+        """
+        Describes where the starts of generated queries are drawn.
+
+        Returns:
+            str: The description, for reports.
+        """
+        if self.regions is not None:
+            return "inside the local-area boundaries"
+        return f"within {MAX_START_SNAP} km of the network (no local-area boundaries given)"
+
+    @classmethod
+    def load(cls, table_path=TABLE_FILE, boundaries=None):
+        """
+        Builds the context from the bundled datasets. The park distance table is read from
+        table_path if it is there and still matches the graph, otherwise built and saved.
+
+        Args:
+            table_path (str, optional): Where the park distance table is cached, or None.
+            boundaries (GeoDataFrame, optional): The local-area boundaries, not bundled.
+
+        Returns:
+            LoadContext: The context.
+        """
+        graph, catalogue, indexes = build_snapshot()
+        table = None
+        if table_path is not None and os.path.exists(table_path):
+            try:
+                table = ParkDistanceTable.load(table_path, catalogue.parks)
+            except ValueError:
+                table = None
+            if table is not None and not table.is_current(graph):
+                table = None
+        if table is None:
+            table = ParkDistanceTable.build(graph, catalogue)
+            if table_path is not None:
+                table.save(table_path)
+        return cls(graph, catalogue, indexes["nearest_park"], table, boundaries)
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """
+    Returns the weights of a Zipf distribution, the k-th most popular item weighing 1 / k ** exponent.
+
+    :param count: The number of items.
+    :param exponent: The skew; larger is more skewed.
+    :return: A list of weights, most popular first.
+    """
+    return [1.0 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def random_starts(rng, count, graph, regions=None, max_snap=MAX_START_SNAP):
+    """
+    Draws start coordinates uniformly over the extent of the network, keeping those inside
+    an area of the RegionIndex, or within max_snap of the network when there is none.
+
+    :param rng: A random.Random instance.
+    :param count: The number of starts.
+    :param graph: A Graph instance representing the bikeways network.
+    :param regions: An optional RegionIndex of the local-area boundaries.
+    :param max_snap: The largest distance in kilometers from a start to its closest vertex.
+    :return: A list of (longitude, latitude) tuples.
+    """
+    longitudes = [vertex[0] for vertex in graph.vertices]
+    latitudes = [vertex[1] for vertex in graph.vertices]
+    west, east, south, north = min(longitudes), max(longitudes), min(latitudes), max(latitudes)
+
+    starts = []
+    while len(starts) < count:
+        start = (rng.uniform(west, east), rng.uniform(south, north))
+        if regions is not None:
+            if regions.region_of(start) is not None:
+                starts.append(start)
+        elif graph.find_closest_vertex(start)[1] <= max_snap:
+            starts.append(start)
+    return starts
+
+
+def generate_queries(context, count, seed=0, mix=None, exponent=ZIPF_EXPONENT):
+    """
+    Generates a reproducible mix of queries.
+
+    Parks are ranked in a seeded random order and picked by a Zipf distribution over the
+    ranks, so a few parks get most of the requests, as popular parks do.
+
+    :param context: A LoadContext.
+    :param count: The number of queries.
+    :param seed: The random seed; the same seed gives the same queries.
+    :param mix: A dict of query kinds ('route', 'nearest', 'reachable', 'tour') to their
+                shares, by default DEFAULT_MIX.
+    :param exponent: The skew of the park popularity.
+    :return: A list of (kind, start coordinate, park names) tuples; routes have one park,
+             tours TOUR_PARKS distinct ones and the other kinds none.
+    """
+    rng = random.Random(seed)
+    mix = DEFAULT_MIX if mix is None else mix
+    kinds, shares = list(mix), list(mix.values())
+    ranked = [park.name for park in context.catalogue.parks]
+    rng.shuffle(ranked)
+    # names repeat in the dataset, and lookups are by name
+    ranked = list(dict.fromkeys(ranked))
+    weights = zipf_weights(len(ranked), exponent)
+    starts = random_starts(rng, count, context.graph, context.regions)
+
+    queries = []
+    for start in starts:
+        kind = rng.choices(kinds, shares)[0]
+        names = ()
+        if kind == "route":
+            names = tuple(rng.choices(ranked, weights))
+        elif kind == "tour":
+            picked = []
+            while len(picked) < min(TOUR_PARKS, len(ranked)):
+                name = rng.choices(ranked, weights)[0]
+                if name not in picked:
+                    picked.append(name)
+            names = tuple(picked)
+        queries.append((kind, start, names))
+    return queries
+
+
+def run_query(context, query):
+    """
+    Answers one query with the routing entry points, none of which modifies the graph.
+
+    :param context: A LoadContext.
+    :param query: A (kind, start coordinate, park names) tuple from generate_queries.
+    :return: The answer of the entry point.
+    :raises: ValueError for an unknown kind.
+    """
+    kind, start, names = query
+    if kind == "route":
+        return alternativeroutes.k_shortest_paths(context.graph, start, context.catalogue.get(names[0]), k=1,
+                                                  catalogue=context.catalogue)
+    if kind == "nearest":
+        return context.nearest_table.nearest(start)
+    if kind == "reachable":
+        return reachability.reachable_parks(context.graph, start, context.catalogue.parks, REACH_BUDGET,
+                                            catalogue=context.catalogue)
+    if kind == "tour":
+        return plan_tour(context.distance_table, context.graph, start, TOUR_BUDGET,
+                         parks=[context.catalogue.get(name) for name in names])
+    raise ValueError(f"Unknown query kind: {kind}")
+
+
+def _run_batch(context, queries):
+    samples = []
+    failed = {}
+    for query in queries:
+        begin = time.perf_counter()
+        try:
+            run_query(context, query)
+        except Exception:
+            failed[query[0]] = failed.get(query[0], 0) + 1
+            continue
+        samples.append((query[0], time.perf_counter() - begin))
+    return samples, failed, peak_rss()
+
+
+def _run_process_batch(queries):
+    return _run_batch(_CONTEXT, queries)
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process.
+
+    :return: The peak in bytes, or None where the resource module is missing (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_load(context, queries, concurrency=4, processes=False):
+    """
+    Replays queries with a number of concurrent closed-loop clients, each sending its next
+    query as soon as the previous one is answered.
+
+    :param context: A LoadContext.
+    :param queries: A list of queries from generate_queries, dealt round-robin to the clients.
+    :param concurrency: The number of concurrent clients.
+    :param processes: Whether the clients are processes instead of threads. Processes share
+                      the context by forking, so this needs a platform with fork.
+    :return: A dict with the number of 'queries' answered and 'failed', the 'elapsed' wall
+             time in seconds, the 'throughput' in queries per second, the 'latency'
+             percentiles (p50, p95, p99) in seconds overall and per kind in 'by_kind', and
+             the 'peak_rss' in bytes of the largest process. Each kind in 'by_kind' also has
+             the 'count' of its queries answered and 'failed'; the percentiles of a kind or run
+             without any answered query are None. 'starts' describes where the starts
+             were drawn, as LoadContext.start_sampling.
+    :raises: ValueError if processes are asked for without fork.
+    """
+    global _CONTEXT
+    batches = [queries[client::concurrency] for client in range(concurrency)]
+    begin = time.perf_counter()
+    if processes:
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("Process clients need the fork start method")
+        _CONTEXT = context
+        try:
+            with ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context('fork')) as executor:
+                results = list(executor.map(_run_process_batch, batches))
+        finally:
+            _CONTEXT = None
+    else:
+        results = [None] * concurrency
+
+        def client(position):
+            results[position] = _run_batch(context, batches[position])
+
+        threads = [threading.Thread(target=client, args=(position,)) for position in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - begin
+
+    samples = [sample for batch_samples, _, _ in results for sample in batch_samples]
+    peaks = [peak for _, _, peak in results if peak is not None] + [peak_rss() or 0]
+
+    def summary(latencies):
+        return {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99)}
+
+    by_kind = {}
+    failed = {}
+    for kind, latency in samples:
+        by_kind.setdefault(kind, []).append(latency)
+    for _, batch_failed, _ in results:
+        for kind, count in batch_failed.items():
+            by_kind.setdefault(kind, [])
+            failed[kind] = failed.get(kind, 0) + count
+    return {"queries": len(samples), "failed": sum(failed.values()), "elapsed": elapsed,
+            "throughput": len(samples) / elapsed if elapsed else 0.0,
+            "latency": summary([latency for _, latency in samples]),
+            "by_kind": {kind: dict(summary(latencies), count=len(latencies), failed=failed.get(kind, 0))
+                        for kind, latencies in by_kind.items()},
+            "peak_rss": max(peaks), "starts": context.start_sampling()}
+
+
+def format_report(result):
+    """
+    Formats the result of run_load as lines of text.
+
+    :param result: A dict returned by run_load.
+    :return: The report as a string.
+    """
+    def milliseconds(stats):
+        # a run or kind whose queries all failed has no percentiles
+        return "  ".join(f"{name} {'n/a':>10}" if stats[name] is None else f"{name} {stats[name] * 1000:7.1f} ms"
+                         for name in ("p50", "p95", "p99"))
+
+    lines = [f"{result['queries']} queries ({result['failed']} failed) in {result['elapsed']:.2f} s, "
+             f"{result['throughput']:.1f} queries/s, peak RSS {result['peak_rss'] / 2 ** 20:.0f} MiB",
+             f"{'all':>10}: {milliseconds(result['latency'])}"]
+    for kind, stats in sorted(result["by_kind"].items()):
+        lines.append(f"{kind:>10}: {milliseconds(stats)}  ({stats['count']} queries, {stats['failed']} failed)")
+    if result.get("starts"):
+        lines.append(f"starts drawn {result['starts']}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    context = LoadContext.load()
+    queries = generate_queries(context, 400, seed=1)
+    for clients, processes in ((1, False), (4, False), (4, True)):
+        print(f"--- {clients} {'processes' if processes else 'threads'}")
+        print(format_report(run_load(context, queries, clients, processes)))
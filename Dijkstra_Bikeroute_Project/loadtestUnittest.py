@@ -0,0 +1,146 @@
+import multiprocessing
+import random
+import unittest
+from classbuilder import Graph
+from parkbuilder import Park, ParkCatalogue
+from nearestpark import NearestParkTable
+from parkdistances import ParkDistanceTable
+from loadtest import LoadContext, zipf_weights, random_starts, generate_queries, run_query, run_load, format_report
+
+
+class TestLoadTest(unittest.TestCase):
+    """
+    A unittest class for testing the load test harness.
+    """
+
+    def setUp(self):
+        # a small grid of streets with a park at each corner
+        self.graph = Graph()
+        parsed_data = [["Object ID", "Geom"]]
+        for i in range(5):
+            parsed_data.append([str(i), [[j * 0.005, i * 0.005] for j in range(5)]])
+            parsed_data.append([str(10 + i), [[i * 0.005, j * 0.005] for j in range(5)]])
+        self.graph.build_graph(parsed_data, 1)
+        parks = [Park([(0.0005, 0.0)], None, "SW"), Park([(0.0195, 0.0)], None, "SE"),
+                 Park([(0.0005, 0.02)], None, "NW"), Park([(0.0195, 0.02)], None, "NE")]
+        catalogue = ParkCatalogue(parks)
+        catalogue.precompute_entries(self.graph)
+        self.context = LoadContext(self.graph, catalogue, NearestParkTable(self.graph, parks),
+                                   ParkDistanceTable.build(self.graph, catalogue))
+
+    def test_zipf_weights(self):
+        """
+        Tests that popularity falls off with rank.
+        """
+        weights = zipf_weights(3, exponent=1.0)
+        self.assertEqual(weights, [1.0, 0.5, 1.0 / 3])
+
+    def test_random_starts(self):
+        """
+        Tests that starts lie within the extent of the network and close to it.
+        """
+        starts = random_starts(random.Random(0), 20, self.graph, max_snap=0.5)
+        self.assertEqual(len(starts), 20)
+        for start in starts:
+            self.assertTrue(0 <= start[0] <= 0.02 and 0 <= start[1] <= 0.02)
+            self.assertLessEqual(self.graph.find_closest_vertex(start)[1], 0.5)
+
+    def test_random_starts_boundaries(self):
+        """
+        Tests that starts are drawn inside the boundaries when they are given.
+        """
+        import geopandas as gpd
+        from shapely.geometry import box
+        boundaries = gpd.GeoDataFrame({"name": ["west"]}, geometry=[box(0, 0, 0.005, 0.02)])
+        context = LoadContext(self.graph, self.context.catalogue, self.context.nearest_table,
+                              self.context.distance_table, boundaries)
+        for start in random_starts(random.Random(0), 20, self.graph, context.regions):
+            self.assertLessEqual(start[0], 0.005)
+        self.assertEqual(context.start_sampling(), "inside the local-area boundaries")
+        self.assertIn("no local-area boundaries", self.context.start_sampling())
+
+    def test_generate_queries(self):
+        """
+        Tests that queries are reproducible from the seed, follow the mix and favor popular parks.
+        """
+        queries = generate_queries(self.context, 200, seed=3)
+        self.assertEqual(queries, generate_queries(self.context, 200, seed=3))
+        self.assertNotEqual(queries, generate_queries(self.context, 200, seed=4))
+
+        kinds = [kind for kind, _, _ in queries]
+        self.assertGreater(kinds.count("route"), kinds.count("tour"))
+        for kind, _, names in queries:
+            if kind == "tour":
+                self.assertEqual(len(set(names)), 4)
+
+        routes = generate_queries(self.context, 400, seed=3, mix={"route": 1.0}, exponent=2.0)
+        counts = sorted((sum(1 for _, _, names in routes if names == (name,)) for name in ("SW", "SE", "NW", "NE")),
+                        reverse=True)
+        self.assertGreater(counts[0], 2 * counts[1])
+
+    def test_run_query(self):
+        """
+        Tests that each kind of query is answered by its entry point.
+        """
+        start = (0.001, 0.001)
+        routes = run_query(self.context, ("route", start, ("NE",)))
+        self.assertEqual(len(routes), 1)
+        park, _ = run_query(self.context, ("nearest", start, ()))
+        self.assertEqual(park.name, "SW")
+        # the far corner is more than the reach budget away along the streets
+        reached, _ = run_query(self.context, ("reachable", start, ()))
+        self.assertEqual({park.name for park, _ in reached}, {"SW", "SE", "NW"})
+        tour, _, reward = run_query(self.context, ("tour", start, ("SW", "SE", "NW", "NE")))
+        self.assertEqual(reward, 4)
+
+        # Error handle case
+        with self.assertRaises(ValueError):
+            run_query(self.context, ("unknown", start, ()))
+
+    def test_run_load_threads(self):
+        """
+        Tests that every query is answered and the report has its percentiles.
+        """
+        queries = generate_queries(self.context, 40, seed=1)
+        result = run_load(self.context, queries, concurrency=3)
+        self.assertEqual(result["queries"], 40)
+        self.assertEqual(result["failed"], 0)
+        self.assertLessEqual(result["latency"]["p50"], result["latency"]["p95"])
+        self.assertLessEqual(result["latency"]["p95"], result["latency"]["p99"])
+        self.assertEqual(sum(stats["count"] for stats in result["by_kind"].values()), 40)
+        self.assertGreater(result["peak_rss"], 0)
+        self.assertIn("queries/s", format_report(result))
+        self.assertIn("starts drawn within", format_report(result))
+
+    def test_format_report_failed_queries(self):
+        """
+        Tests that a run or a kind whose queries all failed is reported without percentiles.
+        """
+        queries = [("unknown", (0.001, 0.001), ())] * 3
+        result = run_load(self.context, queries, concurrency=2)
+        self.assertEqual(result["failed"], 3)
+        self.assertIsNone(result["latency"]["p50"])
+        self.assertEqual(result["by_kind"]["unknown"]["failed"], 3)
+        report = format_report(result)
+        self.assertIn("0 queries (3 failed)", report)
+        self.assertIn("   unknown: p50        n/a", report)
+
+        # a kind whose queries all failed is reported beside one that has percentiles
+        result = run_load(self.context, queries + [("nearest", (0.001, 0.001), ())], concurrency=2)
+        self.assertEqual(result["by_kind"]["nearest"]["count"], 1)
+        self.assertIsNotNone(result["latency"]["p50"])
+        self.assertIn("   unknown: p50        n/a", format_report(result))
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_run_load_processes(self):
+        """
+        Tests that process clients answer every query.
+        """
+        queries = generate_queries(self.context, 20, seed=1)
+        result = run_load(self.context, queries, concurrency=2, processes=True)
+        self.assertEqual(result["queries"], 20)
+        self.assertEqual(result["failed"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
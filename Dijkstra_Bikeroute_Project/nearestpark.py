@@ -0,0 +1,144 @@
+import csv
+
+OUTPUT_COLUMNS = ["name", "longitude", "latitude", "park", "distance_km"]
+PARQUET_BATCH_SIZE = 10000
+
+
+class NearestParkTable:
+    """
+    A class labelling every graph vertex with its nearest park and the network distance to it.
+
+    The labels come from a single multi-source Dijkstra search seeded from the entry
+    vertices of every park, so answering a start point afterwards is one snap to the graph
+    and one table lookup, however many start points there are. The labels are recomputed
+    on the next lookup once the graph version changes, e.g. after Graph.apply_delta.
+    """
+
+    def __init__(self, graph, parks, mask=None):
+        """
+        Initialize the table by running the multi-source search.
+
+        Args:
+            graph (Graph): The graph representation of the bikeways network.
+            parks (list): A list of Park objects.
+            mask (ClosureMask, optional): Closures the search routes around.
+        """
+        self.graph = graph
+        self.parks = parks
+        self.mask = mask
+        self.build()
+
+    def build(self):
+        """
+        Runs the multi-source search and labels the vertices of the graph as it is now.
+        """
+        self.version = self.graph.version
+
+        sources = {}
+        source_parks = {}
+        for park_index, park in enumerate(self.parks):
+            for vertex, connector in self.graph.entry_vertices(park.coordinates).items():
+                if connector < sources.get(vertex, float('inf')):
+                    sources[vertex] = connector
+                    source_parks[vertex] = park_index
+
+        self.distances, previous_vertices = self.graph.shortest_distances(sources, mask=self.mask)
+        # vertices are settled after their predecessor, so one pass in settlement order
+        # hands every vertex the park of the source its shortest path started from
+        self.labels = {}
+        for vertex in self.distances:
+            previous_vertex = previous_vertices[vertex]
+            self.labels[vertex] = source_parks[vertex] if previous_vertex is None else self.labels[previous_vertex]
+
+    def nearest(self, coordinate):
+        """
+        Finds the nearest park by network distance from a coordinate.
+
+        Args:
+            coordinate (tuple): The coordinate to start from.
+
+        Returns:
+            tuple: The nearest Park and the distance in kilometers, connector to the graph
+            included, or (None, inf) if no park can be reached.
+        """
+        if self.version != self.graph.version:
+            # the labels were computed on an older graph, whose vertices may be gone
+            self.build()
+        vertex, connector = self.graph.find_closest_vertex(tuple(coordinate))
+        if vertex not in self.labels:
+            return None, float('inf')
+        return self.parks[self.labels[vertex]], connector + self.distances[vertex]
+
+    def nearest_many(self, startpoints):
+        """
+        Answers a batch of start points lazily, one at a time.
+
+        Args:
+            startpoints (iterable): StartPoint objects; the first coordinate of each is used.
+
+        Yields:
+            tuple: The StartPoint, its nearest Park (or None) and the distance in kilometers.
+        """
+        for startpoint in startpoints:
+            park, distance = self.nearest(startpoint.coordinates[0])
+            yield startpoint, park, distance
+
+    def _rows(self, startpoints):
+        for startpoint, park, distance in self.nearest_many(startpoints):
+            longitude, latitude = startpoint.coordinates[0]
+            yield [startpoint.name, longitude, latitude, park.name if park else "",
+                   distance if park else ""]
+
+    def write_csv(self, startpoints, path):
+        """
+        Streams the answers for a batch of start points to a CSV file as they are computed.
+
+        Args:
+            startpoints (iterable): StartPoint objects.
+            path (str): The path of the CSV file to write.
+
+        Returns:
+            int: The number of rows written.
+        """
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(OUTPUT_COLUMNS)
+            for row in self._rows(startpoints):
+                writer.writerow(row)
+                count += 1
+        return count
+
+    def write_parquet(self, startpoints, path, batch_size=PARQUET_BATCH_SIZE):
+        """
+        Streams the answers for a batch of start points to a Parquet file, one row group per batch.
+
+        Requires pyarrow, which is only imported when this method is used.
+
+        Args:
+            startpoints (iterable): StartPoint objects.
+            path (str): The path of the Parquet file to write.
+            batch_size (int, optional): The number of rows per row group.
+
+        Returns:
+            int: The number of rows written.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([("name", pa.string()), ("longitude", pa.float64()), ("latitude", pa.float64()),
+                            ("park", pa.string()), ("distance_km", pa.float64())])
+        count = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            batch = []
+            for row in self._rows(startpoints):
+                # unreachable start points get nulls rather than empty strings
+                batch.append(row[:3] + [row[3] or None, row[4] if row[4] != "" else None])
+                if len(batch) == batch_size:
+                    writer.write_table(pa.Table.from_pylist([dict(zip(OUTPUT_COLUMNS, values)) for values in batch], schema))
+                    count += len(batch)
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist([dict(zip(OUTPUT_COLUMNS, values)) for values in batch], schema))
+                count += len(batch)
+        return count
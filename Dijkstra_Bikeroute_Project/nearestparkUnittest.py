@@ -0,0 +1,86 @@
+import csv
+import os
+import tempfile
+import unittest
+from classbuilder import Graph
+from parkbuilder import Park
+from startpointbuilder import StartPoint
+from nearestpark import NearestParkTable
+
+
+class TestNearestParkTable(unittest.TestCase):
+    """
+    A unittest class for testing the NearestParkTable class.
+    """
+
+    def setUp(self):
+        # a line of vertices with a park near each end, and an unconnected vertex
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[0, 0], [0, 0.01], [0, 0.02], [0, 0.03]]],
+            ["2", [[1, 1], [1, 1.0001]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.west = Park([(0.001, 0), (0.002, 0)], None, "West")
+        self.east = Park([(0.001, 0.03)], None, "East")
+        self.table = NearestParkTable(self.graph, [self.west, self.east])
+
+    def test_labels(self):
+        """
+        Tests that every connected vertex is labelled with its nearest park by network distance.
+        """
+        self.assertEqual(self.table.labels[(0, 0.01)], 0)
+        self.assertEqual(self.table.labels[(0, 0.02)], 1)
+        self.assertNotIn((1, 1), self.table.labels)
+        self.assertAlmostEqual(self.table.distances[(0, 0.01)], self.graph.haversine_distance((0, 0), (0, 0.01))
+                               + self.graph.haversine_distance((0, 0), (0.001, 0)))
+
+    def test_nearest(self):
+        """
+        Tests answering single coordinates, including unreachable ones.
+        """
+        park, distance = self.table.nearest((-0.001, 0.019))
+        self.assertIs(park, self.east)
+        self.assertAlmostEqual(distance, self.graph.haversine_distance((-0.001, 0.019), (0, 0.02))
+                               + self.table.distances[(0, 0.02)])
+
+        # Start point snapped to a vertex no park can be reached from
+        self.assertEqual(self.table.nearest((1, 1.0002)), (None, float('inf')))
+
+    def test_graph_update(self):
+        """
+        Tests that a lookup after the graph changed answers from the changed graph.
+        """
+        old_row = ["2", [[1, 1], [1, 1.0001]]]
+        new_row = ["2", [[0, 0.03], [1, 1.0001]]]
+        self.graph.apply_delta({"key_index": 0, "inserted": [], "removed": [],
+                                "modified": [(old_row, new_row)]}, 1)
+        self.assertNotIn((1, 1.0001), self.table.labels)
+
+        # the island is now linked to the east end of the line
+        park, distance = self.table.nearest((1, 1.0002))
+        self.assertIs(park, self.east)
+        self.assertEqual(self.table.version, self.graph.version)
+        self.assertNotIn((1, 1), self.table.labels)
+
+    def test_write_csv(self):
+        """
+        Tests streaming a batch of start points to CSV.
+        """
+        startpoints = [StartPoint("School A", [(0, 0.001)]), StartPoint("School B", [(1, 1)])]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "nearest.csv")
+            # a generator works too, the batch is never held in memory
+            count = self.table.write_csv((startpoint for startpoint in startpoints), path)
+            with open(path, newline="", encoding="utf-8") as csv_file:
+                rows = list(csv.reader(csv_file))
+
+        self.assertEqual(count, 2)
+        self.assertEqual(rows[0], ["name", "longitude", "latitude", "park", "distance_km"])
+        self.assertEqual(rows[1][:4], ["School A", "0", "0.001", "West"])
+        self.assertEqual(rows[2][3:], ["", ""])
+
+
+if __name__ == '__main__':
+    unittest.main()
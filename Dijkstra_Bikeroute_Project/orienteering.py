@@ -0,0 +1,180 @@
+import random
+import time
+
+EXACT_LIMIT = 12  # candidate parks up to which the exact dynamic program is used
+DEFAULT_TIME_LIMIT = 1.0  # seconds
+
+
+def area_reward(park):
+    """
+    Rewards a park by its area in hectares, for plan_tour.
+
+    :param park: A Park instance.
+    :return: The area, or 0 if unknown.
+    """
+    return park.area or 0.0
+
+
+def plan_tour(table, graph, start_coordinate, budget, parks=None, reward=None, mask=None,
+              exact_limit=EXACT_LIMIT, time_limit=DEFAULT_TIME_LIMIT, seed=0):
+    """
+    Plans a round trip from a start coordinate that collects as much reward as possible,
+    one per park by default, within a distance budget.
+
+    Park legs come from a ParkDistanceTable, so the only graph search is the one attaching
+    the start to every park. Parks out of reach of a round trip are dropped first; if at
+    most exact_limit remain the tour is optimal, found by a dynamic program over subsets,
+    otherwise an iterated insertion heuristic runs until the time limit.
+
+    :param table: A ParkDistanceTable computed on the graph.
+    :param graph: A Graph instance representing the bikeways network.
+    :param start_coordinate: The coordinate tuple the tour starts and ends at.
+    :param budget: The length limit of the round trip in kilometers.
+    :param parks: The candidate Park instances, all parks of the table by default.
+    :param reward: A function giving the reward of a park, such as area_reward; 1 per park by default.
+    :param mask: An optional ClosureMask for the start search. The table has its own closures.
+    :param exact_limit: The largest number of candidates solved exactly.
+    :param time_limit: The time in seconds the heuristic may run.
+    :param seed: The seed of the heuristic's random moves, for reproducible tours.
+    :return: A tuple of the parks in visiting order, the round trip length in kilometers,
+             and the total reward.
+    """
+    start_distances = table.start_distances(graph, start_coordinate, mask)
+    candidates = [table.index(park) for park in (table.parks if parks is None else parks)]
+    candidates = [index for index in dict.fromkeys(candidates) if 2 * start_distances[index] <= budget]
+    rewards = {index: (1.0 if reward is None else reward(table.parks[index])) for index in candidates}
+
+    count = len(table.parks)
+
+    def leg(a, b):
+        # None stands for the start
+        if a is None and b is None:
+            return 0.0
+        if a is None:
+            return start_distances[b]
+        if b is None:
+            return start_distances[a]
+        return table.distances[a * count + b]
+
+    if len(candidates) <= exact_limit:
+        order = _solve_exact(candidates, rewards, leg, budget)
+    else:
+        order = _solve_heuristic(candidates, rewards, leg, budget, time_limit, random.Random(seed))
+    return ([table.parks[index] for index in order], _tour_length(order, leg),
+            sum(rewards[index] for index in order))
+
+
+def _tour_length(order, leg):
+    stops = [None] + list(order) + [None]
+    return sum(leg(a, b) for a, b in zip(stops, stops[1:])) if order else 0.0
+
+
+def _solve_exact(candidates, rewards, leg, budget):
+    """
+    Finds the best tour by dynamic programming over the subsets of candidates: the shortest
+    path from the start through each subset ending at each park, extended only while the
+    way back still fits the budget.
+    """
+    size = len(candidates)
+    best_order, best_key = [], (0.0, 0.0)
+    # shortest[(subset, last)] = (length, previous last)
+    shortest = {}
+    layer = {}
+    for position, index in enumerate(candidates):
+        length = leg(None, index)
+        if length + leg(index, None) <= budget:
+            layer[(1 << position, position)] = length
+            shortest[(1 << position, position)] = (length, None)
+
+    while layer:
+        next_layer = {}
+        for (subset, last), length in layer.items():
+            total = length + leg(candidates[last], None)
+            subset_reward = sum(rewards[candidates[position]] for position in range(size) if subset >> position & 1)
+            # more reward first, then a shorter tour
+            if (subset_reward, -total) > best_key:
+                best_key = (subset_reward, -total)
+                best_order = _unwind(shortest, subset, last, candidates)
+            for position in range(size):
+                if subset >> position & 1:
+                    continue
+                extended = length + leg(candidates[last], candidates[position])
+                if extended + leg(candidates[position], None) > budget:
+                    continue
+                state = (subset | 1 << position, position)
+                if extended < next_layer.get(state, float('inf')):
+                    next_layer[state] = extended
+                    shortest[state] = (extended, last)
+        layer = next_layer
+    return best_order
+
+
+def _unwind(shortest, subset, last, candidates):
+    order = []
+    while last is not None:
+        order.append(candidates[last])
+        previous = shortest[(subset, last)][1]
+        subset &= ~(1 << last)
+        last = previous
+    return order[::-1]
+
+
+def _solve_heuristic(candidates, rewards, leg, budget, time_limit, rng):
+    """
+    Builds a tour by cheapest-ratio insertion, shortens it with 2-opt, then repeatedly drops
+    a few random parks and inserts again, keeping the best tour found before the time limit.
+    """
+    deadline = time.perf_counter() + time_limit
+
+    def insert(order, noise):
+        length = _tour_length(order, leg)
+        remaining = set(candidates) - set(order)
+        while True:
+            best = None
+            for index in remaining:
+                stops = [None] + order + [None]
+                position, added = min(((i, leg(stops[i], index) + leg(index, stops[i + 1]) - leg(stops[i], stops[i + 1]))
+                                       for i in range(len(stops) - 1)), key=lambda item: item[1])
+                if length + added > budget:
+                    continue
+                ratio = rewards[index] / max(added, 1e-9) * (1 + noise * rng.random())
+                if best is None or ratio > best[0]:
+                    best = (ratio, index, position, added)
+            if best is None:
+                return order, length
+            _, index, position, added = best
+            order = order[:position] + [index] + order[position:]
+            length += added
+            remaining.discard(index)
+
+    def two_opt(order):
+        improved = True
+        while improved:
+            improved = False
+            stops = [None] + order + [None]
+            for i in range(1, len(stops) - 2):
+                for j in range(i + 1, len(stops) - 1):
+                    change = (leg(stops[i - 1], stops[j]) + leg(stops[i], stops[j + 1])
+                              - leg(stops[i - 1], stops[i]) - leg(stops[j], stops[j + 1]))
+                    if change < -1e-12:
+                        stops[i:j + 1] = stops[i:j + 1][::-1]
+                        improved = True
+            order = stops[1:-1]
+        return order
+
+    order, _ = insert([], 0.0)
+    order = two_opt(order)
+    order, _ = insert(order, 0.0)
+    best_order = order
+    best_key = (sum(rewards[index] for index in order), -_tour_length(order, leg))
+
+    while time.perf_counter() < deadline and best_order:
+        order = list(best_order)
+        for _ in range(rng.randint(1, max(1, len(order) // 3))):
+            order.pop(rng.randrange(len(order)))
+        order, _ = insert(two_opt(order), 0.5)
+        order, _ = insert(two_opt(order), 0.0)
+        key = (sum(rewards[index] for index in order), -_tour_length(order, leg))
+        if key > best_key:
+            best_order, best_key = order, key
+    return best_order
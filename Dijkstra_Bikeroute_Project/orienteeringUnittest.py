@@ -0,0 +1,72 @@
+import unittest
+from classbuilder import Graph
+from parkbuilder import Park, ParkCatalogue
+from parkdistances import ParkDistanceTable
+from orienteering import *
+
+
+class TestOrienteering(unittest.TestCase):
+    """
+    A unittest class for testing budgeted tour planning.
+    """
+
+    def setUp(self):
+        # a 0.01 degree ladder along the second component, roughly 1.1 km per rung, running
+        # both ways from the start, and an island no park can reach
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[0, -0.02], [0, -0.01], [0, 0], [0, 0.01], [0, 0.02], [0, 0.03], [0, 0.04]]],
+            ["2", [[1, 1], [1, 1.01]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.rung = self.graph.haversine_distance((0, 0), (0, 0.01))
+        self.small = [Park([(0, 0.01 * rung)], None, f"Small {rung}", area=1.0) for rung in range(1, 5)]
+        self.big = Park([(0, -0.02)], None, "Big", area=50.0)
+        self.island = Park([(1, 1)], None, "Island", area=100.0)
+        catalogue = ParkCatalogue(self.small + [self.big, self.island])
+        self.table = ParkDistanceTable.build(self.graph, catalogue)
+        # enough for three rungs out and back
+        self.budget = 6 * self.rung + 0.01
+
+    def test_exact(self):
+        """
+        Tests that the exact solver visits the most parks, or the most area, within the budget.
+        """
+        parks, length, reward = plan_tour(self.table, self.graph, (0, 0), self.budget)
+        self.assertEqual([park.name for park in parks], ["Small 1", "Small 2", "Small 3"])
+        self.assertAlmostEqual(length, 6 * self.rung)
+        self.assertEqual(reward, 3)
+
+        parks, length, reward = plan_tour(self.table, self.graph, (0, 0), self.budget, reward=area_reward)
+        self.assertEqual({park.name for park in parks}, {"Big", "Small 1"})
+        self.assertEqual(reward, 51)
+        self.assertLessEqual(length, self.budget)
+
+        # Budget too small for any park
+        self.assertEqual(plan_tour(self.table, self.graph, (0, 0), self.rung), ([], 0.0, 0))
+
+    def test_heuristic(self):
+        """
+        Tests that the heuristic finds the optimal tours of this small instance within the budget.
+        """
+        for reward, expected in ((None, 3), (area_reward, 51)):
+            parks, length, total = plan_tour(self.table, self.graph, (0, 0), self.budget, reward=reward,
+                                             exact_limit=0, time_limit=0.05)
+            self.assertEqual(total, expected)
+            self.assertLessEqual(length, self.budget)
+            self.assertAlmostEqual(length, self.table.tour_length(parks)
+                                   + self.table.start_distances(self.graph, (0, 0))[self.table.index(parks[0])]
+                                   + self.table.start_distances(self.graph, (0, 0))[self.table.index(parks[-1])])
+
+    def test_candidates(self):
+        """
+        Tests restricting the candidate parks.
+        """
+        parks, _, reward = plan_tour(self.table, self.graph, (0, 0), self.budget, parks=[self.small[2], self.island])
+        self.assertEqual(parks, [self.small[2]])
+        self.assertEqual(reward, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
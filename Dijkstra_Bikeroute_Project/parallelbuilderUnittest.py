@@ -0,0 +1,66 @@
+import unittest
+from parallelbuilder import *
+
+RAW_DATA = '\n'.join([
+    'Object ID;Bike Route Name;Geom',
+    '1;Highbury;{"coordinates": [[-123.1875, 49.2699], [-123.1875, 49.2695]], "type": "LineString"}',
+    '2;Highbury;{"coordinates": [[-123.1875, 49.2695], [-123.1876, 49.2686], [-123.1876, 49.2677]], "type": "LineString"}',
+    '3;10th Ave;{"coordinates": [[-123.1876, 49.2686], [-123.1850, 49.2686]], "type": "LineString"}',
+    '4;10th Ave;{"coordinates": [[-123.18500000004, 49.2686], [-123.1840, 49.2686]], "type": "LineString"}',
+])
+
+
+class TestParallelBuilder(unittest.TestCase):
+    """
+    A unittest class for testing the parallel graph builder.
+    """
+
+    def test_process_chunk(self):
+        """
+        Tests that a chunk is turned into records, coordinate tuples and segment lengths.
+        """
+        parsed_data = dataProcessor.parse_csv_data(RAW_DATA)
+        results = process_chunk(parsed_data[1:2], 2)
+        record, coordinates, lengths = results[0]
+        self.assertEqual(record, ['1', 'Highbury'])
+        self.assertEqual(coordinates, [(-123.1875, 49.2699), (-123.1875, 49.2695)])
+        self.assertEqual(len(lengths), 1)
+        self.assertAlmostEqual(lengths[0], classbuilder.haversine_distance(*coordinates))
+
+    def test_build_graph_parallel(self):
+        """
+        Tests that the parallel build gives the same graph, in the same order, as the serial build.
+        """
+        serial = build_graph_serial(dataProcessor.parse_csv_data(RAW_DATA), 2)
+        # one row per chunk, so the rows are spread over several chunks
+        parallel = build_graph_parallel(dataProcessor.parse_csv_data(RAW_DATA), 2, workers=2, chunk_size=1,
+                                        min_rows=0)
+
+        self.assertEqual(list(parallel.vertices), list(serial.vertices))
+        # the start of row 4 is quantized onto the end of row 3 in the worker too
+        self.assertEqual(len(parallel.vertices), 6)
+        for vertex in serial.vertices:
+            self.assertEqual(parallel.get_neighbors(vertex), serial.get_neighbors(vertex))
+        self.assertEqual(parallel.row_keys, serial.row_keys)
+        self.assertEqual(parallel.attributes.columns, serial.attributes.columns)
+        self.assertEqual(parallel.edge_count, serial.edge_count)
+
+    def test_serial_fallback(self):
+        """
+        Tests that small inputs and single workers are built serially, with the same result.
+        """
+        self.assertEqual(worker_count(10, workers=4, min_rows=100), 1)
+        self.assertEqual(worker_count(100, workers=4, min_rows=100), 4)
+        self.assertEqual(worker_count(100, workers=1, min_rows=0), 1)
+
+        serial = build_graph_serial(dataProcessor.parse_csv_data(RAW_DATA), 2)
+        parsed_data = dataProcessor.parse_csv_data(RAW_DATA)
+        fallback = build_graph_parallel(parsed_data, 2, workers=2)
+        # the serial build extracts the geometry in place, the workers leave the rows untouched
+        self.assertIsInstance(parsed_data[1][2], list)
+        self.assertEqual(list(fallback.vertices), list(serial.vertices))
+        self.assertEqual(fallback.row_keys, serial.row_keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
+from classbuilder import haversine_distance
+from spatialindex import CoordinateIndex
+
+
 class Park:
     """A class to represent a park with its coordinates, center point, and name."""
 
-    def __init__(self, coordinates, center_point, name):
+    def __init__(self, coordinates, center_point, name, area=None, park_id=None):
         """
         Initialize a Park object.
 
@@ -9,8 +13,183 @@ class Park:
             coordinates (list): A list of coordinates representing the park's boundaries.
             center_point (tuple): A tuple (latitude, longitude) representing the park's center point.
             name (str): The name of the park.
+            area (float, optional): The area of the park in hectares.
+            park_id (int, optional): The ID of the park in the parks dataset.
         """
         self.coordinates = coordinates
         self.center_point = center_point
         self.name = name
+        self.area = area
+        self.park_id = park_id
+
+
+def park_from_row(header, row, geom_index):
+    """
+    Creates a Park from a row of the parks dataset, looking its columns up by header name.
+
+    Args:
+        header (list): The header row of the parks dataset.
+        row (list): A row of the parks dataset, with its geometry already extracted.
+        geom_index (int): The index of the geometry column.
+
+    Returns:
+        Park: The park, with the geo_point_2d column parsed into a (latitude, longitude) tuple.
+    """
+    def value(column):
+        return row[header.index(column)] if column in header and row[header.index(column)] != "" else None
+
+    center_point = value("geo_point_2d")
+    if center_point is not None:
+        center_point = tuple(float(part) for part in center_point.split(","))
+    area = value("AREA_HA")
+    park_id = value("PARK_ID")
+    return Park(row[geom_index], center_point, value("PARK_NAME"),
+                area=float(area) if area is not None else None,
+                park_id=int(float(park_id)) if park_id is not None else None)
+
+
+class ParkCatalogue:
+    """
+    A class indexing parks by name, ID and center point, built once for all queries.
+
+    The center points are kept in a CoordinateIndex in the graph's (longitude, latitude)
+    order for "parks near here" prefilters, and the entry vertices of each park are snapped
+    once per graph version, so queries never go back to the boundary rings.
+    """
+
+    def __init__(self, parks):
+        """
+        Initialize the catalogue.
+
+        Args:
+            parks (list): A list of Park objects.
+        """
+        self.parks = list(parks)
+        self.by_name = {}
+        self.by_id = {}
+        self.centers = CoordinateIndex()
+        self.center_parks = {}
+        self.extents = {}
+        self.max_extent = 0.0
+        self.entries = {}
+        self.entries_graph = None
+        self.entries_version = None
+        for park in self.parks:
+            self._add(park)
+
+    def __len__(self):
+        return len(self.parks)
+
+    def __iter__(self):
+        return iter(self.parks)
+
+    def _add(self, park):
+        # names are not unique in the dataset; the first park keeps the name, as the dropdown lookup did
+        self.by_name.setdefault(park.name, park)
+        if park.park_id is not None:
+            self.by_id.setdefault(park.park_id, []).append(park)
+
+        center = self.center(park)
+        if center is None:
+            return
+        self.centers.add(center)
+        self.center_parks.setdefault(center, []).append(park)
+        extent = max((haversine_distance(center, tuple(coordinate)) for coordinate in park.coordinates), default=0.0)
+        self.extents[id(park)] = extent
+        self.max_extent = max(self.max_extent, extent)
+
+    @staticmethod
+    def center(park):
+        """
+        Returns the center of a park in the graph's (longitude, latitude) order.
 
+        Args:
+            park (Park): The park.
+
+        Returns:
+            tuple: The center point, the mean of the boundary coordinates if the park has no
+            center point, or None if it has neither.
+        """
+        if park.center_point is not None:
+            latitude, longitude = park.center_point
+            return (longitude, latitude)
+        if park.coordinates:
+            return (sum(coordinate[0] for coordinate in park.coordinates) / len(park.coordinates),
+                    sum(coordinate[1] for coordinate in park.coordinates) / len(park.coordinates))
+        return None
+
+    def get(self, name):
+        """
+        Looks a park up by name.
+
+        Args:
+            name (str): The name of the park.
+
+        Returns:
+            Park: The park, or None if there is no park with that name.
+        """
+        return self.by_name.get(name)
+
+    def get_by_id(self, park_id):
+        """
+        Looks parks up by ID; a park ID can cover several polygons.
+
+        Args:
+            park_id (int): The ID of the park.
+
+        Returns:
+            list: The parks with that ID.
+        """
+        return self.by_id.get(park_id, [])
+
+    def near(self, coordinate, radius):
+        """
+        Finds the parks whose boundary may lie within a straight-line radius of a coordinate.
+
+        Each park is bounded by a circle around its center, so no park within the radius is
+        missed, while parks returned may be slightly farther.
+
+        Args:
+            coordinate (tuple): A (longitude, latitude) tuple.
+            radius (float): The radius in kilometers.
+
+        Returns:
+            list: (park, lower bound distance in kilometers) tuples, nearest first.
+        """
+        found = []
+        for center, distance in self.centers.within(tuple(coordinate), radius + self.max_extent):
+            for park in self.center_parks[center]:
+                bound = max(0.0, distance - self.extents[id(park)])
+                if bound <= radius:
+                    found.append((park, bound))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def entry_vertices(self, graph, park):
+        """
+        Returns the entry vertices of a park, snapped once per graph and graph version.
+
+        Args:
+            graph (Graph): The graph representation of the bikeways network.
+            park (Park): The park.
+
+        Returns:
+            dict: The entry vertices mapped to their connector distances, as Graph.entry_vertices.
+        """
+        if self.entries_graph is not graph or self.entries_version != graph.version:
+            self.entries = {}
+            self.entries_graph = graph
+            self.entries_version = graph.version
+        if id(park) not in self.entries:
+            self.entries[id(park)] = graph.entry_vertices(park.coordinates)
+        return self.entries[id(park)]
+
+    def precompute_entries(self, graph):
+        """
+        Snaps every park to the graph up front, so no query pays for it.
+
+        Args:
+            graph (Graph): The graph representation of the bikeways network.
+        """
+        for park in self.parks:
+            self.entry_vertices(graph, park)
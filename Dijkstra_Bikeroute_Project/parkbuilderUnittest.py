@@ -1,5 +1,6 @@
 import unittest
-from parkbuilder import Park
+from classbuilder import Graph
+from parkbuilder import *
 
 
 class TestPark(unittest.TestCase):
@@ -36,6 +37,74 @@ class TestPark(unittest.TestCase):
         center_point = None
         park = Park(coordinates, center_point, name)
         self.assertEqual(park.center_point, center_point)
+        self.assertIsNone(park.area)
+        self.assertIsNone(park.park_id)
+
+    def test_park_from_row(self):
+        """
+        Test that park_from_row looks the columns up by header name and parses them.
+        """
+        header = ["Geom", "AREA_HA", "PARK_ID", "PARK_NAME", "PARK_URL", "geo_point_2d"]
+        row = [[(-123.1, 49.2)], "4.7", "228.0", "Oak Meadows Park", "", "49.2384, -123.1258"]
+        park = park_from_row(header, row, 0)
+        self.assertEqual(park.name, "Oak Meadows Park")
+        self.assertEqual(park.center_point, (49.2384, -123.1258))
+        self.assertEqual(park.area, 4.7)
+        self.assertEqual(park.park_id, 228)
+        self.assertEqual(park.coordinates, [(-123.1, 49.2)])
+
+        # Missing optional columns
+        park = park_from_row(["Geom", "PARK_NAME"], [[], "No Center"], 0)
+        self.assertIsNone(park.center_point)
+        self.assertIsNone(park.area)
+
+
+class TestParkCatalogue(unittest.TestCase):
+    """
+    A unittest class for testing the ParkCatalogue class.
+    """
+
+    def setUp(self):
+        self.near = Park([(0, 0.011), (0, 0.013)], (0.012, 0), "Near", park_id=1)
+        self.near_annex = Park([(0.002, 0.012)], None, "Near Annex", park_id=1)
+        self.far = Park([(0, 0.5)], (0.5, 0), "Far", park_id=2)
+        self.duplicate = Park([(0, 0.6)], (0.6, 0), "Near")
+        self.catalogue = ParkCatalogue([self.near, self.near_annex, self.far, self.duplicate])
+
+    def test_lookup(self):
+        """
+        Test the name and ID lookups.
+        """
+        self.assertIs(self.catalogue.get("Far"), self.far)
+        # the first park with a name keeps it
+        self.assertIs(self.catalogue.get("Near"), self.near)
+        self.assertIsNone(self.catalogue.get("Missing"))
+        self.assertEqual(self.catalogue.get_by_id(1), [self.near, self.near_annex])
+        self.assertEqual(self.catalogue.get_by_id(3), [])
+        self.assertEqual(len(self.catalogue), 4)
+
+    def test_near(self):
+        """
+        Test that parks are found by their boundary, not only their center.
+        """
+        # the center of Near is 1.33 km away, its boundary 1.22 km
+        found = self.catalogue.near((0, 0), 1.25)
+        self.assertEqual([park.name for park, _ in found], ["Near"])
+        self.assertLessEqual(found[0][1], 1.23)
+        self.assertEqual(self.catalogue.near((0, 0), 1.0), [])
+
+    def test_entry_vertices(self):
+        """
+        Test that entry vertices are snapped once per graph version.
+        """
+        graph = Graph()
+        graph.build_graph([["Object ID", "Geom"], ["1", [[0, 0], [0, 0.01]]]], 1)
+        entries = self.catalogue.entry_vertices(graph, self.near)
+        self.assertEqual(list(entries), [(0, 0.01)])
+        self.assertIs(self.catalogue.entry_vertices(graph, self.near), entries)
+
+        graph.version += 1
+        self.assertIsNot(self.catalogue.entry_vertices(graph, self.near), entries)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import json
+from array import array
+
+MAGIC = b"PARKDIST1\n"
+
+
+def graph_signature(graph, parks):
+    """
+    Hashes the edges of a graph and the boundaries of the parks, to tell whether a stored
+    distance table still matches them. Unlike the graph version, the signature survives
+    rebuilding the graph in another process.
+
+    :param graph: A Graph instance representing the bikeways network.
+    :param parks: A list of Park instances.
+    :return: The signature as a hex string.
+    """
+    digest = hashlib.sha1()
+    for vertex in sorted(graph.vertices):
+        current = graph.vertices[vertex].head
+        edges = []
+        while current:
+            edges.append(current.datapoint)
+            current = current.next
+        digest.update(repr((vertex, sorted(edges))).encode())
+    for park in parks:
+        digest.update(repr((park.name, [tuple(coordinate) for coordinate in park.coordinates])).encode())
+    return digest.hexdigest()
+
+
+class ParkDistanceTable:
+    """
+    A class holding the network distance between every pair of parks, computed offline.
+
+    Distances are stored in one flat array of doubles, row by row in catalogue order, so a
+    lookup is an index computation. Next to them the table keeps every park's entry vertices
+    and connector distances, so a new start point is attached to all parks with one search.
+    """
+
+    def __init__(self, parks, distances, entries, version=None, signature=None):
+        """
+        :param parks: The list of Park instances, in table order.
+        :param distances: An array of len(parks) ** 2 distances in kilometers, inf where unreachable.
+        :param entries: A list with the entry vertices of each park, as dicts of vertex to connector distance.
+        :param version: The version of the graph the table was computed on.
+        :param signature: The graph_signature of the graph and parks the table was computed on.
+        """
+        self.parks = list(parks)
+        self.distances = distances
+        self.entries = entries
+        self.version = version
+        self.signature = signature
+        self.positions = {id(park): position for position, park in enumerate(self.parks)}
+        self.checked_graph = None
+        self.checked_state = None
+        self.checked_current = None
+
+    @classmethod
+    def build(cls, graph, catalogue, mask=None):
+        """
+        Computes the table with one multi-source search per park.
+
+        The graph is undirected, so each search only has to settle the entry vertices of the
+        parks after it in the table; the rest of its row is mirrored from earlier searches.
+
+        :param graph: A Graph instance representing the bikeways network.
+        :param catalogue: A ParkCatalogue holding the parks and their cached entry vertices.
+        :param mask: An optional ClosureMask of edges, rows and vertices to route around. The
+                     signature does not cover it, so such a table only holds for those closures.
+        :return: The ParkDistanceTable.
+        """
+        parks = catalogue.parks
+        entries = [catalogue.entry_vertices(graph, park) for park in parks]
+        count = len(parks)
+        distances = array('d', [float('inf')]) * (count * count)
+        for i in range(count):
+            distances[i * count + i] = 0.0
+            targets = set()
+            for park_entries in entries[i + 1:]:
+                targets.update(park_entries)
+            if not targets or not entries[i]:
+                continue
+            settled, _ = graph.shortest_distances(entries[i], mask=mask, targets=targets)
+            for j in range(i + 1, count):
+                distance = min((settled[vertex] + connector for vertex, connector in entries[j].items()
+                                if vertex in settled), default=float('inf'))
+                distances[i * count + j] = distances[j * count + i] = distance
+        table = cls(parks, distances, entries, graph.version, graph_signature(graph, parks))
+        table.is_current(graph)
+        return table
+
+    def is_current(self, graph):
+        """
+        Tells whether the table still matches a graph and its own parks.
+
+        The signature is hashed once per graph and graph version, the way ParkCatalogue
+        caches entry vertices. The edge and vertex counts are part of the key as well,
+        since add_vertex and add_edge change the graph without bumping its version.
+
+        :param graph: A Graph instance representing the bikeways network.
+        :return: True if the graph and parks are the ones the table was computed on.
+        """
+        state = (graph.version, graph.edge_count, len(graph.vertices))
+        if self.checked_graph is not graph or self.checked_state != state:
+            self.checked_current = self.signature == graph_signature(graph, self.parks)
+            self.checked_graph = graph
+            self.checked_state = state
+        return self.checked_current
+
+    def save(self, path):
+        """
+        Writes the table to a gzip-compressed file: a JSON header with the entry vertices,
+        the graph version and signature, followed by the upper triangle of the distances as
+        single-precision floats, which keep millimeters over the extent of the city.
+
+        :param path: The path of the file to write.
+        """
+        header = json.dumps({
+            "version": self.version,
+            "signature": self.signature,
+            "names": [park.name for park in self.parks],
+            "entries": [[[list(vertex), connector] for vertex, connector in park_entries.items()]
+                        for park_entries in self.entries],
+        }).encode()
+        with gzip.open(path, "wb") as table_file:
+            table_file.write(MAGIC)
+            table_file.write(len(header).to_bytes(8, "little"))
+            table_file.write(header)
+            count = len(self.parks)
+            table_file.write(array('f', (self.distances[i * count + j] for i in range(count)
+                                         for j in range(i + 1, count))).tobytes())
+
+    @classmethod
+    def load(cls, path, parks):
+        """
+        Reads a table written by save.
+
+        :param path: The path of the file to read.
+        :param parks: The Park instances the table was computed for, in the same order.
+        :return: The ParkDistanceTable.
+        :raises: ValueError if the file is not a distance table or was computed for other parks.
+        """
+        parks = list(parks)
+        with gzip.open(path, "rb") as table_file:
+            if table_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("The file is not a park distance table")
+            header = json.loads(table_file.read(int.from_bytes(table_file.read(8), "little")))
+            if header["names"] != [park.name for park in parks]:
+                raise ValueError("The table was computed for other parks")
+            triangle = array('f')
+            triangle.frombytes(table_file.read())
+        count = len(parks)
+        distances = array('d', [0.0]) * (count * count)
+        position = 0
+        for i in range(count):
+            for j in range(i + 1, count):
+                distances[i * count + j] = distances[j * count + i] = triangle[position]
+                position += 1
+        entries = [{tuple(vertex): connector for vertex, connector in park_entries}
+                   for park_entries in header["entries"]]
+        return cls(parks, distances, entries, header["version"], header["signature"])
+
+    def index(self, park):
+        """
+        Returns the position of a park in the table.
+
+        :param park: A Park instance of the table.
+        :return: The position.
+        :raises: KeyError if the park is not in the table.
+        """
+        return self.positions[id(park)]
+
+    def distance(self, park_a, park_b):
+        """
+        Looks up the network distance between two parks.
+
+        :param park_a: A Park instance of the table.
+        :param park_b: Another Park instance of the table.
+        :return: The distance in kilometers, connectors included, or inf if unreachable.
+        """
+        return self.distances[self.index(park_a) * len(self.parks) + self.index(park_b)]
+
+    def tour_length(self, parks, round_trip=False):
+        """
+        Adds up the park-to-park legs of a tour without searching the graph.
+
+        :param parks: The Park instances in visiting order.
+        :param round_trip: Whether the tour returns to its first park.
+        :return: The length in kilometers.
+        """
+        stops = list(parks)
+        if round_trip and stops:
+            stops.append(stops[0])
+        return sum(self.distance(park_a, park_b) for park_a, park_b in zip(stops, stops[1:]))
+
+    def start_distances(self, graph, coordinate, mask=None):
+        """
+        Computes the network distance from a coordinate to every park with one search.
+
+        :param graph: The Graph the table was computed on.
+        :param coordinate: The coordinate tuple to start from.
+        :param mask: An optional ClosureMask of edges, rows and vertices to route around.
+        :return: A list of distances in kilometers in table order, inf where unreachable.
+        """
+        start_vertex, connector = graph.find_closest_vertex(tuple(coordinate))
+        if start_vertex is None:
+            return [float('inf')] * len(self.parks)
+        targets = set()
+        for park_entries in self.entries:
+            targets.update(park_entries)
+        settled, _ = graph.shortest_distances({start_vertex: connector}, mask=mask, targets=targets)
+        return [min((settled[vertex] + entry_connector for vertex, entry_connector in park_entries.items()
+                     if vertex in settled), default=float('inf'))
+                for park_entries in self.entries]
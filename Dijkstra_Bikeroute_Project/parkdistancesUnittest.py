@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from classbuilder import Graph
+from parkbuilder import Park, ParkCatalogue
+from parkdistances import *
+
+
+class TestParkDistanceTable(unittest.TestCase):
+    """
+    A unittest class for testing the ParkDistanceTable class.
+    """
+
+    def setUp(self):
+        # a 0.01 degree ladder along the second component, roughly 1.1 km per rung, and an
+        # island no park can reach
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[0, 0], [0, 0.01], [0, 0.02], [0, 0.03]]],
+            ["2", [[1, 1], [1, 1.01]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.rung = self.graph.haversine_distance((0, 0), (0, 0.01))
+        self.south = Park([(0, 0)], None, "South")
+        self.middle = Park([(0.001, 0.02)], None, "Middle")
+        self.north = Park([(0, 0.03)], None, "North")
+        self.island = Park([(1, 1)], None, "Island")
+        self.catalogue = ParkCatalogue([self.south, self.middle, self.north, self.island])
+        self.table = ParkDistanceTable.build(self.graph, self.catalogue)
+
+    def test_build(self):
+        """
+        Tests the distances, connectors included, and that the table is symmetric.
+        """
+        connector = self.graph.haversine_distance((0, 0.02), (0.001, 0.02))
+        self.assertAlmostEqual(self.table.distance(self.south, self.middle), 2 * self.rung + connector)
+        self.assertAlmostEqual(self.table.distance(self.middle, self.south), 2 * self.rung + connector)
+        self.assertAlmostEqual(self.table.distance(self.south, self.north), 3 * self.rung)
+        self.assertEqual(self.table.distance(self.north, self.north), 0)
+        self.assertEqual(self.table.distance(self.south, self.island), float('inf'))
+
+    def test_tour_length(self):
+        """
+        Tests that tours add up their legs.
+        """
+        self.assertAlmostEqual(self.table.tour_length([self.south, self.north, self.south]), 6 * self.rung)
+        self.assertAlmostEqual(self.table.tour_length([self.south, self.north], round_trip=True), 6 * self.rung)
+        self.assertEqual(self.table.tour_length([self.south]), 0)
+
+    def test_start_distances(self):
+        """
+        Tests attaching a start point to every park with one search.
+        """
+        distances = self.table.start_distances(self.graph, (0, 0.01))
+        self.assertAlmostEqual(distances[0], self.rung)
+        self.assertAlmostEqual(distances[2], 2 * self.rung)
+        self.assertEqual(distances[3], float('inf'))
+
+    def test_save_and_load(self):
+        """
+        Tests the round trip through a file and the staleness check.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "parks.dist")
+            self.table.save(path)
+            loaded = ParkDistanceTable.load(path, self.catalogue.parks)
+
+            # Wrong parks
+            with self.assertRaises(ValueError):
+                ParkDistanceTable.load(path, [self.south])
+
+        self.assertAlmostEqual(loaded.distance(self.north, self.south), self.table.distance(self.north, self.south), 5)
+        self.assertEqual(loaded.distance(self.island, self.south), float('inf'))
+        self.assertEqual(loaded.entries, self.table.entries)
+        self.assertTrue(loaded.is_current(self.graph))
+
+        self.graph.add_vertex((0, 0.04))
+        self.graph.add_edge((0, 0.03), (0, 0.04), "3", "3", 1.0)
+        self.assertFalse(loaded.is_current(self.graph))
+
+    def test_is_current_follows_version(self):
+        """
+        Tests that the cached check is redone once a delta bumps the graph version.
+        """
+        self.assertTrue(self.table.is_current(self.graph))
+        self.assertIs(self.table.checked_graph, self.graph)
+        old_row = ["2", [[1, 1], [1, 1.01]]]
+        new_row = ["2", [[1, 1], [1, 1.02]]]
+        self.graph.apply_delta({"key_index": 0, "inserted": [], "removed": [],
+                                "modified": [(old_row, new_row)]}, 1)
+        self.assertFalse(self.table.is_current(self.graph))
+        self.assertFalse(self.table.is_current(self.graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+from classbuilder import haversine_distance
+
+
+def reachable_parks(graph, start_coordinate, parks, budget, mask=None, catalogue=None):
+    """
+    Finds every park reachable from a start coordinate within a distance budget.
+
+    A single bounded Dijkstra search is run from the vertex closest to the start; it stops
+    as soon as the frontier passes the budget. Parks are snapped to the graph the same way
+    find_shortest_path connects them, but without adding anything to the graph, and parks
+    whose straight-line distance already exceeds the budget are never snapped. With a
+    ParkCatalogue, the straight-line prefilter uses its center index and the entry vertices
+    it caches, instead of the boundary coordinates of every park.
+
+    :param graph: A Graph instance representing the bikeways network.
+    :param start_coordinate: The coordinate tuple to start from.
+    :param parks: A list of Park instances.
+    :param budget: The distance budget in kilometers.
+    :param mask: An optional ClosureMask of edges, rows and vertices to route around.
+    :param catalogue: An optional ParkCatalogue holding the parks.
+    :return: A tuple of a list of (park, distance) tuples sorted by network distance, and
+             the isochrone polygon, the convex hull of the reached edges, as a closed list
+             of coordinates.
+    """
+    start_coordinate = tuple(start_coordinate)
+    start_vertex, start_distance = graph.find_closest_vertex(start_coordinate)
+    if start_vertex is None or start_distance > budget:
+        return [], []
+    distances, _ = graph.shortest_distances({start_vertex: start_distance}, max_distance=budget, mask=mask)
+
+    # the network distance is never shorter than the straight-line distance
+    if catalogue is None:
+        candidates = [park for park in parks
+                      if min((haversine_distance(start_coordinate, tuple(coordinate)) for coordinate in park.coordinates),
+                             default=float('inf')) <= budget]
+    else:
+        wanted = {id(park) for park in parks}
+        candidates = [park for park, _ in catalogue.near(start_coordinate, budget) if id(park) in wanted]
+
+    reached = []
+    for park in candidates:
+        entries = graph.entry_vertices(park.coordinates) if catalogue is None else catalogue.entry_vertices(graph, park)
+        park_distance = min((distances[vertex] + connector for vertex, connector in entries.items()
+                             if vertex in distances), default=float('inf'))
+        if park_distance <= budget:
+            reached.append((park, park_distance))
+    reached.sort(key=lambda item: item[1])
+
+    polygon = convex_hull([start_coordinate] + [point for edge in reached_edges(graph, distances, budget, mask)
+                                                for point in edge])
+    return reached, polygon
+
+
+def reached_edges(graph, distances, budget, mask=None):
+    """
+    Lists the edges, or the part of each edge, covered by a bounded search.
+
+    :param graph: The Graph that was searched.
+    :param distances: The settled distances returned by Graph.shortest_distances.
+    :param budget: The distance budget the search was bounded by.
+    :param mask: The ClosureMask the search honored, if any.
+    :return: A list of (coordinate, coordinate) segments. Edges leaving the reached area are
+             cut where the budget runs out, interpolating linearly along the edge.
+    """
+    edges = []
+    for vertex, distance in distances.items():
+        current = graph.vertices[vertex].head
+        while current:
+            neighbor, edge_distance = current.datapoint
+            if mask is None or mask.allows(current):
+                if neighbor in distances:
+                    # full edges are listed once, from their lower endpoint
+                    if vertex < neighbor:
+                        edges.append((vertex, neighbor))
+                elif edge_distance > 0:
+                    fraction = min(1.0, (budget - distance) / edge_distance)
+                    end = tuple(a + (b - a) * fraction for a, b in zip(vertex, neighbor))
+                    edges.append((vertex, end))
+            current = current.next
+    return edges
+
+
+def convex_hull(points):
+    """
+    Computes the convex hull of a set of points with Andrew's monotone chain algorithm.
+
+    :param points: A list of coordinate tuples.
+    :return: The hull as a closed list of coordinates in counter-clockwise order, or an
+             empty list if there are fewer than three distinct points.
+    """
+    points = sorted(set(points))
+    if len(points) < 3:
+        return []
+
+    def cross(origin, a, b):
+        return (a[0] - origin[0]) * (b[1] - origin[1]) - (a[1] - origin[1]) * (b[0] - origin[0])
+
+    lower = []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    upper = []
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+
+    hull = lower[:-1] + upper[:-1]
+    if len(hull) < 3:
+        return []
+    return hull + [hull[0]]
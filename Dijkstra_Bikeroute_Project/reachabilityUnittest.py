@@ -0,0 +1,87 @@
+import unittest
+from classbuilder import Graph
+from closuremask import ClosureMask
+from parkbuilder import Park, ParkCatalogue
+from reachability import *
+
+
+class TestReachability(unittest.TestCase):
+    """
+    A unittest class for testing bounded reachability queries.
+    """
+
+    def setUp(self):
+        # a 0.01 degree ladder along the second component, roughly 1.1 km per rung
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[0, 0], [0, 0.01], [0, 0.02], [0, 0.03], [0, 0.04]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.near = Park([(0.001, 0.01)], None, "Near")
+        self.middle = Park([(0.001, 0.03), (-0.001, 0.03)], None, "Middle")
+        self.far = Park([(0, 0.5)], None, "Far")
+
+    def test_reachable_parks(self):
+        """
+        Tests that only parks within the budget are returned, nearest first, without changing the graph.
+        """
+        vertex_count = len(self.graph.vertices)
+        reached, polygon = reachable_parks(self.graph, (0, 0), [self.far, self.middle, self.near], 3.5)
+
+        self.assertEqual([park.name for park, _ in reached], ["Near", "Middle"])
+        # three rungs plus the connector to the park boundary
+        self.assertAlmostEqual(reached[1][1], 3 * haversine_distance((0, 0), (0, 0.01)) + haversine_distance((0, 0.03), (0.001, 0.03)))
+        self.assertEqual(len(self.graph.vertices), vertex_count)
+
+        # all points lie on a line, so the hull is degenerate
+        self.assertEqual(polygon, [])
+
+        # Budget too small for anything
+        reached, _ = reachable_parks(self.graph, (0, 0), [self.near], 0.5)
+        self.assertEqual(reached, [])
+
+    def test_reachable_parks_with_mask(self):
+        """
+        Tests that closures cut parks off.
+        """
+        mask = ClosureMask()
+        mask.close_vertex((0, 0.02))
+        reached, _ = reachable_parks(self.graph, (0, 0), [self.middle, self.near], 3.5, mask)
+        self.assertEqual([park.name for park, _ in reached], ["Near"])
+
+    def test_reachable_parks_with_catalogue(self):
+        """
+        Tests that the catalogue prefilter gives the same parks, and only of those asked for.
+        """
+        catalogue = ParkCatalogue([self.far, self.middle, self.near])
+        reached, _ = reachable_parks(self.graph, (0, 0), [self.far, self.middle, self.near], 3.5, catalogue=catalogue)
+        expected, _ = reachable_parks(self.graph, (0, 0), [self.far, self.middle, self.near], 3.5)
+        self.assertEqual(reached, expected)
+
+        reached, _ = reachable_parks(self.graph, (0, 0), [self.middle], 3.5, catalogue=catalogue)
+        self.assertEqual([park.name for park, _ in reached], ["Middle"])
+
+    def test_reached_edges(self):
+        """
+        Tests that the edge leaving the budget is cut where the budget runs out.
+        """
+        rung = haversine_distance((0, 0), (0, 0.01))
+        distances, _ = self.graph.shortest_distances({(0, 0): 0}, max_distance=1.5 * rung)
+        edges = reached_edges(self.graph, distances, 1.5 * rung)
+        self.assertIn(((0, 0), (0, 0.01)), edges)
+        partial = [end for start, end in edges if start == (0, 0.01)]
+        self.assertEqual(len(partial), 1)
+        self.assertAlmostEqual(partial[0][1], 0.015)
+
+    def test_convex_hull(self):
+        """
+        Tests the convex hull of a square with an inner point.
+        """
+        hull = convex_hull([(0, 0), (1, 0), (1, 1), (0, 1), (0.5, 0.5)])
+        self.assertEqual(hull, [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])
+        self.assertEqual(convex_hull([(0, 0), (1, 1)]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
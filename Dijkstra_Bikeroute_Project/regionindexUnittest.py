@@ -0,0 +1,136 @@
+import unittest
+from shapely.geometry import box
+from classbuilder import Graph
+from parkbuilder import Park
+from regionindex import *
+
+
+class TestRegionIndex(unittest.TestCase):
+    """
+    A unittest class for testing the RegionIndex class.
+    """
+
+    def setUp(self):
+        # a ladder through three areas stacked along the second component, and a spur
+        # off the middle one into a fourth area to the side
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Geom"],
+            ["1", [[0, 0], [0, 0.01], [0, 0.02], [0, 0.03], [0, 0.04]]],
+            ["2", [[0, 0.02], [0.045, 0.02], [0.05, 0.02]]],
+        ]
+        self.graph.build_graph(parsed_data, 1)
+        self.index = RegionIndex(self.graph, ["South", "Middle", "North", "East"],
+                                 [box(-1, -0.005, 0.04, 0.015), box(-1, 0.015, 0.04, 0.025),
+                                  box(-1, 0.025, 0.04, 0.045), box(0.04, 0, 0.06, 0.04)])
+
+    def test_assignment(self):
+        """
+        Tests that vertices and parks are assigned to the area containing them.
+        """
+        self.assertEqual(self.index.vertex_regions[(0, 0)], 0)
+        self.assertEqual(self.index.vertex_regions[(0, 0.02)], 1)
+        self.assertEqual(self.index.vertex_regions[(0.05, 0.02)], 3)
+        self.assertEqual(self.index.region_of((0, 0.035)), 2)
+        self.assertIsNone(self.index.region_of((5, 5)))
+
+        parks = [Park([(0.001, 0.03), (-0.001, 0.03)], None, "North Park"), Park([(5, 5)], None, "Elsewhere")]
+        self.assertEqual(self.index.park_regions(parks), [2, None])
+
+        # parks sharing a name are assigned one by one
+        twins = [Park([(0, 0.03)], None, "Street End"), Park([(0, 0)], None, "Street End")]
+        self.assertEqual(self.index.park_regions(twins), [2, 0])
+
+        # the center point, given latitude first, wins over the boundary, as in ParkCatalogue
+        centered = [Park([(0, 0.03), (0, 0.031)], (0.005, 0), "Long Park"), Park([], None, "Empty")]
+        self.assertEqual(self.index.park_regions(centered), [0, None])
+
+        groups = self.index.vertices_by_region()
+        self.assertEqual(sorted(groups[3]), [(0.045, 0.02), (0.05, 0.02)])
+        self.assertEqual(sum(len(vertices) for vertices in groups.values()), len(self.graph.vertices))
+
+    def test_bounds_and_corridor(self):
+        """
+        Tests that the bounds are the shortest distances between areas and that the corridor
+        leaves out the area a route would have to detour through.
+        """
+        bounds = self.index.compute_bounds()
+        rung = self.graph.haversine_distance((0, 0.01), (0, 0.02))
+        self.assertEqual(bounds[0][0], 0)
+        self.assertAlmostEqual(bounds[0][1], rung)
+        self.assertAlmostEqual(bounds[0][2], 2 * rung)
+        self.assertEqual(bounds[0][2], bounds[2][0])
+
+        self.assertEqual(self.index.corridor(0, 2, 2 * rung), [0, 1, 2])
+        self.assertEqual(self.index.corridor(0, 3, bounds[0][3]), [0, 1, 3])
+        self.assertEqual(self.index.corridor(0, 3, bounds[0][2] + bounds[2][3]), [0, 1, 2, 3])
+
+        regions = self.index.region_array()
+        self.assertIs(self.index.region_array(), regions)
+        compact = self.graph.compact()
+        self.assertEqual(regions[compact.ids[(0.05, 0.02)]], 3)
+        corridor = (regions, set(self.index.corridor(0, 2, 2 * rung)) | {OUTSIDE})
+        distances, _ = self.graph.shortest_distances({(0, 0): 0}, corridor=corridor)
+        self.assertIn((0, 0.04), distances)
+        self.assertNotIn((0.045, 0.02), distances)
+
+    def test_corridor_search_is_exact(self):
+        """
+        Tests that a corridor search finds the same distance as a full search when the
+        shortest route crosses an area the first, slack-based corridor leaves out.
+        """
+        # a short link from South to North far east, crossing East without a vertex in it,
+        # makes Middle look like a detour although the western route through it is shortest
+        rows = [
+            ["Object ID", "Geom"],
+            ["1", [[0, 0.01], [0, 0.02], [0, 0.03]]],
+            ["2", [[0.1, 0.0149], [0.1, 0.0251]]],
+        ]
+        areas = [box(-1, -0.005, 1, 0.015), box(-1, 0.015, 0.05, 0.025),
+                 box(-1, 0.025, 1, 0.045), box(0.05, 0.015, 1, 0.025)]
+        for connected in (False, True):
+            graph = Graph()
+            graph.build_graph(rows + ([["3", [[0, 0.01], [0.1, 0.0149]]], ["4", [[0, 0.03], [0.1, 0.0251]]]]
+                                      if connected else []), 1)
+            index = RegionIndex(graph, ["South", "Middle", "North", "East"], areas)
+            bounds = index.compute_bounds()
+            self.assertNotIn(1, index.corridor(0, 2, bounds[0][2] + 1.0))
+
+            distances, previous_vertices = index.shortest_distances((0, 0.01), (0, 0.03))
+            full, _ = graph.shortest_distances({(0, 0.01): 0}, targets=[(0, 0.03)])
+            self.assertAlmostEqual(distances[(0, 0.03)], full[(0, 0.03)])
+            self.assertEqual(previous_vertices[(0, 0.03)], (0, 0.02))
+
+    def test_update(self):
+        """
+        Tests that added and removed vertices are patched in and the bounds dropped.
+        """
+        self.index.compute_bounds()
+        regions = self.index.region_array()
+        old_row = ["1", [[0, 0], [0, 0.01], [0, 0.02], [0, 0.03], [0, 0.04]]]
+        new_row = ["1", [[0, 0.01], [0, 0.02], [0, 0.03], [0, 0.04], [0.05, 0.03]]]
+        changes = self.graph.apply_delta({"key_index": 0, "inserted": [], "removed": [],
+                                          "modified": [(old_row, new_row)]}, 1)
+        self.index.update(changes)
+
+        self.assertEqual(self.index.vertex_regions[(0.05, 0.03)], 3)
+        self.assertNotIn((0, 0), self.index.vertex_regions)
+        self.assertIsNone(self.index.bounds)
+        self.assertIsNot(self.index.region_array(), regions)
+        self.assertEqual(self.index.region_array()[self.graph.compact().ids[(0.05, 0.03)]], 3)
+
+    def test_from_geodataframe(self):
+        """
+        Tests building the index from boundary data as loaded by read_geojson_from_url.
+        """
+        import geopandas as gpd
+
+        boundaries = gpd.GeoDataFrame({"name": ["All", "Missing"]},
+                                      geometry=[box(-1, -1, 1, 1), None])
+        index = RegionIndex.from_geodataframe(self.graph, boundaries)
+        self.assertEqual(index.names, ["All"])
+        self.assertEqual(set(index.vertex_regions.values()), {0})
+
+
+if __name__ == '__main__':
+    unittest.main()
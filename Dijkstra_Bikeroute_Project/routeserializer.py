@@ -0,0 +1,206 @@
+import json
+import math
+
+from classbuilder import R
+
+DEFAULT_PRECISION = 5  # decimals, roughly 1 m, the precision of Google encoded polylines
+GEOJSON_PRECISION = 6  # decimals, roughly 0.1 m
+DEFAULT_COLUMNS = ["Bike Route Name", "Street Name", "Bikeway Type"]
+
+
+def route_segments(graph, path, mask=None):
+    """
+    Splits a route into segments, one per run of consecutive edges from the same bikeway row.
+
+    :param graph: The Graph the route was found in.
+    :param path: A list of vertices, as returned by find_shortest_path or k_shortest_paths.
+    :param mask: The ClosureMask the route was found with, if any.
+    :return: A list of dicts with the segment 'coordinates', its 'distance' in kilometers
+             and the 'attributes' of its row, as a dict of column to value when the attribute
+             table has columns and as the raw record otherwise.
+    """
+    segments = []
+    last_row = None
+    for vertex, neighbor in zip(path, path[1:]):
+        edge = None
+        current = graph.vertices[vertex].head if vertex in graph.vertices else None
+        while current:
+            if current.datapoint[0] == neighbor and (mask is None or mask.allows(current)):
+                if edge is None or current.datapoint[1] < edge.datapoint[1]:
+                    edge = current
+            current = current.next
+        if edge is None:
+            raise ValueError("The path contains vertices that are not connected in the graph.")
+
+        if segments and edge.info == last_row:
+            segments[-1]["coordinates"].append(neighbor)
+            segments[-1]["distance"] += edge.datapoint[1]
+        else:
+            record = graph.attributes.get(edge.info)
+            if isinstance(record, tuple) and graph.attributes.columns:
+                record = dict(zip(graph.attributes.columns, record))
+            segments.append({"coordinates": [vertex, neighbor], "distance": edge.datapoint[1],
+                             "attributes": record})
+            last_row = edge.info
+    return segments
+
+
+def simplify(coordinates, tolerance):
+    """
+    Simplifies a line with the Douglas-Peucker algorithm.
+
+    Offsets are measured in kilometers on a local equirectangular projection, which is
+    accurate to well under a meter over a city.
+
+    :param coordinates: A list of coordinate tuples.
+    :param tolerance: The largest offset in kilometers a dropped point may have from the simplified line.
+    :return: The simplified list of coordinates; the first and last coordinates are always kept.
+    """
+    if len(coordinates) < 3 or tolerance <= 0:
+        return list(coordinates)
+    scale = math.cos(math.radians(coordinates[0][1]))
+    points = [(math.radians(x) * scale * R, math.radians(y) * R) for x, y in coordinates]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        length = math.hypot(x2 - x1, y2 - y1)
+        farthest, farthest_offset = None, tolerance
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length == 0:
+                offset = math.hypot(x - x1, y - y1)
+            else:
+                offset = abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / length
+            if offset > farthest_offset:
+                farthest, farthest_offset = i, offset
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [coordinate for coordinate, kept in zip(coordinates, keep) if kept]
+
+
+def encode_polyline(coordinates, precision=DEFAULT_PRECISION):
+    """
+    Encodes coordinates in the Google encoded polyline format.
+
+    :param coordinates: A list of (longitude, latitude) tuples, as stored in the graph. The
+                        format orders pairs latitude first, so they are swapped.
+    :param precision: The number of decimals kept.
+    :return: The encoded polyline string.
+    """
+    factor = 10 ** precision
+    encoded = []
+    previous = (0, 0)
+    for longitude, latitude in coordinates:
+        current = (round(latitude * factor), round(longitude * factor))
+        for value, last in zip(current, previous):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                encoded.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+            encoded.append(chr(delta + 63))
+        previous = current
+    return "".join(encoded)
+
+
+def decode_polyline(encoded, precision=DEFAULT_PRECISION):
+    """
+    Decodes a Google encoded polyline.
+
+    :param encoded: The encoded polyline string.
+    :param precision: The number of decimals it was encoded with.
+    :return: A list of (longitude, latitude) tuples.
+    """
+    factor = 10 ** precision
+    coordinates = []
+    values = [0, 0]
+    index = 0
+    while index < len(encoded):
+        for component in range(2):
+            shift, result = 0, 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            values[component] += ~(result >> 1) if result & 1 else result >> 1
+        coordinates.append((values[1] / factor, values[0] / factor))
+    return coordinates
+
+
+def serialize_route(graph, path, output="polyline", tolerance=None, mask=None, columns=DEFAULT_COLUMNS):
+    """
+    Serializes a route for API clients.
+
+    Consecutive segments whose selected attributes are equal are merged, and distances are
+    rounded to the meter. The attributes are dictionary-encoded: the distinct attributes of
+    the route are listed once per response, as rows of values under one list of column names
+    when the attribute table has columns, and each segment holds the position of its row.
+
+    :param graph: The Graph the route was found in.
+    :param path: A list of vertices, as returned by find_shortest_path or k_shortest_paths.
+    :param output: 'polyline' for a dict holding one encoded polyline for the whole route, the
+                   'columns' and 'attributes' lists and the segments as index ranges into the
+                   polyline, or 'geojson' for a compact GeoJSON FeatureCollection string with
+                   one LineString per segment and the 'columns' and 'attributes' lists in the
+                   collection's properties. 'columns' is None when the records have no columns.
+    :param tolerance: An optional Douglas-Peucker tolerance in kilometers, applied per
+                      segment so segment ends are always kept.
+    :param mask: The ClosureMask the route was found with, if any.
+    :param columns: The attribute columns to include, or None for all of them.
+    :return: The serialized route. Distances are always those of the full geometry.
+    """
+    segments = []
+    for segment in route_segments(graph, path, mask):
+        if columns is not None and isinstance(segment["attributes"], dict):
+            segment["attributes"] = {column: segment["attributes"].get(column) for column in columns}
+        if segments and segments[-1]["attributes"] == segment["attributes"]:
+            segments[-1]["coordinates"] += segment["coordinates"][1:]
+            segments[-1]["distance"] += segment["distance"]
+        else:
+            segments.append(segment)
+    for segment in segments:
+        if tolerance:
+            segment["coordinates"] = simplify(segment["coordinates"], tolerance)
+    distance = round(sum(segment["distance"] for segment in segments), 3)
+    attributes = []
+    for segment in segments:
+        if segment["attributes"] not in attributes:
+            attributes.append(segment["attributes"])
+        segment["attribute"] = attributes.index(segment["attributes"])
+    names = None
+    if attributes and all(isinstance(record, dict) for record in attributes):
+        names = list(attributes[0])
+        attributes = [[record.get(name) for name in names] for record in attributes]
+
+    if output == "polyline":
+        coordinates = segments[0]["coordinates"][:1] if segments else []
+        ranges = []
+        for segment in segments:
+            # each segment starts where the previous one ended
+            start = len(coordinates) - 1
+            coordinates += segment["coordinates"][1:]
+            ranges.append({"start": start, "end": len(coordinates) - 1,
+                           "distance": round(segment["distance"], 3), "attribute": segment["attribute"]})
+        return {"distance": distance, "polyline": encode_polyline(coordinates), "columns": names,
+                "attributes": attributes, "segments": ranges}
+    if output == "geojson":
+        features = [{
+            "type": "Feature",
+            "geometry": {"type": "LineString",
+                         "coordinates": [[round(value, GEOJSON_PRECISION) for value in coordinate]
+                                         for coordinate in segment["coordinates"]]},
+            "properties": {"distance": round(segment["distance"], 3), "attribute": segment["attribute"]},
+        } for segment in segments]
+        return json.dumps({"type": "FeatureCollection", "features": features,
+                           "properties": {"distance": distance, "columns": names, "attributes": attributes}},
+                          separators=(",", ":"))
+    raise ValueError("Unknown output format: " + str(output))
@@ -0,0 +1,100 @@
+import json
+import unittest
+from classbuilder import Graph
+from routeserializer import *
+
+
+class TestRouteSerializer(unittest.TestCase):
+    """
+    A unittest class for testing route serialization.
+    """
+
+    def setUp(self):
+        self.graph = Graph()
+        parsed_data = [
+            ["Object ID", "Bike Route Name", "Geom"],
+            ["1", "Adanac", [[0, 0], [0, 0.001], [0, 0.002]]],
+            ["2", "Main", [[0, 0.002], [0.001, 0.002]]],
+        ]
+        self.graph.build_graph(parsed_data, 2)
+        self.path = [(0, 0), (0, 0.001), (0, 0.002), (0.001, 0.002)]
+
+    def test_encode_polyline(self):
+        """
+        Tests the encoding against the example of the format documentation, and the round trip.
+        """
+        coordinates = [(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)]
+        encoded = encode_polyline(coordinates)
+        self.assertEqual(encoded, "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        for decoded, original in zip(decode_polyline(encoded), coordinates):
+            self.assertAlmostEqual(decoded[0], original[0])
+            self.assertAlmostEqual(decoded[1], original[1])
+        self.assertEqual(encode_polyline([]), "")
+
+    def test_simplify(self):
+        """
+        Tests that points within the tolerance are dropped and points beyond it kept.
+        """
+        line = [(0, 0), (0.0005, 0.00000001), (0.001, 0), (0.0015, 0.001), (0.002, 0)]
+        self.assertEqual(simplify(line, 0.2), [(0, 0), (0.002, 0)])
+        self.assertEqual(simplify(line, 0.01), [(0, 0), (0.001, 0), (0.0015, 0.001), (0.002, 0)])
+        # No tolerance keeps everything
+        self.assertEqual(simplify(line, 0), line)
+
+    def test_route_segments(self):
+        """
+        Tests that consecutive edges of one row form one segment with that row's attributes.
+        """
+        segments = route_segments(self.graph, self.path)
+        self.assertEqual([segment["attributes"]["Bike Route Name"] for segment in segments], ["Adanac", "Main"])
+        self.assertEqual(segments[0]["coordinates"], self.path[:3])
+        self.assertAlmostEqual(segments[0]["distance"], self.graph.haversine_distance((0, 0), (0, 0.002)))
+
+        with self.assertRaises(ValueError):
+            route_segments(self.graph, [(0, 0), (0.001, 0.002)])
+
+    def test_serialize_route(self):
+        """
+        Tests both output formats.
+        """
+        route = serialize_route(self.graph, self.path, tolerance=0.001, columns=["Bike Route Name"])
+        coordinates = decode_polyline(route["polyline"])
+        # the middle point of the straight first segment is simplified away
+        self.assertEqual(len(coordinates), 3)
+        self.assertEqual([(segment["start"], segment["end"]) for segment in route["segments"]], [(0, 1), (1, 2)])
+        self.assertEqual(route["columns"], ["Bike Route Name"])
+        self.assertEqual(route["attributes"], [["Adanac"], ["Main"]])
+        self.assertEqual([segment["attribute"] for segment in route["segments"]], [0, 1])
+        self.assertAlmostEqual(route["distance"], sum(segment["distance"] for segment in route["segments"]), delta=0.002)
+
+        collection = json.loads(serialize_route(self.graph, self.path, "geojson"))
+        self.assertEqual(len(collection["features"]), 2)
+        self.assertEqual(collection["features"][0]["geometry"]["coordinates"], [[0, 0], [0, 0.001], [0, 0.002]])
+        properties = collection["properties"]
+        self.assertEqual(properties["columns"], DEFAULT_COLUMNS)
+        self.assertEqual(properties["attributes"][collection["features"][1]["properties"]["attribute"]],
+                         ["Main", None, None])
+
+        with self.assertRaises(ValueError):
+            serialize_route(self.graph, self.path, "kml")
+
+    def test_serialize_route_shares_attributes(self):
+        """
+        Tests that a street the route comes back to is listed once and referred to by each of its segments.
+        """
+        graph = Graph()
+        parsed_data = [
+            ["Object ID", "Bike Route Name", "Geom"],
+            ["1", "Adanac", [[0, 0], [0, 0.001]]],
+            ["2", "Main", [[0, 0.001], [0.001, 0.001]]],
+            ["3", "Adanac", [[0.001, 0.001], [0.001, 0.002]]],
+        ]
+        graph.build_graph(parsed_data, 2)
+        route = serialize_route(graph, [(0, 0), (0, 0.001), (0.001, 0.001), (0.001, 0.002)],
+                                columns=["Bike Route Name"])
+        self.assertEqual(route["attributes"], [["Adanac"], ["Main"]])
+        self.assertEqual([segment["attribute"] for segment in route["segments"]], [0, 1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
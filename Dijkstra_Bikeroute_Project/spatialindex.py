@@ -0,0 +1,152 @@
+import math
+
+from classbuilder import R, haversine_distance
+
+DEFAULT_CELL_SIZE = 0.001  # degrees, roughly 100 m around Vancouver
+
+
+class CoordinateIndex:
+    """
+    A class indexing coordinates in a uniform grid for exact nearest-neighbor queries under
+    the haversine distance.
+
+    A query scans rings of grid cells around its own cell and stops once no point in the
+    next ring can be closer than the best distance found. The stopping bound assumes the
+    coordinates lie within a city-sized area, as the bikeway and park datasets do. The index
+    can be patched with add and remove as vertices come and go.
+    """
+
+    def __init__(self, coordinates=(), cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        for coordinate in coordinates:
+            self.add(coordinate)
+
+    def __len__(self):
+        return self.size
+
+    def _cell(self, coordinate):
+        return (math.floor(coordinate[0] / self.cell_size), math.floor(coordinate[1] / self.cell_size))
+
+    def add(self, coordinate):
+        """
+        Adds a coordinate to the index.
+
+        :param coordinate: A coordinate tuple.
+        """
+        coordinate = tuple(coordinate)
+        bucket = self.cells.setdefault(self._cell(coordinate), [])
+        if coordinate not in bucket:
+            bucket.append(coordinate)
+            self.size += 1
+
+    def remove(self, coordinate):
+        """
+        Removes a coordinate from the index, if present.
+
+        :param coordinate: A coordinate tuple.
+        """
+        coordinate = tuple(coordinate)
+        cell = self._cell(coordinate)
+        bucket = self.cells.get(cell)
+        if bucket and coordinate in bucket:
+            bucket.remove(coordinate)
+            self.size -= 1
+            if not bucket:
+                del self.cells[cell]
+
+    def _ring(self, center, radius):
+        """
+        Yields the non-empty buckets of the cells at exactly the given ring radius.
+        """
+        row, column = center
+        if radius == 0:
+            cells = [center]
+        else:
+            cells = [(row + offset, column + side) for offset in range(-radius, radius + 1)
+                     for side in (-radius, radius)]
+            cells += [(row + side, column + offset) for offset in range(-radius + 1, radius)
+                      for side in (-radius, radius)]
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket:
+                yield bucket
+
+    def _ring_bound(self, coordinate, radius):
+        """
+        Returns a lower bound on the distance from a coordinate to any point beyond the
+        given ring radius.
+        """
+        gap = math.radians(max(0, radius) * self.cell_size)
+        # the second component is scaled by the cosines of the first components, which are
+        # bounded over the rows the next ring can reach
+        first = math.radians(coordinate[0])
+        spread = math.radians((radius + 2) * self.cell_size)
+        scale = min(1.0, max(0.0, min(math.cos(first) * math.cos(first - spread),
+                                      math.cos(first) * math.cos(first + spread))))
+        a = min(math.sin(gap / 2) ** 2, scale * math.sin(gap / 2) ** 2)
+        return 2 * R * math.asin(min(1.0, math.sqrt(a)))
+
+    def _scan_all(self, coordinate):
+        """
+        Yields every indexed coordinate with its distance, for queries far outside the data.
+        """
+        for bucket in self.cells.values():
+            for candidate in bucket:
+                yield candidate, haversine_distance(coordinate, candidate)
+
+    def nearest(self, coordinate):
+        """
+        Finds the indexed coordinate closest to the given coordinate.
+
+        :param coordinate: A coordinate tuple.
+        :return: A tuple of the closest coordinate and its distance, or (None, inf) if empty.
+        """
+        best, best_distance = None, float('inf')
+        if not self.cells:
+            return best, best_distance
+        coordinate = tuple(coordinate)
+        center = self._cell(coordinate)
+        radius = 0
+        visited = 0
+        # once the rings have covered more cells than the index holds, scanning everything is cheaper
+        while visited <= len(self.cells):
+            visited += max(1, 8 * radius)
+            for bucket in self._ring(center, radius):
+                for candidate in bucket:
+                    distance = haversine_distance(coordinate, candidate)
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            # points in ring radius + 1 are at least `radius` whole cells away
+            if best is not None and self._ring_bound(coordinate, radius) > best_distance:
+                return best, best_distance
+            radius += 1
+        return min(self._scan_all(coordinate), key=lambda item: item[1])
+
+    def within(self, coordinate, radius):
+        """
+        Finds every indexed coordinate within a radius of the given coordinate.
+
+        :param coordinate: A coordinate tuple.
+        :param radius: The radius in kilometers.
+        :return: A list of (coordinate, distance) tuples.
+        """
+        found = []
+        if not self.cells:
+            return found
+        coordinate = tuple(coordinate)
+        center = self._cell(coordinate)
+        ring = 0
+        visited = 0
+        while visited <= len(self.cells):
+            visited += max(1, 8 * ring)
+            for bucket in self._ring(center, ring):
+                for candidate in bucket:
+                    distance = haversine_distance(coordinate, candidate)
+                    if distance <= radius:
+                        found.append((candidate, distance))
+            if self._ring_bound(coordinate, ring) > radius:
+                return found
+            ring += 1
+        return [(candidate, distance) for candidate, distance in self._scan_all(coordinate) if distance <= radius]
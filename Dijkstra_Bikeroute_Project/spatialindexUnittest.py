@@ -0,0 +1,58 @@
+import random
+import unittest
+from classbuilder import haversine_distance
+from spatialindex import CoordinateIndex
+
+
+class TestCoordinateIndex(unittest.TestCase):
+    """
+    A unittest class for testing the CoordinateIndex class against a linear scan.
+    """
+
+    def setUp(self):
+        random.seed(5800)
+        self.coordinates = [(random.uniform(-123.22, -123.02), random.uniform(49.20, 49.30)) for _ in range(500)]
+        self.index = CoordinateIndex(self.coordinates)
+
+    def test_nearest(self):
+        """
+        Tests that nearest finds the same distance as a linear scan, near and far from the data.
+        """
+        queries = [(random.uniform(-123.3, -122.9), random.uniform(49.1, 49.4)) for _ in range(50)]
+        queries.append((0, 0))
+        for query in queries:
+            expected = min(haversine_distance(query, coordinate) for coordinate in self.coordinates)
+            _, distance = self.index.nearest(query)
+            self.assertAlmostEqual(distance, expected, places=9)
+
+        # Empty index
+        self.assertEqual(CoordinateIndex().nearest((0, 0)), (None, float('inf')))
+
+    def test_within(self):
+        """
+        Tests that within finds exactly the coordinates inside the radius.
+        """
+        query = (-123.12, 49.25)
+        found = sorted(coordinate for coordinate, _ in self.index.within(query, 1.5))
+        expected = sorted(coordinate for coordinate in self.coordinates if haversine_distance(query, coordinate) <= 1.5)
+        self.assertEqual(found, expected)
+
+    def test_add_remove(self):
+        """
+        Tests that the index can be patched.
+        """
+        query = (-123.5, 49.5)
+        self.index.add(query)
+        self.assertEqual(self.index.nearest(query), (query, 0))
+        self.assertEqual(len(self.index), 501)
+
+        self.index.remove(query)
+        self.assertNotEqual(self.index.nearest(query)[0], query)
+        self.assertEqual(len(self.index), 500)
+        # removing twice is a no-op
+        self.index.remove(query)
+        self.assertEqual(len(self.index), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,569 @@
+import gzip
+import http.server
+import json
+import math
+import os
+import re
+import sqlite3
+import struct
+
+from routeserializer import DEFAULT_COLUMNS, simplify
+
+EXTENT = 4096  # tile coordinate units per tile side, the Mapbox Vector Tile default
+BUFFER = 64  # tile units drawn beyond each tile edge, so lines do not end at the seams
+MIN_ZOOM = 10
+MAX_ZOOM = 16
+EARTH_CIRCUMFERENCE = 40075.016686  # km at the equator
+MAX_LATITUDE = 85.0511287798
+
+POINT, LINESTRING, POLYGON = 1, 2, 3
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+TILE_PATH = re.compile(r"^/(\d+)/(\d+)/(\d+)\.pbf$")
+
+
+def bikeway_features(parsed_data, geom_index, columns=DEFAULT_COLUMNS):
+    """
+    Turns the rows of the bikeways dataset into line features.
+
+    :param parsed_data: The parsed bikeways data, header row first, with geometries extracted.
+    :param geom_index: The index of the geometry column.
+    :param columns: The columns kept as feature properties.
+    :return: A list of (type, coordinates, properties) features.
+    """
+    header = parsed_data[0]
+    indexes = [(column, header.index(column)) for column in columns if column in header]
+    return [(LINESTRING, [tuple(coordinate) for coordinate in row[geom_index]],
+             {column: row[index] for column, index in indexes if row[index] != ""})
+            for row in parsed_data[1:] if len(row[geom_index]) >= 2]
+
+
+def park_features(parks):
+    """
+    Turns parks into polygon features.
+
+    :param parks: A list of Park instances, or a ParkCatalogue.
+    :return: A list of (type, rings, properties) features.
+    """
+    features = []
+    for park in parks:
+        if len(park.coordinates) < 3:
+            continue
+        properties = {"name": park.name}
+        if park.area is not None:
+            properties["area"] = park.area
+        if park.park_id is not None:
+            properties["park_id"] = park.park_id
+        features.append((POLYGON, [[tuple(coordinate) for coordinate in park.coordinates]], properties))
+    return features
+
+
+def boundary_features(boundary_data_gpd, name_column="name"):
+    """
+    Turns local-area boundaries into polygon features, one per polygon of each area.
+
+    :param boundary_data_gpd: The boundary GeoDataFrame, as loaded by read_geojson_from_url.
+    :param name_column: The column holding the area names.
+    :return: A list of (type, rings, properties) features.
+    """
+    features = []
+    boundaries = boundary_data_gpd.dropna(subset=['geometry'])
+    for name, geometry in zip(boundaries[name_column], boundaries.geometry):
+        for polygon in getattr(geometry, "geoms", [geometry]):
+            rings = [list(polygon.exterior.coords)] + [list(ring.coords) for ring in polygon.interiors]
+            features.append((POLYGON, rings, {"name": name}))
+    return features
+
+
+def _project(coordinate, zoom, extent):
+    """
+    Projects a (longitude, latitude) coordinate to Web Mercator world units at a zoom level,
+    tile_size * 2 ** zoom units across.
+    """
+    longitude, latitude = coordinate
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    size = extent * (1 << zoom)
+    x = (longitude + 180.0) / 360.0 * size
+    y = (1.0 - math.log(math.tan(math.radians(latitude)) + 1.0 / math.cos(math.radians(latitude))) / math.pi) / 2.0 * size
+    return x, y
+
+
+def lonlat_to_tile(coordinate, zoom):
+    """
+    Returns the tile holding a coordinate.
+
+    :param coordinate: A (longitude, latitude) tuple.
+    :param zoom: The zoom level.
+    :return: The (x, y) tile numbers, y counted from the north as in XYZ tile URLs.
+    """
+    x, y = _project(coordinate, zoom, 1)
+    last = (1 << zoom) - 1
+    return min(last, max(0, int(x))), min(last, max(0, int(y)))
+
+
+def _clip_line(points, xmin, ymin, xmax, ymax):
+    """
+    Clips a line to a box with the Liang-Barsky algorithm, segment by segment.
+
+    :return: The list of pieces of the line inside the box.
+    """
+    pieces = []
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        dx, dy = x2 - x1, y2 - y1
+        low, high = 0.0, 1.0
+        inside = True
+        for p, q in ((-dx, x1 - xmin), (dx, xmax - x1), (-dy, y1 - ymin), (dy, ymax - y1)):
+            if p == 0:
+                if q < 0:
+                    inside = False
+                    break
+            else:
+                t = q / p
+                if p < 0:
+                    low = max(low, t)
+                else:
+                    high = min(high, t)
+                if low > high:
+                    inside = False
+                    break
+        if not inside:
+            continue
+        start = (x1 + low * dx, y1 + low * dy)
+        end = (x1 + high * dx, y1 + high * dy)
+        # consecutive segments that stay inside continue the same piece
+        if pieces and low == 0.0 and pieces[-1][-1] == start:
+            pieces[-1].append(end)
+        else:
+            pieces.append([start, end])
+    return pieces
+
+
+def _clip_ring(points, xmin, ymin, xmax, ymax):
+    """
+    Clips a polygon ring to a box with the Sutherland-Hodgman algorithm.
+    """
+    edges = (
+        (lambda p: p[0] >= xmin, lambda a, b: (xmin, a[1] + (b[1] - a[1]) * (xmin - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[0] <= xmax, lambda a, b: (xmax, a[1] + (b[1] - a[1]) * (xmax - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[1] >= ymin, lambda a, b: (a[0] + (b[0] - a[0]) * (ymin - a[1]) / (b[1] - a[1]), ymin)),
+        (lambda p: p[1] <= ymax, lambda a, b: (a[0] + (b[0] - a[0]) * (ymax - a[1]) / (b[1] - a[1]), ymax)),
+    )
+    for inside, intersect in edges:
+        if not points:
+            break
+        clipped = []
+        for current, following in zip(points, points[1:] + points[:1]):
+            if inside(current):
+                clipped.append(current)
+                if not inside(following):
+                    clipped.append(intersect(current, following))
+            elif inside(following):
+                clipped.append(intersect(current, following))
+        points = clipped
+    return points
+
+
+def _quantize(points, origin_x, origin_y):
+    """
+    Rounds points to integer tile units and drops repeated points.
+    """
+    quantized = []
+    for x, y in points:
+        point = (int(round(x - origin_x)), int(round(y - origin_y)))
+        if not quantized or quantized[-1] != point:
+            quantized.append(point)
+    return quantized
+
+
+def _ring_area(ring):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def _tolerance(zoom, latitude, extent):
+    """
+    Returns the ground size in km of one tile unit at a zoom level, the simplification
+    tolerance: anything finer is lost when the geometry is rounded to tile units anyway.
+    """
+    return EARTH_CIRCUMFERENCE * math.cos(math.radians(latitude)) / ((1 << zoom) * extent)
+
+
+def build_tiles(layers, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, extent=EXTENT, buffer=BUFFER):
+    """
+    Cuts layers of features into Mapbox Vector Tiles for a range of zoom levels.
+
+    At each zoom level the features are simplified with Douglas-Peucker at the size of one
+    tile unit, projected to Web Mercator, and clipped to every tile they overlap.
+
+    :param layers: A dict of layer names to lists of (type, geometry, properties) features,
+                   as returned by bikeway_features, park_features and boundary_features.
+    :param min_zoom: The lowest zoom level cut.
+    :param max_zoom: The highest zoom level cut.
+    :param extent: The number of tile units per tile side.
+    :param buffer: The number of tile units kept beyond each tile edge.
+    :return: A dict of (zoom, x, y) tuples to encoded, uncompressed tiles.
+    """
+    tiles = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        contents = {}
+        for layer_name, features in layers.items():
+            for feature_type, geometry, properties in features:
+                parts = [geometry] if feature_type == LINESTRING else geometry
+                tolerance = _tolerance(zoom, parts[0][0][1], extent)
+                projected = [[_project(coordinate, zoom, extent) for coordinate in simplify(part, tolerance)]
+                             for part in parts]
+                xs = [x for part in projected for x, _ in part]
+                ys = [y for part in projected for _, y in part]
+                last = (1 << zoom) - 1
+                for tile_x in range(max(0, int((min(xs) - buffer) // extent)), min(last, int((max(xs) + buffer) // extent)) + 1):
+                    for tile_y in range(max(0, int((min(ys) - buffer) // extent)), min(last, int((max(ys) + buffer) // extent)) + 1):
+                        origin_x, origin_y = tile_x * extent, tile_y * extent
+                        box = (origin_x - buffer, origin_y - buffer, origin_x + extent + buffer, origin_y + extent + buffer)
+                        clipped = []
+                        if feature_type == LINESTRING:
+                            for piece in _clip_line(projected[0], *box):
+                                piece = _quantize(piece, origin_x, origin_y)
+                                if len(piece) >= 2:
+                                    clipped.append(piece)
+                        else:
+                            for position, ring in enumerate(projected):
+                                ring = _quantize(_clip_ring(ring[:-1] if ring[0] == ring[-1] else ring, *box),
+                                                 origin_x, origin_y)
+                                if len(ring) > 1 and ring[0] == ring[-1]:
+                                    ring.pop()
+                                if len(ring) >= 3 and _ring_area(ring) != 0:
+                                    clipped.append(ring)
+                                elif position == 0:
+                                    # the exterior is clipped or rounded away, so are its holes
+                                    break
+                        if clipped:
+                            layer = contents.setdefault((tile_x, tile_y), {}).setdefault(layer_name, [])
+                            layer.append((feature_type, clipped, properties))
+        for (tile_x, tile_y), tile_layers in contents.items():
+            tiles[(zoom, tile_x, tile_y)] = encode_tile(tile_layers, extent)
+    return tiles
+
+
+def _varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _key(field_number, wire_type):
+    return _varint(field_number << 3 | wire_type)
+
+
+def _message(field_number, payload):
+    return _key(field_number, 2) + _varint(len(payload)) + payload
+
+
+def _encode_value(value):
+    """
+    Encodes a property value as a Value message of the vector tile schema.
+    """
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _message(1, str(value).encode("utf-8"))
+
+
+def _encode_geometry(feature_type, parts):
+    """
+    Encodes the parts of a feature as the command integers of the vector tile geometry.
+    """
+    commands = []
+    cursor_x, cursor_y = 0, 0
+    for part in parts:
+        for position, (x, y) in enumerate(part):
+            if position == 0:
+                commands.append(MOVE_TO | 1 << 3)
+            elif position == 1:
+                commands.append(LINE_TO | (len(part) - 1) << 3)
+            commands += [_zigzag(x - cursor_x), _zigzag(y - cursor_y)]
+            cursor_x, cursor_y = x, y
+        if feature_type == POLYGON:
+            commands.append(CLOSE_PATH | 1 << 3)
+    return commands
+
+
+def encode_tile(layers, extent=EXTENT):
+    """
+    Encodes a tile in the Mapbox Vector Tile 2.1 protobuf format.
+
+    Polygon rings are oriented as the specification requires: the first ring of each
+    polygon, its exterior, clockwise on screen, and the rest, its holes, counter-clockwise.
+
+    :param layers: A dict of layer names to lists of (type, parts, properties) features in
+                   integer tile units; a line has one part per piece, a polygon one per ring.
+    :param extent: The number of tile units per tile side.
+    :return: The encoded tile as bytes.
+    """
+    tile = bytearray()
+    for layer_name, features in layers.items():
+        keys, values = {}, {}
+        encoded_features = bytearray()
+        for feature_type, parts, properties in features:
+            if feature_type == POLYGON:
+                # with y pointing down, a positive shoelace area is clockwise on screen
+                parts = [ring if (_ring_area(ring) > 0) == (position == 0) else ring[::-1]
+                         for position, ring in enumerate(parts)]
+            tags = []
+            for key, value in properties.items():
+                tags.append(keys.setdefault(key, len(keys)))
+                tags.append(values.setdefault((type(value).__name__, value), len(values)))
+            feature = bytearray()
+            if tags:
+                feature += _message(2, b"".join(_varint(tag) for tag in tags))
+            feature += _key(3, 0) + _varint(feature_type)
+            feature += _message(4, b"".join(_varint(command) for command in _encode_geometry(feature_type, parts)))
+            encoded_features += _message(2, bytes(feature))
+
+        layer = _key(15, 0) + _varint(2) + _message(1, layer_name.encode("utf-8")) + bytes(encoded_features)
+        layer += b"".join(_message(3, key.encode("utf-8")) for key in keys)
+        layer += b"".join(_message(4, _encode_value(value)) for _, value in values)
+        layer += _key(5, 0) + _varint(extent)
+        tile += _message(3, layer)
+    return bytes(tile)
+
+
+def _read_fields(data):
+    """
+    Yields the (field number, wire type, value) fields of a protobuf message.
+    """
+    position = 0
+
+    def read_varint():
+        nonlocal position
+        result, shift = 0, 0
+        while True:
+            byte = data[position]
+            position += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return result
+
+    while position < len(data):
+        key = read_varint()
+        field_number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            yield field_number, wire_type, read_varint()
+        elif wire_type == 1:
+            yield field_number, wire_type, data[position:position + 8]
+            position += 8
+        elif wire_type == 2:
+            length = read_varint()
+            yield field_number, wire_type, data[position:position + length]
+            position += length
+        elif wire_type == 5:
+            yield field_number, wire_type, data[position:position + 4]
+            position += 4
+        else:
+            raise ValueError("Unsupported protobuf wire type: " + str(wire_type))
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _read_packed(data):
+    """
+    Reads the varints of a packed repeated field.
+    """
+    values = []
+    value, shift = 0, 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            values.append(value)
+            value, shift = 0, 0
+    return values
+
+
+def decode_tile(data):
+    """
+    Decodes a tile written by encode_tile, to inspect archives and test the encoder.
+
+    :param data: The encoded tile, uncompressed.
+    :return: A dict of layer names to dicts with the layer 'extent' and its 'features', each a
+             dict with the feature 'type', its 'properties' and its 'geometry' as a list of
+             parts in tile units; polygon rings are not repeated at their end.
+    """
+    layers = {}
+    for _, _, layer_data in _read_fields(data):
+        name, extent, keys, values, raw_features = None, EXTENT, [], [], []
+        for field_number, _, value in _read_fields(layer_data):
+            if field_number == 1:
+                name = value.decode("utf-8")
+            elif field_number == 2:
+                raw_features.append(value)
+            elif field_number == 3:
+                keys.append(value.decode("utf-8"))
+            elif field_number == 4:
+                for value_field, _, raw in _read_fields(value):
+                    values.append(raw.decode("utf-8") if value_field == 1
+                                  else struct.unpack("<d", raw)[0] if value_field == 3
+                                  else _unzigzag(raw) if value_field == 6
+                                  else bool(raw) if value_field == 7 else raw)
+            elif field_number == 5:
+                extent = value
+
+        features = []
+        for raw_feature in raw_features:
+            feature = {"type": None, "properties": {}, "geometry": []}
+            for field_number, _, value in _read_fields(raw_feature):
+                if field_number == 2:
+                    tags = _read_packed(value)
+                    feature["properties"] = {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)}
+                elif field_number == 3:
+                    feature["type"] = value
+                elif field_number == 4:
+                    commands = _read_packed(value)
+                    x, y, position = 0, 0, 0
+                    while position < len(commands):
+                        command, count = commands[position] & 7, commands[position] >> 3
+                        position += 1
+                        if command == MOVE_TO:
+                            feature["geometry"].append([])
+                        for _ in range(count if command != CLOSE_PATH else 0):
+                            x += _unzigzag(commands[position])
+                            y += _unzigzag(commands[position + 1])
+                            position += 2
+                            feature["geometry"][-1].append((x, y))
+            features.append(feature)
+        layers[name] = {"extent": extent, "features": features}
+    return layers
+
+
+def write_mbtiles(tiles, path, name="bikeways", description=""):
+    """
+    Stores tiles in an MBTiles 1.3 archive, a single SQLite file, gzip-compressed.
+
+    :param tiles: A dict of (zoom, x, y) tuples to encoded tiles, as returned by build_tiles.
+    :param path: The path of the archive; an existing archive is replaced.
+    :param name: The tileset name written to the metadata.
+    :param description: The tileset description written to the metadata.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    zooms = sorted({zoom for zoom, _, _ in tiles})
+    layer_names = sorted({layer for data in tiles.values() for layer in decode_tile(data)}) if tiles else []
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("CREATE TABLE metadata (name text, value text)")
+        connection.execute("CREATE TABLE tiles (zoom_level integer, tile_column integer, tile_row integer, tile_data blob)")
+        connection.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+        metadata = {"name": name, "description": description, "format": "pbf", "type": "overlay",
+                    "minzoom": str(zooms[0]) if zooms else "0", "maxzoom": str(zooms[-1]) if zooms else "0",
+                    "json": json.dumps({"vector_layers": [{"id": layer, "fields": {}} for layer in layer_names]})}
+        connection.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+        # MBTiles counts rows from the south (TMS), XYZ URLs from the north
+        connection.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                               ((zoom, x, (1 << zoom) - 1 - y, gzip.compress(data))
+                                for (zoom, x, y), data in tiles.items()))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def write_directory(tiles, path):
+    """
+    Stores tiles as gzip-compressed files laid out as path/zoom/x/y.pbf.
+
+    :param tiles: A dict of (zoom, x, y) tuples to encoded tiles, as returned by build_tiles.
+    :param path: The root directory.
+    """
+    for (zoom, x, y), data in tiles.items():
+        directory = os.path.join(path, str(zoom), str(x))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{y}.pbf"), "wb") as tile_file:
+            tile_file.write(gzip.compress(data))
+
+
+def read_tile(path, zoom, x, y):
+    """
+    Reads a gzip-compressed tile from an MBTiles archive or a tile directory.
+
+    :param path: The path of an .mbtiles archive or of a tile directory.
+    :param zoom: The zoom level.
+    :param x: The tile column.
+    :param y: The tile row, counted from the north.
+    :return: The compressed tile, or None if there is no such tile.
+    """
+    if os.path.isdir(path):
+        tile_path = os.path.join(path, str(zoom), str(x), f"{y}.pbf")
+        if not os.path.exists(tile_path):
+            return None
+        with open(tile_path, "rb") as tile_file:
+            return tile_file.read()
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = connection.execute("SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                                 (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+    finally:
+        connection.close()
+    return row[0] if row else None
+
+
+class TileRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves GET /{zoom}/{x}/{y}.pbf from the tile store of the server."""
+
+    def do_GET(self):
+        match = TILE_PATH.match(self.path.split("?")[0])
+        if not match:
+            self.send_error(404, "Not a tile path")
+            return
+        data = read_tile(self.server.tile_path, *(int(part) for part in match.groups()))
+        if data is None:
+            # no tile means no features there, which clients expect as an empty response
+            self.send_response(204)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.mapbox-vector-tile")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(tile_path, host="127.0.0.1", port=8000):
+    """
+    Creates a threaded HTTP server for the tiles of an MBTiles archive or a tile directory.
+
+    :param tile_path: The path of the archive or directory.
+    :param host: The interface to listen on.
+    :param port: The port to listen on; 0 picks a free one.
+    :return: The server; call serve_forever on it.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), TileRequestHandler)
+    server.tile_path = tile_path
+    return server
+
+
+if __name__ == '__main__':
+    import dataProcessor
+    import parkbuilder
+
+    parsed_data, park_data, _, index, park_index, _ = dataProcessor.data_init_local()
+    parks = [parkbuilder.park_from_row(park_data[0], row, park_index) for row in park_data[1:]]
+    tiles = build_tiles({"bikeways": bikeway_features(parsed_data, index), "parks": park_features(parks)})
+    write_mbtiles(tiles, "vancouver.mbtiles", description="Vancouver bikeways and parks")
+    server = make_server("vancouver.mbtiles")
+    print(f"{len(tiles)} tiles, serving on http://{server.server_address[0]}:{server.server_address[1]}/{{z}}/{{x}}/{{y}}.pbf")
+    server.serve_forever()
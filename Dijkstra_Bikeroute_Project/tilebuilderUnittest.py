@@ -0,0 +1,104 @@
+import gzip
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from parkbuilder import Park
+from tilebuilder import *
+
+
+class TestTileBuilder(unittest.TestCase):
+    """
+    A unittest class for testing vector tile generation and serving.
+    """
+
+    def setUp(self):
+        # a line across the seam between two zoom 14 tiles and a small park next to it
+        self.line = [(-123.1300, 49.2800), (-123.1200, 49.2801), (-123.1100, 49.2802)]
+        self.parsed_data = [
+            ["Object ID", "Bike Route Name", "Geom"],
+            ["1", "Adanac", [list(coordinate) for coordinate in self.line]],
+        ]
+        self.park = Park([(-123.129, 49.281), (-123.128, 49.281), (-123.128, 49.282), (-123.129, 49.281)],
+                         None, "Square", area=1.5, park_id=7)
+        self.layers = {"bikeways": bikeway_features(self.parsed_data, 2), "parks": park_features([self.park])}
+
+    def test_lonlat_to_tile(self):
+        """
+        Tests the tile numbering against the corners of the world.
+        """
+        self.assertEqual(lonlat_to_tile((0, 0), 1), (1, 1))
+        self.assertEqual(lonlat_to_tile((-180, 85), 1), (0, 0))
+        self.assertEqual(lonlat_to_tile((179.9, -85), 2), (3, 3))
+
+    def test_encode_tile(self):
+        """
+        Tests that a tile decodes to its features, with polygon rings oriented by the specification.
+        """
+        counter_clockwise = [(0, 0), (0, 10), (10, 10), (10, 0)]
+        data = encode_tile({"layer": [
+            (LINESTRING, [[(5, 5), (15, 25)], [(1, 1), (0, 0)]], {"name": "A", "lanes": 2, "width": 1.5, "lit": True}),
+            (POLYGON, [counter_clockwise], {"name": "A"}),
+        ]})
+        layer = decode_tile(data)["layer"]
+        self.assertEqual(layer["extent"], EXTENT)
+        line, polygon = layer["features"]
+        self.assertEqual(line["type"], LINESTRING)
+        self.assertEqual(line["geometry"], [[(5, 5), (15, 25)], [(1, 1), (0, 0)]])
+        self.assertEqual(line["properties"], {"name": "A", "lanes": 2, "width": 1.5, "lit": True})
+        self.assertEqual(polygon["geometry"], [counter_clockwise[::-1]])
+
+    def test_build_tiles(self):
+        """
+        Tests that features are cut into every tile they cross and clipped to its buffer.
+        """
+        tiles = build_tiles(self.layers, min_zoom=10, max_zoom=14)
+        first, last = lonlat_to_tile(self.line[0], 14), lonlat_to_tile(self.line[-1], 14)
+        self.assertNotEqual(first, last)
+        for tile in (first, last):
+            features = decode_tile(tiles[(14,) + tile])["bikeways"]["features"]
+            self.assertEqual(features[0]["properties"], {"Bike Route Name": "Adanac"})
+            for x, y in features[0]["geometry"][0]:
+                self.assertTrue(-BUFFER <= x <= EXTENT + BUFFER and -BUFFER <= y <= EXTENT + BUFFER)
+
+        park = decode_tile(tiles[(14,) + first])["parks"]["features"][0]
+        self.assertEqual(park["properties"], {"name": "Square", "area": 1.5, "park_id": 7})
+        self.assertEqual(len(park["geometry"][0]), 3)
+        # one tile holds everything at zoom 10
+        self.assertEqual(len([key for key in tiles if key[0] == 10]), 1)
+
+    def test_stores_and_server(self):
+        """
+        Tests writing both stores and serving tiles from them.
+        """
+        tiles = build_tiles(self.layers, min_zoom=12, max_zoom=12)
+        (zoom, x, y), data = next(iter(tiles.items()))
+        with tempfile.TemporaryDirectory() as directory:
+            archive = os.path.join(directory, "tiles.mbtiles")
+            write_mbtiles(tiles, archive)
+            write_directory(tiles, os.path.join(directory, "tiles"))
+            for path in (archive, os.path.join(directory, "tiles")):
+                self.assertEqual(gzip.decompress(read_tile(path, zoom, x, y)), data)
+                self.assertIsNone(read_tile(path, zoom, x + 1, y))
+
+            server = make_server(archive, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                base = f"http://127.0.0.1:{server.server_address[1]}"
+                with urllib.request.urlopen(f"{base}/{zoom}/{x}/{y}.pbf") as response:
+                    self.assertEqual(response.status, 200)
+                    self.assertEqual(response.headers["Content-Encoding"], "gzip")
+                    self.assertEqual(gzip.decompress(response.read()), data)
+                with urllib.request.urlopen(f"{base}/{zoom}/{x + 1}/{y}.pbf") as response:
+                    self.assertEqual(response.status, 204)
+                with self.assertRaises(urllib.error.HTTPError):
+                    urllib.request.urlopen(f"{base}/index.html")
+            finally:
+                server.shutdown()
+                server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()